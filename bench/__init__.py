@@ -0,0 +1,66 @@
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).parent.parent
+DEFAULT_PROJECT = 'task11'
+SOURCE_FOLDER = 'src'
+
+
+@contextmanager
+def project_source(project=DEFAULT_PROJECT):
+    """Puts the syndicate project's source folder on sys.path, the same way
+    tests.ImportFromSourceContext does for the project's own tests. Each
+    project ships its own `commons` and `lambdas` packages, so a benchmark
+    process works with one project at a time"""
+    source_path = str(REPO_ROOT / project / SOURCE_FOLDER)
+    sys.path.insert(0, source_path)
+    try:
+        yield source_path
+    finally:
+        sys.path.remove(source_path)
+
+
+def measure(func, iterations, warmup=10, prepare=None):
+    """
+    Calls `func` `iterations` times and returns per-call durations
+    :param prepare: builds the argument of each call outside the timing
+    :return: list of seconds
+    """
+    for _ in range(warmup):
+        func(prepare()) if prepare else func()
+    durations = []
+    for _ in range(iterations):
+        argument = prepare() if prepare else None
+        start = time.perf_counter()
+        func(argument) if prepare else func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def percentile(durations, pct):
+    ordered = sorted(durations)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name, durations):
+    return {
+        'name': name,
+        'calls': len(durations),
+        'mean_us': statistics.fmean(durations) * 1e6,
+        'p50_us': percentile(durations, 50) * 1e6,
+        'p95_us': percentile(durations, 95) * 1e6,
+        'p99_us': percentile(durations, 99) * 1e6,
+    }
+
+
+def print_table(rows):
+    columns = list(rows[0])
+    print(' | '.join(f'{column:>12}' for column in columns))
+    for row in rows:
+        print(' | '.join(
+            f'{value:>12.1f}' if isinstance(value, float) else f'{value:>12}'
+            for value in row.values()))
@@ -0,0 +1,67 @@
+"""Response encoding of DynamoDB scan results: the former
+dumps(DecimalEncoder) -> loads -> dumps round trip against commons.codec
+with the stdlib and, when installed, the orjson backend.
+
+    python -m bench.codec --items 10000
+"""
+import argparse
+import json
+from decimal import Decimal
+
+from bench import measure, print_table, project_source, summarize
+
+
+class DecimalEncoder(json.JSONEncoder):
+    """The encoder the booking handlers used to copy around"""
+
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return super().default(obj)
+
+
+def scan_items(count):
+    return [{'id': Decimal(i), 'number': Decimal(i % 50 + 1),
+             'places': Decimal(4), 'isVip': i % 5 == 0,
+             'minOrder': Decimal('99.50'),
+             'tableNumber': Decimal(i % 50 + 1), 'clientName': f'Client {i}',
+             'phoneNumber': '+380000000000', 'date': '2024-05-01',
+             'slotTimeStart': '13:00', 'slotTimeEnd': '15:00'}
+            for i in range(count)]
+
+
+def round_trip(items):
+    serialized = json.dumps(items, cls=DecimalEncoder)
+    return json.dumps({'reservations': json.loads(serialized)})
+
+
+def run(count, iterations):
+    with project_source():
+        from commons import codec
+    items = scan_items(count)
+    candidates = [('dumps/loads/dumps', round_trip),
+                  (f'codec ({codec.BACKEND})',
+                   lambda data: codec.dumps({'reservations': data}))]
+    if codec.orjson is not None:
+        encoder = json.JSONEncoder(default=codec.default, ensure_ascii=False,
+                                   separators=(',', ':'))
+        candidates.append(('codec (json)',
+                           lambda data: encoder.encode(
+                               {'reservations': data})))
+    rows = [summarize(name, measure(lambda: func(items), iterations,
+                                    warmup=2))
+            for name, func in candidates]
+    print_table(rows)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=10_000)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+    run(args.items, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Synthetic Lambda events shaped like the ones AWS sends"""
+import itertools
+import json
+import time
+import uuid
+
+_sequence = itertools.count()
+
+
+def api_v1(method, path, body=None, resource=None, query=None):
+    """API Gateway REST (payload v1) proxy event"""
+    return {
+        'resource': resource or path,
+        'path': path,
+        'httpMethod': method,
+        'headers': {'Content-Type': 'application/json'},
+        'queryStringParameters': query,
+        'pathParameters': None,
+        'requestContext': {'httpMethod': method, 'path': path,
+                           'requestId': str(uuid.uuid4()),
+                           'stage': 'api'},
+        'body': json.dumps(body) if body is not None else None,
+        'isBase64Encoded': False
+    }
+
+
+def api_v2(method, raw_path, body=None, query=None):
+    """HTTP API / Function URL (payload v2) event"""
+    return {
+        'version': '2.0',
+        'routeKey': '$default',
+        'rawPath': raw_path,
+        'rawQueryString': '&'.join(f'{key}={value}' for key, value in
+                                   (query or {}).items()),
+        'queryStringParameters': query,
+        'headers': {'content-type': 'application/json'},
+        'requestContext': {'http': {'method': method, 'path': raw_path},
+                           'requestId': str(uuid.uuid4())},
+        'body': json.dumps(body) if body is not None else None,
+        'isBase64Encoded': False
+    }
+
+
+def sqs(count=10, body_size=256):
+    return {'Records': [{
+        'messageId': str(uuid.uuid4()),
+        'receiptHandle': 'handle',
+        'body': json.dumps({'n': next(_sequence), 'pad': 'x' * body_size}),
+        'attributes': {'MessageGroupId': f'group-{i % 4}'},
+        'messageAttributes': {},
+        'eventSource': 'aws:sqs',
+        'eventSourceARN': 'arn:aws:sqs:eu-central-1:000000000000:queue',
+        'awsRegion': 'eu-central-1'
+    } for i in range(count)]}
+
+
+def sns(count=1, message_size=256):
+    return {'Records': [{
+        'EventSource': 'aws:sns',
+        'EventVersion': '1.0',
+        'Sns': {'MessageId': str(uuid.uuid4()),
+                'Message': 'x' * message_size,
+                'Timestamp': '2024-01-01T00:00:00.000Z'}
+    } for _ in range(count)]}
+
+
+def dynamodb_stream(count=100, modify_ratio=0.5):
+    records = []
+    for i in range(count):
+        n = next(_sequence)
+        key = {'key': {'S': f'key-{n}'}}
+        image = {'key': {'S': f'key-{n}'}, 'value': {'N': str(n)}}
+        record = {
+            'eventID': str(uuid.uuid4()),
+            'eventSource': 'aws:dynamodb',
+            'awsRegion': 'eu-central-1',
+            'dynamodb': {'Keys': key, 'NewImage': image,
+                         'SequenceNumber': str(n),
+                         'StreamViewType': 'NEW_AND_OLD_IMAGES'}
+        }
+        if i < count * modify_ratio:
+            record['eventName'] = 'MODIFY'
+            record['dynamodb']['OldImage'] = {
+                'key': {'S': f'key-{n}'}, 'value': {'N': str(n - 1)}}
+        else:
+            record['eventName'] = 'INSERT'
+        records.append(record)
+    return {'Records': records}
+
+
+def scheduled():
+    return {
+        'version': '0',
+        'id': str(uuid.uuid4()),
+        'detail-type': 'Scheduled Event',
+        'source': 'aws.events',
+        'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'resources': ['arn:aws:events:eu-central-1:000000000000:rule/r'],
+        'detail': {}
+    }
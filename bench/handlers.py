@@ -0,0 +1,315 @@
+"""Drives every module-level HANDLER.lambda_handler in-process with
+synthetic events while AWS is replaced by the project's tests.local_aws
+stand-in and Open-Meteo by a canned response. Each project runs in its own
+interpreter because all of them ship `commons` and `lambdas` packages.
+
+    python -m bench.handlers                       # every project
+    python -m bench.handlers task11 --iterations 2000
+
+AWS calls can be given latency and throttling, and the tables the capacity
+of the project's deployment_resources.json; the errors column then counts
+the 5xx answers:
+
+    python -m bench.handlers task06 --aws-latency-ms 5 --provisioned
+"""
+import argparse
+import contextlib
+import importlib
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest.mock import patch
+
+from bench import REPO_ROOT, measure, print_table, summarize
+from bench import events
+
+OPEN_METEO_RESPONSE = {
+    'latitude': 50.4375, 'longitude': 30.5, 'generationtime_ms': 0.03,
+    'utc_offset_seconds': 0, 'timezone': 'GMT', 'timezone_abbreviation': 'GMT',
+    'elevation': 188.0,
+    'hourly_units': {'time': 'iso8601', 'temperature_2m': '°C'},
+    'hourly': {'time': [f'2024-01-{1 + hour // 24:02d}T{hour % 24:02d}:00'
+                        for hour in range(168)],
+               'temperature_2m': [round(-5 + hour * 0.1, 1)
+                                  for hour in range(168)]}
+}
+
+
+class LambdaContext:
+    function_name = 'bench'
+    memory_limit_in_mb = 128
+    aws_request_id = 'bench-request'
+
+    def __init__(self, timeout_ms=100_000):
+        self._deadline = time.monotonic() + timeout_ms / 1000
+
+    def get_remaining_time_in_millis(self):
+        return int((self._deadline - time.monotonic()) * 1000)
+
+
+def _booking_setup(local_aws):
+    # as deployed, e.g. with the reservations' slot index
+    local_aws.dynamodb.create_tables_from(
+        'deployment_resources.json', aliases=os.environ, provisioned=False)
+    tables = local_aws.dynamodb.Table('Tables')
+    for number in range(1, 21):
+        tables.put_item(Item={'id': number, 'number': number, 'places': 4,
+                              'isVip': number % 5 == 0, 'minOrder': 100})
+    local_aws.cognito.users['bench@example.com'] = 'Passw0rd!'
+
+
+def _booking_scenarios():
+    table_ids = itertools.count(1000)
+    days = itertools.count()
+
+    def reservation():
+        day = next(days)
+        return events.api_v1('POST', '/reservations', {
+            'tableNumber': day % 20 + 1, 'clientName': 'Bench',
+            'phoneNumber': '0000000', 'date': f'2024-{day % 12 + 1:02d}-'
+                                              f'{day % 28 + 1:02d}',
+            'slotTimeStart': f'{day % 10 + 10}:00',
+            'slotTimeEnd': f'{day % 10 + 11}:00'})
+
+    return [
+        ('api_handler', 'GET /tables',
+         lambda: events.api_v1('GET', '/tables')),
+        ('api_handler', 'GET /tables/{tableId}',
+         lambda: events.api_v1('GET', '/tables/7',
+                               resource='/tables/{tableId}')),
+        ('api_handler', 'POST /tables',
+         lambda: events.api_v1('POST', '/tables', {
+             'id': next(table_ids), 'number': 99, 'places': 2,
+             'isVip': False})),
+        ('api_handler', 'POST /reservations', reservation),
+        ('api_handler', 'GET /reservations',
+         lambda: events.api_v1('GET', '/reservations')),
+        ('api_handler', 'POST /signin',
+         lambda: events.api_v1('POST', '/signin', {
+             'email': 'bench@example.com', 'password': 'Passw0rd!'})),
+    ]
+
+
+# project -> (env, setup(local_aws), [(lambda, scenario, event factory)])
+PROJECTS = {
+    'task02': ({}, None, [
+        ('hello_world', 'GET /hello', lambda: events.api_v2('GET', '/hello'))
+    ]),
+    'task03': ({}, None, [
+        ('hello_world', 'GET /events',
+         lambda: events.api_v1('GET', '/events'))
+    ]),
+    'task04': ({}, None, [
+        ('sqs_handler', 'SQS x10', lambda: events.sqs(10)),
+        ('sns_handler', 'SNS x10', lambda: events.sns(10)),
+    ]),
+    'task05': ({'target_table': 'Events'}, None, [
+        ('api_handler', 'POST /events',
+         lambda: events.api_v1('POST', '/events', {
+             'principalId': 1, 'content': {'name': 'bench', 'n': 1}})),
+        ('api_handler', 'GET /status',
+         lambda: events.api_v1('GET', '/status')),
+    ]),
+    'task06': ({'target_table': 'Audit'}, None, [
+        ('audit_producer', 'DynamoDB stream x100',
+         lambda: events.dynamodb_stream(100)),
+    ]),
+    'task07': ({'target_table': 'uuid-storage'}, None, [
+        ('uuid_generator', 'Scheduled', events.scheduled),
+    ]),
+    'task08': ({}, None, [
+        ('api_handler', 'GET /weather',
+         lambda: events.api_v2('GET', '/weather',
+                               query={'latitude': '50.4375',
+                                      'longitude': '30.5'})),
+    ]),
+    'task09': ({}, None, [
+        ('processor', 'Scheduled', events.scheduled),
+    ]),
+    'task10': ({'tables_table': 'Tables',
+                'reservation_tables': 'Reservations',
+                'reservation_slots_table': 'ReservationSlots',
+                # deployment_resources.json placeholder
+                'reservations_table': 'Reservations'},
+               _booking_setup, _booking_scenarios()),
+    'task11': ({'tables_table': 'Tables',
+                'reservation_tables': 'Reservations',
+                'reservation_slots_table': 'ReservationSlots',
+                # deployment_resources.json placeholder
+                'reservations_table': 'Reservations'},
+               _booking_setup, _booking_scenarios()),
+}
+
+
+def _open_meteo_stub():
+    import requests
+
+    def request(session, method, url, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers['Content-Type'] = 'application/json'
+        response._content = json.dumps(OPEN_METEO_RESPONSE).encode()
+        return response
+    return patch('requests.sessions.Session.request', request)
+
+
+def check_response(name, response):
+    """A benchmark of the error path is worse than no benchmark"""
+    status = response.get('statusCode', 200) \
+        if isinstance(response, dict) else 200
+    if status >= 400:
+        raise RuntimeError(f'{name} answered {status}: {response}')
+
+
+def memory_profile(func, prepare, iterations):
+    """
+    :return: (mean tracemalloc peak in KiB per call, blocks retained per
+        call)
+    """
+    func(prepare())
+    tracemalloc.start()
+    try:
+        peaks = []
+        blocks_before = sys.getallocatedblocks()
+        for _ in range(iterations):
+            event = prepare()
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            func(event)
+            del event
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        retained = (sys.getallocatedblocks() - blocks_before) / iterations
+    finally:
+        tracemalloc.stop()
+    return sum(peaks) / len(peaks) / 1024, retained
+
+
+def run_project(project, iterations, memory_iterations, faults=None):
+    """
+    Runs inside the project's directory, see `main`
+    :param faults: {'latency', 'throttle_rate', 'seed', 'provisioned'}
+    """
+    env, setup, scenarios = PROJECTS[project]
+    os.environ.update(env)
+    from tests import ImportFromSourceContext
+    faults = dict(faults or {})
+    provisioned = faults.pop('provisioned', False)
+    try:
+        from tests.local_aws import LocalAws
+        local_aws_context = LocalAws(seed=faults.pop('seed', 0))
+    except ImportError:  # the project does not talk to AWS
+        local_aws_context = contextlib.nullcontext()
+
+    rows = []
+    with local_aws_context as local_aws, _open_meteo_stub():
+        if setup:
+            setup(local_aws)
+        # the setup itself runs without faults
+        if local_aws is not None:
+            if faults:
+                local_aws.faults.add(**faults)
+            if provisioned:
+                local_aws.dynamodb.create_tables_from(
+                    'deployment_resources.json', aliases=os.environ)
+        handlers = {}
+        with ImportFromSourceContext():
+            for lambda_name, _, _ in scenarios:
+                if lambda_name not in handlers:
+                    handlers[lambda_name] = importlib.import_module(
+                        f'lambdas.{lambda_name}.handler').HANDLER
+        for lambda_name, name, make_event in scenarios:
+            handler = handlers[lambda_name]
+            errors = []
+
+            def invoke(event):
+                response = handler.lambda_handler(event, LambdaContext())
+                if isinstance(response, dict) and \
+                        response.get('statusCode', 200) >= 500:
+                    errors.append(response)
+                return response
+
+            if not (faults or provisioned):
+                check_response(name, invoke(make_event()))
+            for _ in range(10):
+                invoke(make_event())
+            errors.clear()
+            durations = measure(invoke, iterations, warmup=0,
+                                prepare=make_event)
+            row = summarize(f'{project} {lambda_name} {name}', durations)
+            row['per_sec'] = iterations / sum(durations)
+            if faults or provisioned:
+                row['errors'] = len(errors)
+            row['peak_kib'], row['retained_blocks'] = memory_profile(
+                invoke, make_event, memory_iterations)
+            rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('projects', nargs='*', default=list(PROJECTS))
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--memory-iterations', type=int, default=50)
+    parser.add_argument('--aws-latency-ms', type=float, default=0,
+                        help='latency added to every local AWS call')
+    parser.add_argument('--throttle-rate', type=float, default=0,
+                        help='share of the local AWS calls throttled')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the throttling decisions')
+    parser.add_argument('--provisioned', action='store_true',
+                        help='give the tables the capacity of '
+                             'deployment_resources.json')
+    parser.add_argument('--json', help='write the rows to this file')
+    parser.add_argument('--child', action='store_true',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    faults = {}
+    if args.aws_latency_ms or args.throttle_rate:
+        faults = {'latency': args.aws_latency_ms / 1000,
+                  'throttle_rate': args.throttle_rate, 'seed': args.seed}
+    if args.provisioned:
+        faults['provisioned'] = True
+    if args.child:
+        rows = run_project(args.projects[0], args.iterations,
+                           args.memory_iterations, faults)
+        with open(args.json, 'w') as output:
+            json.dump(rows, output)
+        return
+
+    env = dict(os.environ, PYTHONPATH=str(REPO_ROOT), log_level='ERROR',
+               AWS_DEFAULT_REGION='eu-central-1',
+               AWS_ACCESS_KEY_ID='local', AWS_SECRET_ACCESS_KEY='local')
+    rows = []
+    for project in args.projects:
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            process = subprocess.run(
+                [sys.executable, '-m', 'bench.handlers', project, '--child',
+                 '--iterations', str(args.iterations),
+                 '--memory-iterations', str(args.memory_iterations),
+                 '--aws-latency-ms', str(args.aws_latency_ms),
+                 '--throttle-rate', str(args.throttle_rate),
+                 '--seed', str(args.seed), '--json', output.name] +
+                (['--provisioned'] if args.provisioned else []),
+                cwd=REPO_ROOT / project, env=env,
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            if process.returncode:
+                print(f'{project} failed:\n{process.stderr[-4000:]}',
+                      file=sys.stderr)
+                continue
+            rows.extend(json.load(open(output.name)))
+    if rows:
+        print_table(rows)
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump(rows, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
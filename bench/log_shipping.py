@@ -0,0 +1,59 @@
+"""Per-invocation logging overhead with the synchronous stdout handler and
+with the background handler. Records go to a pipe drained by a child
+process, which is closer to the Lambda runtime than /dev/null.
+
+    python -m bench.log_shipping --records 50 --invocations 2000
+"""
+import argparse
+import logging
+import subprocess
+
+from bench import measure, print_table, project_source, summarize
+
+EVENT = {'Records': [{'eventName': 'INSERT', 'dynamodb': {
+    'Keys': {'key': {'S': f'key-{i}'}},
+    'NewImage': {'key': {'S': f'key-{i}'}, 'value': {'N': str(i)}}}}
+    for i in range(100)]}
+
+
+def run(records, invocations):
+    with project_source():
+        from commons import log_helper
+
+    sink = subprocess.Popen(['cat'], stdin=subprocess.PIPE,
+                            stdout=subprocess.DEVNULL, text=True)
+    handlers = {
+        'sync': logging.StreamHandler(sink.stdin),
+        'background': log_helper.BackgroundHandler(sink.stdin),
+    }
+    bench_logger = log_helper.get_logger('bench-log-shipping')
+    rows = []
+    try:
+        for name, handler in handlers.items():
+            handler.setFormatter(log_helper.JsonFormatter())
+            log_helper.logger.handlers = [handler]
+
+            def invocation():
+                for i in range(records):
+                    bench_logger.info('Processed record %s of %s', i, EVENT)
+                log_helper.flush_logs()
+
+            rows.append(summarize(name, measure(invocation, invocations)))
+    finally:
+        sink.stdin.close()
+        sink.wait()
+    print_table(rows)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--records', type=int, default=50,
+                        help='log calls per invocation')
+    parser.add_argument('--invocations', type=int, default=1000)
+    args = parser.parse_args()
+    run(args.records, args.invocations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Request body validation against the task11 OpenAPI export: the compiled
+commons.validation closures against a generic validator that walks the
+schema dict on every call, for valid and invalid reservation bodies.
+
+    python -m bench.validation --iterations 20000
+"""
+import argparse
+import json
+import re
+from datetime import date
+
+from bench import REPO_ROOT, measure, print_table, project_source, summarize
+
+EXPORT = REPO_ROOT / 'task11' / 'export' / 'f1zbriu41d_oas_v3.json'
+
+VALID = {
+    'tableNumber': 7, 'clientName': 'Ann', 'phoneNumber': '0501234567',
+    'date': '2024-12-01', 'slotTimeStart': '13:00', 'slotTimeEnd': '15:00'
+}
+INVALID = {
+    'tableNumber': 'seven', 'clientName': '', 'date': '2024-13-01',
+    'slotTimeStart': '1pm', 'slotTimeEnd': '15:00'
+}
+
+_TYPES = {
+    'string': lambda value: type(value) is str,
+    'integer': lambda value: type(value) is int,
+    'number': lambda value: type(value) in (int, float),
+    'boolean': lambda value: type(value) is bool,
+    'object': lambda value: type(value) is dict,
+    'array': lambda value: type(value) is list
+}
+
+
+def interpret(schema, value, path='', errors=None):
+    """The usual hand-rolled validator: every keyword of the schema is
+    looked up and dispatched on every call"""
+    errors = {} if errors is None else errors
+    for keyword, argument in schema.items():
+        if keyword == 'type':
+            if not _TYPES[argument](value):
+                errors[path] = f'Expected {argument}'
+                return errors
+        elif keyword == 'minLength' and len(value) < argument:
+            errors[path] = f'Must be at least {argument} characters long'
+        elif keyword == 'pattern' and not re.search(argument, value):
+            errors[path] = f'Must match {argument}'
+        elif keyword == 'format' and argument == 'date':
+            try:
+                date.fromisoformat(value)
+            except ValueError:
+                errors[path] = 'Must be a valid date'
+        elif keyword == 'required':
+            for name in argument:
+                if name not in value:
+                    errors[f'{path}.{name}' if path else name] = 'Required'
+        elif keyword == 'properties':
+            for name, subschema in argument.items():
+                if name in value:
+                    interpret(subschema, value[name],
+                              f'{path}.{name}' if path else name, errors)
+    return errors
+
+
+def run(iterations):
+    with project_source():
+        from commons import validation
+    document = validation.load_openapi(EXPORT)
+    schema = document['paths']['/reservations']['post']['requestBody'][
+        'content']['application/json']['schema']
+    compiled = validation.compile_schema(schema)
+    assert compiled(VALID) == interpret(schema, VALID) == {}
+    assert set(compiled(INVALID)) == set(interpret(schema, INVALID))
+
+    validator = validation.RequestValidator.from_openapi(document)
+    event = {'httpMethod': 'POST', 'path': '/reservations',
+             'body': json.dumps(VALID)}
+    rows = []
+    for label, body in (('valid', VALID), ('invalid', INVALID)):
+        rows.append(summarize(f'interpreted {label}', measure(
+            lambda: interpret(schema, body), iterations)))
+        rows.append(summarize(f'compiled {label}', measure(
+            lambda: compiled(body), iterations)))
+    rows.append(summarize('RequestValidator event', measure(
+        lambda: validator(event), iterations)))
+    print_table(rows)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=20_000)
+    args = parser.parse_args()
+    run(args.iterations)
+
+
+if __name__ == '__main__':
+    main()
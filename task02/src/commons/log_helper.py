@@ -1,5 +1,15 @@
+import atexit
+import hashlib
+import json
 import logging
+import numbers
 import os
+import queue
+import random
+import threading
+import time
+from collections.abc import Mapping
+from contextlib import contextmanager
 from sys import stdout
 
 _name_to_level = {
@@ -11,22 +21,434 @@ _name_to_level = {
     'DEBUG': logging.DEBUG
 }
 
-logger = logging.getLogger(__name__)
-logger.propagate = False
-console_handler = logging.StreamHandler(stream=stdout)
-console_handler.setFormatter(
-    logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s'))
-logger.addHandler(console_handler)
+DEFAULT_MAX_FIELD_SIZE = 4096
+TRUNCATION_MARKER = '...<truncated>'
+
+# attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {
+    'message', 'asctime'}
+
+
+def _truncate(text, limit):
+    if limit and len(text) > limit:
+        return text[:limit] + TRUNCATION_MARKER
+    return text
+
+
+class _LenientEncoder(json.JSONEncoder):
+
+    def default(self, obj):
+        if isinstance(obj, (set, frozenset)):
+            return list(obj)
+        return str(obj)
+
+
+_ENCODER = _LenientEncoder(separators=(',', ':'))
+
+
+_SPLIT_THRESHOLD = 8
+_SPLIT_DEPTH = 2
+
+
+def _encode_bounded(value, limit, chunks, depth=0):
+    """Appends JSON of `value` to `chunks` and returns the appended size.
+    Outer and large containers are encoded element by element with the C
+    encoder so that encoding stops as soon as `limit` is exceeded"""
+    if not isinstance(value, (dict, list, tuple)) or (
+            depth >= _SPLIT_DEPTH and len(value) <= _SPLIT_THRESHOLD):
+        chunk = _ENCODER.encode(value)
+        chunks.append(chunk)
+        return len(chunk)
+    is_dict = isinstance(value, dict)
+    items = value.items() if is_dict else value
+    chunks.append('{' if is_dict else '[')
+    size = 1
+    for index, item in enumerate(items):
+        if index:
+            chunks.append(',')
+            size += 1
+        if is_dict:
+            key = _ENCODER.encode(str(item[0])) + ':'
+            chunks.append(key)
+            size += len(key)
+            item = item[1]
+        size += _encode_bounded(item, limit - size, chunks, depth + 1)
+        if size > limit:
+            return size
+    chunks.append('}' if is_dict else ']')
+    return size + 1
+
+
+def render(value, limit=DEFAULT_MAX_FIELD_SIZE):
+    """
+    Renders a log argument to text of at most `limit` characters.
+    Large containers stop being encoded as soon as the limit is reached, so
+    logging a huge event costs about as much as logging its first `limit`
+    characters.
+    :param value: any log argument
+    :param limit: maximum size of the rendered text, falsy for unlimited
+    :return: str
+    """
+    if isinstance(value, str):
+        return _truncate(value, limit)
+    if isinstance(value, (dict, list, tuple)):
+        if not limit:
+            return _ENCODER.encode(value)
+        chunks = []
+        _encode_bounded(value, limit, chunks)
+        return _truncate(''.join(chunks), limit)
+    return _truncate(str(value), limit)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line. Message arguments and
+    `extra` fields are rendered here, i.e. only for records that passed the
+    level check, and each of them is capped at `max_field_size`"""
+
+    def __init__(self, max_field_size=DEFAULT_MAX_FIELD_SIZE):
+        super().__init__()
+        self.max_field_size = max_field_size
+
+    def render_argument(self, value):
+        # numbers stay as they are so that %d / %.2f keep working
+        if isinstance(value, numbers.Number):
+            return value
+        return render(value, self.max_field_size)
+
+    def format_message(self, record):
+        limit = self.max_field_size
+        msg = str(record.msg)
+        if not record.args:
+            return _truncate(msg, limit)
+        if isinstance(record.args, Mapping):
+            if '%(' in msg:
+                original = record.args
+                args = {key: self.render_argument(value)
+                        for key, value in original.items()}
+            else:
+                # LogRecord unpacks a lone dict argument into record.args
+                original = (record.args,)
+                args = (render(record.args, limit),)
+        else:
+            original = record.args
+            args = tuple(self.render_argument(arg) for arg in original)
+        try:
+            return _truncate(msg % args, limit)
+        except (TypeError, ValueError, KeyError):
+            pass
+        try:
+            return _truncate(msg % original, limit)
+        except (TypeError, ValueError, KeyError):
+            return render(f'{msg} {args}', limit)
+
+    def format(self, record):
+        entry = {
+            'timestamp': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': self.format_message(record)
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value if isinstance(value, (int, float, bool)) \
+                    else render(value, self.max_field_size)
+        if record.exc_info:
+            entry['exception'] = _truncate(
+                self.formatException(record.exc_info), self.max_field_size)
+        return json.dumps(entry, default=str)
+
+
+class BackgroundHandler(logging.Handler):
+    """Formats records in the calling thread and hands the lines to a
+    daemon writer thread, which coalesces whatever is queued into a single
+    write. `flush` blocks until everything queued so far is written, so it
+    must be called before the invocation returns and the container is
+    frozen"""
+
+    def __init__(self, stream=None, batch_size=512, flush_timeout=2.0):
+        super().__init__()
+        self.stream = stream or stdout
+        self.batch_size = batch_size
+        self.flush_timeout = flush_timeout
+        self._queue = queue.SimpleQueue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    def _ensure_writer(self):
+        if self._writer is None or not self._writer.is_alive():
+            with self._writer_lock:
+                if self._writer is None or not self._writer.is_alive():
+                    self._writer = threading.Thread(
+                        target=self._write_loop, name='log-writer',
+                        daemon=True)
+                    self._writer.start()
+
+    def _write(self, batch):
+        try:
+            self.stream.write(''.join(line for _, line in batch))
+            self.stream.flush()
+        except Exception:
+            # the same reporting StreamHandler does, once per batch
+            self.handleError(batch[0][0])
+
+    def _drain(self, item, batch, barriers):
+        while True:
+            if isinstance(item, threading.Event):
+                barriers.append(item)
+            else:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                return
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _write_loop(self):
+        while True:
+            batch, barriers = [], []
+            self._drain(self._queue.get(), batch, barriers)
+            if batch:
+                self._write(batch)
+            for barrier in barriers:
+                barrier.set()
+
+    def emit(self, record):
+        try:
+            line = self.format(record) + '\n'
+        except Exception:
+            self.handleError(record)
+            return
+        self._ensure_writer()
+        self._queue.put((record, line))
+
+    def flush(self):
+        if self._writer is None:
+            return
+        barrier = threading.Event()
+        self._queue.put(barrier)
+        if barrier.wait(self.flush_timeout):
+            return
+        # the writer is stuck or gone; write what is still queued ourselves
+        # rather than lose it when the container freezes
+        while True:
+            batch, barriers = [], []
+            try:
+                self._drain(self._queue.get_nowait(), batch, barriers)
+            except queue.Empty:
+                return
+            if batch:
+                self._write(batch)
+            for pending in barriers:
+                pending.set()
+
+
+DEFAULT_ERROR_BURST = 5
+DEFAULT_ERROR_WINDOW = 60
+# distinct fingerprints tracked before the oldest are summarized and dropped
+MAX_FINGERPRINTS = 512
+
+
+class _ErrorState:
+    __slots__ = ('fingerprint', 'exception_type', 'logger', 'tokens',
+                 'refilled', 'suppressed', 'total')
+
+    def __init__(self, fingerprint, exception_type, logger, tokens, now):
+        self.fingerprint = fingerprint
+        self.exception_type = exception_type
+        self.logger = logger
+        self.tokens = tokens
+        self.refilled = now
+        self.suppressed = 0
+        self.total = 0
+
+
+class ErrorLog:
+    """Error logging that stays cheap when the same failure repeats, e.g.
+    every record of a batch failing on DynamoDB throttling. Errors are
+    fingerprinted by exception type and traceback, not by message. The
+    first occurrence of a fingerprint is logged with its detail and stack;
+    repeats are logged briefly while the fingerprint's token bucket of
+    `burst` per `window` seconds lasts and only counted afterwards. The
+    counts are logged as one summary per fingerprint every `window`
+    seconds, checked when logs are flushed"""
+
+    def __init__(self, burst=DEFAULT_ERROR_BURST, window=DEFAULT_ERROR_WINDOW,
+                 max_fingerprints=MAX_FINGERPRINTS):
+        self.burst = burst
+        self.window = window
+        self.max_fingerprints = max_fingerprints
+        self._refill_rate = burst / window if window else float('inf')
+        # (exception type, ((code, line), ...)) -> _ErrorState
+        self._states = {}
+        self._lock = threading.Lock()
+        self._next_summary = time.monotonic() + window
+
+    @staticmethod
+    def _key(error):
+        frames = []
+        traceback = error.__traceback__
+        while traceback is not None:
+            frames.append((traceback.tb_frame.f_code, traceback.tb_lineno))
+            traceback = traceback.tb_next
+        return type(error), tuple(frames)
+
+    @staticmethod
+    def fingerprint(key):
+        """
+        :return: short hash of the exception type and the file, function
+            and line of every frame, the same in every container
+        """
+        error_type, frames = key
+        text = ';'.join([f'{error_type.__module__}.{error_type.__qualname__}']
+                        + [f'{code.co_filename}:{code.co_name}:{line}'
+                           for code, line in frames])
+        return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+    def log(self, log, error, msg, *args, detail=None):
+        """
+        Logs an error at ERROR level
+        :param log: logger to log with
+        :param error: the exception
+        :param msg: message format, logged for every logged occurrence
+        :param args: message arguments
+        :param detail: e.g. the event, logged with the stack on the first
+            occurrence only
+        :return: the fingerprint
+        """
+        key = self._key(error)
+        now = time.monotonic()
+        with self._lock:
+            state = self._states.get(key)
+            first = state is None
+            if first:
+                if len(self._states) >= self.max_fingerprints:
+                    self._summarize_locked(now, drop=True)
+                state = _ErrorState(self.fingerprint(key),
+                                    type(error).__name__, log,
+                                    self.burst, now)
+                self._states[key] = state
+            else:
+                state.tokens = min(self.burst, state.tokens + (
+                    now - state.refilled) * self._refill_rate)
+                state.refilled = now
+            state.total += 1
+            if state.tokens < 1:
+                state.suppressed += 1
+                return state.fingerprint
+            state.tokens -= 1
+        extra = {'fingerprint': state.fingerprint}
+        if first:
+            if detail is not None:
+                msg, args = msg + '; Detail: %s', args + (detail,)
+            log.error(msg, *args, exc_info=error, extra=extra)
+        else:
+            extra['occurrences'] = state.total
+            log.error(msg, *args, extra=extra)
+        return state.fingerprint
+
+    def _summarize_locked(self, now, drop=False):
+        for key, state in list(self._states.items()):
+            if state.suppressed:
+                state.logger.warning(
+                    '%s %s repeated %d more times', state.exception_type,
+                    state.fingerprint, state.suppressed,
+                    extra={'fingerprint': state.fingerprint,
+                           'suppressed': state.suppressed,
+                           'occurrences': state.total})
+                state.suppressed = 0
+            elif drop or now - state.refilled > self.window:
+                # quiet for a window: the next occurrence is logged in full
+                del self._states[key]
+        if drop:
+            self._states.clear()
+        self._next_summary = now + self.window
+
+    def summarize(self, force=False):
+        """
+        Logs the suppressed counts when a window has passed since the last
+        summary
+        """
+        now = time.monotonic()
+        if not force and now < self._next_summary:
+            return
+        with self._lock:
+            self._summarize_locked(now)
 
 
 log_level = _name_to_level.get(os.environ.get('log_level'))
 if not log_level:
     log_level = logging.INFO
+max_field_size = int(os.environ.get('log_max_field_size',
+                                    DEFAULT_MAX_FIELD_SIZE))
+debug_sample_rate = float(os.environ.get('log_debug_sample_rate', 0))
+background_logging = os.environ.get('log_background', '').lower() in (
+    'true', '1', 'yes')
+
+logger = logging.getLogger(__name__)
+logger.propagate = False
+logger.setLevel(log_level)
+console_handler = BackgroundHandler(stream=stdout) if background_logging \
+    else logging.StreamHandler(stream=stdout)
+console_handler.setFormatter(JsonFormatter(max_field_size=max_field_size))
+logger.addHandler(console_handler)
 logging.captureWarnings(True)
 
+error_log = ErrorLog(
+    burst=int(os.environ.get('log_error_burst', DEFAULT_ERROR_BURST)),
+    window=float(os.environ.get('log_error_window', DEFAULT_ERROR_WINDOW)))
+
+
+def log_error(log, error, msg, *args, detail=None):
+    """Logs an error through the container's ErrorLog, see ErrorLog.log"""
+    return error_log.log(log, error, msg, *args, detail=detail)
+
+
+def flush_logs():
+    """Blocks until every record emitted so far has been written"""
+    error_log.summarize()
+    for handler in logger.handlers:
+        handler.flush()
 
-def get_logger(log_name, level=log_level):
+
+def _flush_at_exit():
+    try:
+        error_log.summarize(force=True)
+        flush_logs()
+    except (OSError, ValueError):
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def get_logger(log_name, level=None):
+    """
+    Returns a child of the commons logger. Without an explicit level the
+    child follows the commons logger, so per-invocation debug sampling
+    applies to it as well
+    """
     module_logger = logger.getChild(log_name)
     if level:
         module_logger.setLevel(level)
     return module_logger
+
+
+@contextmanager
+def debug_sampling(rate=None):
+    """
+    Lowers the commons logger to DEBUG for the duration of the block with
+    the given probability
+    :param rate: 0..1, defaults to `log_debug_sample_rate` env variable
+    """
+    rate = debug_sample_rate if rate is None else rate
+    if not rate or logger.level <= logging.DEBUG or random.random() >= rate:
+        yield False
+        return
+    previous_level = logger.level
+    logger.setLevel(logging.DEBUG)
+    try:
+        yield True
+    finally:
+        logger.setLevel(previous_level)
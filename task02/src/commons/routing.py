@@ -0,0 +1,201 @@
+"""Declarative routing for API Gateway handlers. Routes are registered with
+decorators when the handler module is imported and compiled into a dict of
+static paths plus a segment trie for templates, so resolving a request
+costs a dict lookup per path segment no matter how many routes exist.
+
+    router = Router()
+
+    class ApiHandler(AbstractLambda):
+
+        @router.route('GET', '/tables/{tableId:int}')
+        def get_table_by_id(self, request):
+            table_id = request.path_params['tableId']
+
+        def handle_request(self, event, context):
+            return router.dispatch(self, event)
+"""
+import base64
+import json
+
+_CONVERTERS = {
+    'str': str,
+    'int': int,
+    'float': float
+}
+
+
+class Request:
+    """API Gateway v1 (REST), v2 (HTTP API) and Function URL events
+    normalized to one shape"""
+    __slots__ = ('event', 'method', 'path', 'query', 'headers', 'body',
+                 'path_params', 'route', '_json')
+
+    def __init__(self, event):
+        self.event = event
+        context = event.get('requestContext') or {}
+        http = context.get('http')
+        if http:
+            self.method = http.get('method', 'GET')
+            self.path = event.get('rawPath') or http.get('path') or '/'
+        else:
+            self.method = event.get('httpMethod') or \
+                context.get('httpMethod', 'GET')
+            self.path = event.get('path') or '/'
+        self.method = self.method.upper()
+        self.query = event.get('queryStringParameters') or {}
+        self.headers = event.get('headers') or {}
+        body = event.get('body')
+        if body and event.get('isBase64Encoded'):
+            body = base64.b64decode(body).decode()
+        self.body = body
+        self.path_params = {}
+        self.route = None
+        self._json = None
+
+    def json(self):
+        """Request body parsed once; {} for an empty body"""
+        if self._json is None:
+            self._json = json.loads(self.body) if self.body else {}
+        return self._json
+
+
+class _Node:
+    __slots__ = ('children', 'param', 'methods')
+
+    def __init__(self):
+        self.children = {}
+        # (name, converter, child node)
+        self.param = None
+        # method -> (function, template)
+        self.methods = None
+
+
+def _split(path):
+    return [segment for segment in path.split('/') if segment]
+
+
+def _json_response(status_code, message, headers=None):
+    return {
+        'statusCode': status_code,
+        'headers': {'Content-Type': 'application/json', **(headers or {})},
+        'body': json.dumps({'message': message})
+    }
+
+
+def not_found(request):
+    return _json_response(404, 'Not found')
+
+
+def method_not_allowed(request, allowed):
+    return _json_response(405, 'Method not allowed',
+                          {'Allow': ', '.join(sorted(allowed))})
+
+
+def bad_request(request, message):
+    return _json_response(400, message)
+
+
+class Router:
+
+    def __init__(self, on_not_found=not_found,
+                 on_method_not_allowed=method_not_allowed,
+                 on_bad_request=bad_request):
+        """
+        :param on_not_found: f(request) -> response
+        :param on_method_not_allowed: f(request, allowed_methods) -> response
+        :param on_bad_request: f(request, message) -> response, used when a
+            typed path parameter does not convert
+        """
+        self.on_not_found = on_not_found
+        self.on_method_not_allowed = on_method_not_allowed
+        self.on_bad_request = on_bad_request
+        # path -> method -> function, for templates without parameters
+        self._static = {}
+        self._root = _Node()
+
+    def add(self, method, template, func):
+        method = method.upper()
+        segments = _split(template)
+        if not any(segment.startswith('{') for segment in segments):
+            path = '/' + '/'.join(segments)
+            methods = self._static.setdefault(path, {})
+            if method in methods:
+                raise ValueError(f'Duplicate route {method} {template}')
+            methods[method] = (func, template)
+            return
+        node = self._root
+        for segment in segments:
+            if segment.startswith('{') and segment.endswith('}'):
+                name, _, type_name = segment[1:-1].partition(':')
+                converter = _CONVERTERS[type_name or 'str']
+                if node.param is None:
+                    node.param = (name, converter, _Node())
+                elif node.param[:2] != (name, converter):
+                    raise ValueError(f'Conflicting parameter in {template}')
+                node = node.param[2]
+            else:
+                node = node.children.setdefault(segment, _Node())
+        if node.methods is None:
+            node.methods = {}
+        if method in node.methods:
+            raise ValueError(f'Duplicate route {method} {template}')
+        node.methods[method] = (func, template)
+
+    def route(self, method, template):
+        """Decorator registering `func` for the method and path template"""
+        def decorator(func):
+            self.add(method, template, func)
+            return func
+        return decorator
+
+    def _match(self, segments):
+        """
+        :return: (methods, params, error) for the path
+        """
+        node, params = self._root, {}
+        for segment in segments:
+            child = node.children.get(segment)
+            if child is not None:
+                node = child
+                continue
+            if node.param is None:
+                return None, params, None
+            name, converter, node = node.param
+            try:
+                params[name] = converter(segment)
+            except ValueError:
+                return None, params, f'Invalid path parameter {name}'
+        return node.methods, params, None
+
+    def resolve(self, request):
+        """
+        Finds the function for the request and fills request.path_params
+        and request.route
+        :return: (function, None) or (None, error response)
+        """
+        methods = self._static.get(request.path.rstrip('/') or '/')
+        error = None
+        if methods is None:
+            methods, request.path_params, error = self._match(
+                _split(request.path))
+        if not methods:
+            if error:
+                return None, self.on_bad_request(request, error)
+            return None, self.on_not_found(request)
+        target = methods.get(request.method)
+        if target is None:
+            return None, self.on_method_not_allowed(request, methods)
+        func, request.route = target
+        return func, None
+
+    def dispatch(self, handler, event):
+        """
+        Calls the matching route function as func(handler, request)
+        :param handler: object the route functions are bound to
+        :param event: API Gateway or Function URL event
+        """
+        request = Request(event)
+        func, error_response = self.resolve(request)
+        if func is None:
+            return error_response
+        return func(handler, request)
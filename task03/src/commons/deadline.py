@@ -0,0 +1,101 @@
+"""The time an invocation has left, taken from the Lambda context. AbstractLambda
+starts a Deadline for every invocation; code below it reads it through
+`current()` to size its timeouts or to stop taking on work:
+
+    response = session.get(url, timeout=deadline.current().timeout(10))
+
+`safety_ms` of the budget is kept back for answering, flushing logs and
+metrics, so timeouts end before Lambda kills the invocation.
+"""
+import os
+import time
+
+DEFAULT_SAFETY_MS = 500
+# shortest timeout worth starting a call with
+MIN_TIMEOUT = 0.05
+
+
+class DeadlineExceeded(Exception):
+    """The invocation has no time left for the operation"""
+
+
+class Deadline:
+
+    def __init__(self, remaining_ms=None, safety_ms=None):
+        """
+        :param remaining_ms: budget of the invocation, None for unlimited
+        :param safety_ms: part of the budget kept back for answering,
+            `deadline_safety_ms` env variable by default
+        """
+        if safety_ms is None:
+            safety_ms = int(os.environ.get('deadline_safety_ms',
+                                           DEFAULT_SAFETY_MS))
+        self.safety_ms = safety_ms
+        self.expires_at = None if remaining_ms is None else \
+            time.monotonic() + (remaining_ms - safety_ms) / 1000
+
+    @classmethod
+    def from_context(cls, context):
+        """
+        :param context: Lambda context; anything without
+            get_remaining_time_in_millis, e.g. a test's {}, is unlimited
+        """
+        get_remaining = getattr(context, 'get_remaining_time_in_millis',
+                                None)
+        return cls(get_remaining() if get_remaining else None)
+
+    def remaining(self):
+        """
+        :return: seconds left for work, inf when unlimited
+        """
+        if self.expires_at is None:
+            return float('inf')
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def remaining_ms(self):
+        return self.remaining() * 1000
+
+    def expired(self, margin_ms=0):
+        """
+        :param margin_ms: time the next piece of work needs
+        """
+        return self.remaining_ms() <= margin_ms
+
+    def check(self, margin_ms=0):
+        """Raises DeadlineExceeded when less than margin_ms is left"""
+        if self.expired(margin_ms):
+            raise DeadlineExceeded(f'{self.remaining_ms():.0f} ms left')
+
+    def timeout(self, default):
+        """
+        :param default: timeout in seconds when time is plentiful
+        :return: the default capped to the time left
+        """
+        remaining = self.remaining()
+        if remaining < MIN_TIMEOUT:
+            raise DeadlineExceeded(f'{remaining * 1000:.0f} ms left')
+        return min(default, remaining)
+
+
+UNLIMITED = Deadline(None, safety_ms=0)
+_current = UNLIMITED
+
+
+def current():
+    """The running invocation's deadline, UNLIMITED outside of one"""
+    return _current
+
+
+def start(context):
+    """
+    Makes the context's remaining time the current deadline
+    :return: Deadline
+    """
+    global _current
+    _current = Deadline.from_context(context)
+    return _current
+
+
+def clear():
+    global _current
+    _current = UNLIMITED
@@ -0,0 +1,86 @@
+"""Opt-in per-invocation memory profile. With `memory_profile_rate` above 0,
+that share of the invocations runs under tracemalloc and logs its peak
+allocation and the sites holding the most memory when the handler
+returns, i.e. while the response is still alive:
+
+    {"message": "Memory peak 5321.4 KiB", "memory": {"peak_kib": 5321.4,
+     "top": [{"site": "lambdas/api_handler/handler.py:316", ...}]}}
+
+tracemalloc slows every allocation down several times and snapshots cost
+time proportional to the live blocks, so keep the rate low in production.
+"""
+import os
+import random
+
+DEFAULT_TOP = 5
+DEFAULT_FRAMES = 1
+
+
+class MemoryProfiler:
+
+    def __init__(self, rate=0.0, top=DEFAULT_TOP, frames=DEFAULT_FRAMES):
+        """
+        :param rate: 0..1, share of the invocations profiled
+        :param top: allocation sites reported
+        :param frames: stack frames kept per allocation; more tells callers
+            apart at a higher cost
+        """
+        self.rate = rate
+        self.top = top
+        self.frames = frames
+        self._baseline = None
+        self._start_size = None
+        self._started_tracing = False
+
+    def start(self):
+        """
+        Starts profiling an invocation, sampled by rate
+        :return: whether the invocation is profiled
+        """
+        if not self.rate or (self.rate < 1 and random.random() >= self.rate):
+            return False
+        import tracemalloc
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start(self.frames)
+        self._baseline = tracemalloc.take_snapshot() if self.top else None
+        tracemalloc.reset_peak()
+        self._start_size = tracemalloc.get_traced_memory()[0]
+        return True
+
+    def stop(self):
+        """
+        :return: the invocation's report, None when it was not profiled:
+            {'peak_kib': float, 'allocated_kib': float,
+             'top': [{'site': str, 'size_kib': float, 'count': int}]},
+            allocated being what is still held
+        """
+        if self._start_size is None:
+            return None
+        import tracemalloc
+        size, peak = tracemalloc.get_traced_memory()
+        report = {'peak_kib': round((peak - self._start_size) / 1024, 1),
+                  'allocated_kib': round((size - self._start_size) / 1024,
+                                         1)}
+        if self._baseline is not None:
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),))
+            differences = snapshot.compare_to(self._baseline, 'lineno')
+            report['top'] = [{
+                'site': f'{difference.traceback[0].filename}:'
+                        f'{difference.traceback[0].lineno}',
+                'size_kib': round(difference.size_diff / 1024, 1),
+                'count': difference.count_diff
+            } for difference in differences[:self.top]
+                if difference.size_diff > 0]
+        if self._started_tracing:
+            tracemalloc.stop()
+        self._baseline = self._start_size = None
+        self._started_tracing = False
+        return report
+
+
+profiler = MemoryProfiler(
+    rate=float(os.environ.get('memory_profile_rate', 0)),
+    top=int(os.environ.get('memory_profile_top', DEFAULT_TOP)),
+    frames=int(os.environ.get('memory_profile_frames', DEFAULT_FRAMES)))
@@ -1,45 +1,52 @@
 from commons.log_helper import get_logger
 from commons.abstract_lambda import AbstractLambda
+from commons.routing import Router
 import json
 
 _LOG = get_logger('HelloWorld-handler')
 
 
+def bad_request(request, *args):
+    error_message = {
+        "statusCode": 400,
+        "message": f"Bad request syntax or unsupported method. Request path: {request.path}. HTTP method: {request.method}"
+    }
+    error_response = {
+        "statusCode": 400,
+        "headers": {
+            "Content-Type": "application/json"
+        },
+        "body": json.dumps(error_message)
+    }
+    return error_response
+
+
+router = Router(on_not_found=bad_request, on_method_not_allowed=bad_request,
+                on_bad_request=bad_request)
+
+
 class HelloWorld(AbstractLambda):
 
     def validate_request(self, event) -> dict:
         pass
 
+    @router.route('GET', '/events')
+    def hello(self, request):
+        response_body = {
+            "statusCode": 200,
+            "message": "Hello from Lambda",
+        }
+        response = {
+            "statusCode": 200,
+            "headers": {
+                "Content-Type": "application/json"
+            },
+            "body": json.dumps(response_body)
+        }
+        return response
+
     def handle_request(self, event, context):
-        path = event.get("path", "/")
-        method = event["requestContext"]["httpMethod"]
-        if  method == "GET" and path == "/events":
-            response_body = {
-                "statusCode": 200,
-                "message": "Hello from Lambda",
-            }
-            response = {
-                "statusCode": 200,
-                "headers": {
-                    "Content-Type": "application/json"
-                },
-                "body": json.dumps(response_body)
-            }
-            return response
-
-        else:
-            error_message = {
-                "statusCode": 400,
-                "message": f"Bad request syntax or unsupported method. Request path: {path}. HTTP method: {method}"
-            }
-            error_response = {
-                "statusCode": 400,
-                "headers": {
-                    "Content-Type": "application/json"
-                },
-                "body": json.dumps(error_message)
-            }
-            return error_response
+        return router.dispatch(self, event)
 
 HANDLER = HelloWorld()
 
@@ -1,6 +1,5 @@
 from commons.log_helper import get_logger
 from commons.abstract_lambda import AbstractLambda
-import json
 
 _LOG = get_logger('SnsHandler-handler')
 
@@ -12,10 +11,12 @@ class SnsHandler(AbstractLambda):
         pass
 
     def handle_request(self, event, context):
-        _LOG.info("Received SNS event: %s", json.dumps(event))
+        records = event.get('Records', [])
+        _LOG.info("Received %d SNS records", len(records))
+        _LOG.debug("Received SNS event: %s", event)
 
         # Process each record in the SNS event
-        for record in event.get('Records', []):
+        for record in records:
             sns_message = record.get('Sns', {}).get('Message', '')
             _LOG.info("SNS Message: %s", sns_message)
         return 200
@@ -1,23 +1,30 @@
 from commons.log_helper import get_logger
 from commons.abstract_lambda import AbstractLambda
-import json
+from commons.batch import BatchProcessor
 
 _LOG = get_logger('SqsHandler-handler')
 
 
+def process_record(record):
+    message_body = record['body']
+    _LOG.info("Message body: %s", message_body)
+
+
+PROCESSOR = BatchProcessor(process_record)
+
+
 class SqsHandler(AbstractLambda):
 
     def validate_request(self, event) -> dict:
         pass
         
     def handle_request(self, event, context):
-        _LOG.info("Received event: %s", json.dumps(event))
+        records = event.get('Records', [])
+        _LOG.info("Received %d records", len(records))
+        _LOG.debug("Received event: %s", event)
 
-        # Process each record in the SQS event
-        for record in event.get('Records', []):
-            message_body = record['body']
-            _LOG.info("Message body: %s", message_body)
-        return 200
+        # Only the records that failed are delivered again
+        return PROCESSOR.process(event)
     
 
 HANDLER = SqsHandler()
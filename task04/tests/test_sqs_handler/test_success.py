@@ -4,5 +4,13 @@ from tests.test_sqs_handler import SqsHandlerLambdaTestCase
 class TestSuccess(SqsHandlerLambdaTestCase):
 
     def test_success(self):
-        self.assertEqual(self.HANDLER.handle_request(dict(), dict()), 200)
+        self.assertEqual(self.HANDLER.handle_request(dict(), dict()),
+                         {'batchItemFailures': []})
 
+    def test_failed_records_are_reported(self):
+        event = {'Records': [
+            {'messageId': '1', 'eventSource': 'aws:sqs', 'body': 'ok'},
+            {'messageId': '2', 'eventSource': 'aws:sqs'},
+            {'messageId': '3', 'eventSource': 'aws:sqs', 'body': 'ok'}]}
+        self.assertEqual(self.HANDLER.handle_request(event, dict()),
+                         {'batchItemFailures': [{'itemIdentifier': '2'}]})
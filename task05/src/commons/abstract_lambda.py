@@ -1,12 +1,33 @@
+import json
+import os
+import time
+import uuid
 from abc import abstractmethod
 
-from commons import ApplicationException, build_response
-from commons.log_helper import get_logger
+from commons import ApplicationException, build_response, deadline, \
+    tracing
+from commons.deadline import DeadlineExceeded
+from commons.log_helper import debug_sampling, flush_logs, get_logger, \
+    log_error
+from commons.memory import profiler as memory_profiler
+from commons.metrics import event_dimension, metrics
 
 _LOG = get_logger('abstract-lambda')
 
+# identifies the execution environment in warm-up responses
+CONTAINER_ID = uuid.uuid4().hex
+# API requests arriving with less time left are answered 503 right away
+DEFAULT_API_MIN_REMAINING_MS = 1000
+
 
 class AbstractLambda:
+    _prewarmed = False
+    # report of the last invocation memory_profile_rate sampled
+    memory_report = None
+    # time the running invocation has left, see commons.deadline
+    deadline = deadline.UNLIMITED
+    api_min_remaining_ms = int(os.environ.get(
+        'deadline_api_min_ms', DEFAULT_API_MIN_REMAINING_MS))
 
     @abstractmethod
     def validate_request(self, event) -> dict:
@@ -27,25 +48,130 @@ class AbstractLambda:
         """
         pass
 
+    def invalid_request_response(self, errors):
+        """
+        Answers an event validate_request found errors in, before
+        handle_request spends any calls on it
+        :param errors: dict with attribute_name in key and error_message
+            in value
+        """
+        return {
+            'statusCode': 400,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'message': 'Invalid request',
+                                'errors': errors})
+        }
+
+    def service_unavailable_response(self):
+        """
+        Answers an API request there is not enough time left to handle, so
+        the client can retry instead of waiting for the Lambda timeout
+        """
+        return {
+            'statusCode': 503,
+            'headers': {'Content-Type': 'application/json',
+                        'Retry-After': '1'},
+            'body': json.dumps({'message': 'Service unavailable'})
+        }
+
+    def invoke_handler(self, event, context):
+        """
+        Calls handle_request; AsyncAbstractLambda runs it on its event loop
+        """
+        return self.handle_request(event=event, context=context)
+
+    def prewarm(self):
+        """
+        Initializes whatever the first real request would otherwise pay
+        for: clients, connections, caches, lazily imported modules.
+        Called once per container by the first warm-up invocation
+        """
+        pass
+
+    def warm_up(self, event):
+        """
+        Handles a warm-up invocation
+        :param event: {"warm_up": true, "warm_up_hold_ms": int}; holding
+            the container keeps concurrent warm-ups from reusing it
+        :return: dict with the container id and prewarm elapsed time
+        """
+        prewarmed, elapsed_ms = False, 0.0
+        if not self._prewarmed:
+            start = time.perf_counter()
+            try:
+                self.prewarm()
+                self._prewarmed = prewarmed = True
+            except Exception as e:
+                _LOG.warning('Prewarm failed: %s', e)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            _LOG.info('Prewarm finished in %.1f ms', elapsed_ms)
+        hold_ms = event.get('warm_up_hold_ms')
+        if hold_ms:
+            time.sleep(min(int(hold_ms), 5000) / 1000)
+        return {
+            'warm_up': True,
+            'container_id': CONTAINER_ID,
+            'prewarmed': prewarmed,
+            'prewarm_ms': round(elapsed_ms, 3)
+        }
+
+    def _report_memory(self):
+        report = memory_profiler.stop()
+        if report is not None:
+            self.memory_report = report
+            _LOG.info('Memory peak %.1f KiB', report['peak_kib'],
+                      extra={'memory': report})
+
     def lambda_handler(self, event, context):
         try:
-            _LOG.debug(f'Request: {event}')
+            with debug_sampling():
+                return self._execute(event=event, context=context)
+        finally:
+            flush_logs()
+
+    def _execute(self, event, context):
+        started = time.perf_counter()
+        metrics.start_invocation(event)
+        self.deadline = deadline.start(context)
+        tracing.begin()
+        memory_profiler.start()
+        is_api = event_dimension(event)[0] == 'Route'
+        try:
+            _LOG.debug('Request: %s', event)
             if event.get('warm_up'):
-                return
+                return self.warm_up(event)
+            if is_api and self.deadline.expired(self.api_min_remaining_ms):
+                _LOG.warning('%.0f ms left, answering 503',
+                             self.deadline.remaining_ms())
+                return self.service_unavailable_response()
             errors = self.validate_request(event=event)
+            validated = time.perf_counter()
+            metrics.record('validation', validated - started)
             if errors:
-                return build_response(code=400,
-                                      content=errors)
-            execution_result = self.handle_request(event=event,
+                return self.invalid_request_response(errors)
+            execution_result = self.invoke_handler(event=event,
                                                    context=context)
-            _LOG.debug(f'Response: {execution_result}')
+            metrics.record('handle_request', time.perf_counter() - validated)
+            _LOG.debug('Response: %s', execution_result)
             return execution_result
+        except DeadlineExceeded as e:
+            log_error(_LOG, e, 'Deadline exceeded; Error: %s', e,
+                      detail=event)
+            if is_api:
+                return self.service_unavailable_response()
+            raise
         except ApplicationException as e:
-            _LOG.error(f'Error occurred; Event: {event}; Error: {e}')
+            log_error(_LOG, e, 'Error occurred; Error: %s', e, detail=event)
             return build_response(code=e.code,
                                   content=e.content)
         except Exception as e:
-            _LOG.error(
-                f'Unexpected error occurred; Event: {event}; Error: {e}')
+            log_error(_LOG, e, 'Unexpected error occurred; Error: %s', e,
+                      detail=event)
             return build_response(code=500,
                                   content='Internal server error')
+        finally:
+            self._report_memory()
+            metrics.record('total', time.perf_counter() - started)
+            metrics.end_invocation()
+            tracing.end()
+            deadline.clear()
@@ -0,0 +1,67 @@
+"""JSON encoding of DynamoDB items in a single pass. Decimals become ints
+when integral and floats otherwise, sets become lists and Binary/bytes
+become base64 strings. orjson is used when it is installed, the stdlib
+encoder otherwise."""
+import base64
+import json
+from decimal import Decimal
+
+try:
+    import orjson
+except ImportError:  # the stdlib is always there
+    orjson = None
+
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def default(obj):
+    """Converts the types DynamoDB returns that JSON does not know"""
+    if isinstance(obj, Decimal):
+        if obj == obj.to_integral_value():
+            value = int(obj)
+            # orjson refuses integers wider than 64 bits
+            if _INT64_MIN <= value <= _INT64_MAX:
+                return value
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj) if all(isinstance(item, str) for item in obj) \
+            else list(obj)
+    if isinstance(obj, (bytes, bytearray)):
+        return base64.b64encode(obj).decode()
+    # boto3.dynamodb.types.Binary, checked by name to keep boto3 unimported
+    if type(obj).__name__ == 'Binary' and hasattr(obj, 'value'):
+        return base64.b64encode(obj.value).decode()
+    raise TypeError(f'Object of type {type(obj).__name__} '
+                    f'is not JSON serializable')
+
+
+if orjson is not None:
+    def dumpb(obj):
+        """
+        :return: JSON as UTF-8 bytes
+        """
+        return orjson.dumps(obj, default=default)
+
+    def dumps(obj):
+        """
+        :return: JSON as str, e.g. for an API Gateway response body
+        """
+        return orjson.dumps(obj, default=default).decode()
+else:
+    _encoder = json.JSONEncoder(default=default, ensure_ascii=False,
+                                separators=(',', ':'))
+
+    def dumpb(obj):
+        """
+        :return: JSON as UTF-8 bytes
+        """
+        return _encoder.encode(obj).encode()
+
+    def dumps(obj):
+        """
+        :return: JSON as str, e.g. for an API Gateway response body
+        """
+        return _encoder.encode(obj)
+
+
+BACKEND = 'orjson' if orjson is not None else 'json'
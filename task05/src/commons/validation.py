@@ -0,0 +1,335 @@
+"""Request validation compiled from JSON schemas. Each schema is turned into
+nested closures once, at import, so validating a request only runs the
+checks its schema declares instead of walking the schema dict again.
+
+    VALIDATOR = RequestValidator.from_openapi(load_openapi(path))
+
+    class ApiHandler(AbstractLambda):
+
+        def validate_request(self, event) -> dict:
+            return VALIDATOR(event)
+
+Errors are reported as {field: message}, e.g. {'tableNumber': 'Required'},
+which is what AbstractLambda.validate_request returns.
+"""
+import json
+import re
+from datetime import date, datetime
+
+from commons.routing import Request, Router
+
+_METHODS = ('get', 'put', 'post', 'delete', 'patch', 'head', 'options')
+_EMAIL = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+_TYPE_CHECKS = {
+    'string': lambda value: type(value) is str,
+    'integer': lambda value: type(value) is int,
+    'number': lambda value: type(value) in (int, float),
+    'boolean': lambda value: value is True or value is False,
+    'object': lambda value: type(value) is dict,
+    'array': lambda value: type(value) is list,
+    'null': lambda value: value is None
+}
+
+
+def _to_boolean(value):
+    lowered = value.lower()
+    if lowered not in ('true', 'false'):
+        raise ValueError(value)
+    return lowered == 'true'
+
+
+# query and path parameters arrive as strings
+_COERCIONS = {
+    'integer': int,
+    'number': float,
+    'boolean': _to_boolean
+}
+
+
+def _is_date(value):
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_date_time(value):
+    # fromisoformat learnt the Z suffix only in 3.11
+    if value.endswith(('Z', 'z')):
+        value = value[:-1] + '+00:00'
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        return False
+    return 'T' in value or ' ' in value
+
+
+_FORMATS = {
+    'date': _is_date,
+    'date-time': _is_date_time,
+    'email': lambda value: _EMAIL.match(value) is not None
+}
+
+
+def _resolve(schema, components):
+    while '$ref' in schema:
+        # '#/components/schemas/Name'
+        name = schema['$ref'].rsplit('/', 1)[-1]
+        schema = components[name]
+    return schema
+
+
+def _join(path, name):
+    return f'{path}.{name}' if path else name
+
+
+def _value_checks(schema):
+    """
+    :return: functions returning an error message or None, only for the
+        keywords the schema has
+    """
+    # each message is bound as a default, the closures would all see the
+    # last one otherwise
+    checks = []
+    if 'enum' in schema:
+        allowed = schema['enum']
+        message = f'Must be one of {", ".join(map(str, allowed))}'
+        checks.append(lambda value, message=message:
+                      None if value in allowed else message)
+    if 'minimum' in schema:
+        minimum = schema['minimum']
+        message = f'Must be at least {minimum}'
+        checks.append(lambda value, message=message:
+                      None if value >= minimum else message)
+    if 'maximum' in schema:
+        maximum = schema['maximum']
+        message = f'Must be at most {maximum}'
+        checks.append(lambda value, message=message:
+                      None if value <= maximum else message)
+    if 'minLength' in schema:
+        min_length = schema['minLength']
+        message = f'Must be at least {min_length} characters long'
+        checks.append(lambda value, message=message:
+                      None if len(value) >= min_length else message)
+    if 'maxLength' in schema:
+        max_length = schema['maxLength']
+        message = f'Must be at most {max_length} characters long'
+        checks.append(lambda value, message=message:
+                      None if len(value) <= max_length else message)
+    if 'pattern' in schema:
+        search = re.compile(schema['pattern']).search
+        message = f'Must match {schema["pattern"]}'
+        checks.append(lambda value, message=message:
+                      None if search(value) is not None else message)
+    is_format = _FORMATS.get(schema.get('format'))
+    if is_format is not None:
+        message = f'Must be a valid {schema["format"]}'
+        checks.append(lambda value, message=message:
+                      None if is_format(value) else message)
+    return checks
+
+
+def _compile(schema, components, coerce=False):
+    """
+    :return: validate(value, path, errors) adding {path: message} to errors
+    """
+    schema = _resolve(schema, components)
+    type_name = schema.get('type')
+    is_type = _TYPE_CHECKS.get(type_name)
+    convert = _COERCIONS.get(type_name) if coerce else None
+    nullable = schema.get('nullable', False)
+    expected = f'Expected {type_name}'
+    checks = _value_checks(schema)
+
+    properties = tuple(
+        (name, _compile(value, components))
+        for name, value in schema.get('properties', {}).items())
+    required = tuple(schema.get('required', ()))
+    known = frozenset(name for name, _ in properties)
+    closed = schema.get('additionalProperties') is False
+    items = schema.get('items')
+    validate_item = _compile(items, components) if items else None
+
+    def validate(value, path, errors):
+        if value is None and nullable:
+            return
+        if convert is not None and type(value) is str:
+            try:
+                value = convert(value)
+            except ValueError:
+                errors[path] = expected
+                return
+        if is_type is not None and not is_type(value):
+            errors[path] = expected
+            return
+        for check in checks:
+            message = check(value)
+            if message is not None:
+                errors[path] = message
+                return
+        if type(value) is dict:
+            for name in required:
+                if name not in value:
+                    errors[_join(path, name)] = 'Required'
+            for name, validate_property in properties:
+                if name in value:
+                    validate_property(value[name], _join(path, name), errors)
+            if closed:
+                for name in value:
+                    if name not in known:
+                        errors[_join(path, name)] = 'Unexpected field'
+        elif validate_item is not None and type(value) is list:
+            for index, item in enumerate(value):
+                validate_item(item, f'{path}[{index}]', errors)
+    return validate
+
+
+def compile_schema(schema, components=None, coerce=False):
+    """
+    :param schema: JSON schema, the OpenAPI 3.0 subset: type, nullable,
+        properties, required, additionalProperties: false, items, enum,
+        minimum, maximum, minLength, maxLength, pattern, format and $ref
+    :param components: name -> schema, what $ref points into
+    :param coerce: accept strings convertible to integer, number and
+        boolean, as query and path parameters are
+    :return: validate(value) -> dict of errors, empty when valid
+    """
+    validate = _compile(schema, components or {}, coerce)
+
+    def validate_value(value):
+        errors = {}
+        validate(value, '', errors)
+        return errors
+    return validate_value
+
+
+class _RouteValidator:
+    __slots__ = ('body', 'body_required', 'query', 'path')
+
+    def __init__(self, body, body_required, query, path):
+        self.body = body
+        self.body_required = body_required
+        # ((name, required, validate), ...)
+        self.query = query
+        self.path = path
+
+    def __call__(self, request):
+        errors = {}
+        for name, is_required, validate in self.path:
+            value = request.path_params.get(name)
+            if value is not None:
+                validate(value, name, errors)
+        for name, is_required, validate in self.query:
+            value = request.query.get(name)
+            if value is None:
+                if is_required:
+                    errors[name] = 'Required'
+            else:
+                validate(value, name, errors)
+        if self.body is not None:
+            if not request.body:
+                if self.body_required:
+                    errors['body'] = 'Required'
+                return errors
+            try:
+                body = request.json()
+            except ValueError:
+                errors['body'] = 'Invalid JSON'
+                return errors
+            self.body(body, '', errors)
+        return errors
+
+
+def _no_route(request, *args):
+    return None
+
+
+class RequestValidator:
+    """Validates API Gateway events against the schemas of their route.
+    Events of routes without schemas pass, the handler answers those"""
+
+    def __init__(self):
+        # untyped templates: parameters are checked by their schemas
+        self._router = Router(on_not_found=_no_route,
+                              on_method_not_allowed=_no_route,
+                              on_bad_request=_no_route)
+
+    def add(self, method, template, body=None, query=None, path=None,
+            body_required=True, components=None):
+        """
+        :param method: HTTP method
+        :param template: path template, e.g. '/tables/{tableId}'
+        :param body: JSON schema of the body
+        :param query: name -> schema of the query string parameters; a
+            parameter is required when its schema has 'required': True
+        :param path: name -> schema of the path parameters
+        :param body_required: whether a request without a body is invalid
+        :param components: name -> schema, what $ref points into
+        """
+        components = components or {}
+
+        def parameters(schemas):
+            compiled = []
+            for name, schema in (schemas or {}).items():
+                schema = dict(schema)
+                is_required = schema.pop('required', False) is True
+                compiled.append((name, is_required,
+                                 _compile(schema, components, coerce=True)))
+            return tuple(compiled)
+        self._router.add(method, template, _RouteValidator(
+            body=_compile(body, components) if body else None,
+            body_required=body_required,
+            query=parameters(query),
+            path=parameters(path)))
+
+    @classmethod
+    def from_openapi(cls, document):
+        """
+        Compiles the request body and parameter schemas of every operation
+        :param document: OpenAPI 3.0 document as a dict
+        """
+        validator = cls()
+        components = document.get('components', {}).get('schemas', {})
+        for template, path_item in document.get('paths', {}).items():
+            shared = path_item.get('parameters', [])
+            for method in _METHODS:
+                operation = path_item.get(method)
+                if operation is None:
+                    continue
+                query, path = {}, {}
+                for parameter in shared + operation.get('parameters', []):
+                    schema = dict(parameter.get('schema', {}),
+                                  required=parameter.get('required', False))
+                    if parameter.get('in') == 'query':
+                        query[parameter['name']] = schema
+                    elif parameter.get('in') == 'path':
+                        path[parameter['name']] = schema
+                body, body_required = None, False
+                request_body = operation.get('requestBody')
+                if request_body:
+                    body = request_body.get('content', {}).get(
+                        'application/json', {}).get('schema')
+                    body_required = request_body.get('required', False)
+                if body or query or path:
+                    validator.add(method, template, body=body, query=query,
+                                  path=path, body_required=body_required,
+                                  components=components)
+        return validator
+
+    def __call__(self, event):
+        """
+        :param event: API Gateway or Function URL event
+        :return: dict with attribute_name in key and error_message in value
+        """
+        request = Request(event)
+        validate, _ = self._router.resolve(request)
+        if validate is None:
+            return {}
+        return validate(request)
+
+
+def load_openapi(path):
+    with open(path) as document:
+        return json.load(document)
@@ -2,25 +2,43 @@ from commons.log_helper import get_logger
 from commons.abstract_lambda import AbstractLambda
 import json
 import uuid
-import boto3
-from botocore.exceptions import ClientError
-from decimal import Decimal
+from commons import codec
+from commons.config import Config, TableSetting
+from commons.validation import RequestValidator
 from datetime import datetime
-import os
 
 _LOG = get_logger("ApiHandler-handler")
-dynamodb = boto3.resource("dynamodb")
-table_name = os.environ.get("target_table", "Events")
-table = dynamodb.Table(table_name)
+
+
+class Settings(Config):
+    events = TableSetting("target_table", local_default="Events")
+
+
+CONFIG = Settings()
 
 check_status = "/status"
 events_path = "/events"
 
+VALIDATOR = RequestValidator()
+VALIDATOR.add("POST", events_path, body={
+    "type": "object",
+    "properties": {
+        "principalId": {"type": "integer"},
+        "content": {"type": "object"}
+    },
+    "required": ["principalId", "content"]
+})
+
 
 class ApiHandler(AbstractLambda):
 
     def validate_request(self, event) -> dict:
-        pass
+        return VALIDATOR(event)
+
+    def prewarm(self):
+        import botocore.exceptions  # noqa: F401
+        # opens the pooled connection to DynamoDB
+        CONFIG.events.table.get_item(Key={"id": "warm-up"})
 
     def handle_request(self, event, context):
         _LOG.info("Request event: %s", event)
@@ -50,6 +68,8 @@ class ApiHandler(AbstractLambda):
         return response
 
     def save_events(self, request_body):
+        # botocore is loaded by the first DynamoDB call anyway
+        from botocore.exceptions import ClientError
         try:
             id = request_body.get("id")
             principal_id = request_body.get("principalId")
@@ -63,6 +83,7 @@ class ApiHandler(AbstractLambda):
             }
             # Log the item before saving to DynamoDB
             _LOG.info("Item to be saved to DynamoDB: %s", item)
+            table = CONFIG.events.table
             table.put_item(Item=item)
             # Fetch the item back from DynamoDB to verify it was saved
             response = table.get_item(Key={"id": id})
@@ -93,22 +114,10 @@ class ApiHandler(AbstractLambda):
             'headers': {
                 'Content-Type': 'application/json'
             },
-            'body': json.dumps(body, cls=DecimalEncoder)
+            'body': codec.dumps(body)
         }
 
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            # Check if it's an int or a float
-            if obj % 1 == 0:
-                return int(obj)
-            else:
-                return float(obj)
-        # Let the base class default method raise the TypeError
-        return super(DecimalEncoder, self).default(obj)
-
-
 HANDLER = ApiHandler()
 
 
@@ -0,0 +1,438 @@
+"""Spans around botocore calls, requests calls and named blocks of code,
+exported as X-Ray segment documents:
+
+    with tracing.span('convert_forecast'):
+        ...
+
+AbstractLambda begins a trace for every invocation and exports its spans
+when the invocation ends. Whether an invocation is traced is decided once,
+at its start (head sampling), by `tracing_mode`:
+
+- off: nothing is traced, span() returns a shared no-op span
+- xray: follows the Lambda's active tracing; sampled invocations have
+  Sampled=1 in _X_AMZN_TRACE_ID and spans become subsegments of the
+  function segment
+- sampled: `tracing_sample_rate` of the invocations are traced, each as
+  a segment of its own, e.g. for a local collector
+
+Spans are exported by `tracing_exporter`: 'xray' sends them over UDP to
+AWS_XRAY_DAEMON_ADDRESS (the X-Ray daemon or any local collector), 'log'
+writes one JSON line per span to the log stream.
+"""
+import functools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from sys import stdout
+from urllib.parse import urlsplit
+
+OFF = 'off'
+XRAY = 'xray'
+SAMPLED = 'sampled'
+DEFAULT_SAMPLE_RATE = 0.05
+DEFAULT_DAEMON_ADDRESS = '127.0.0.1:2000'
+_UDP_HEADER = '{"format": "json", "version": 1}\n'
+
+
+def _new_id():
+    return os.urandom(8).hex()
+
+
+def _new_trace_id():
+    return f'1-{int(time.time()):08x}-{os.urandom(12).hex()}'
+
+
+def parse_trace_header(header):
+    """
+    :param header: 'Root=1-...;Parent=...;Sampled=1', the format of
+        _X_AMZN_TRACE_ID and X-Amzn-Trace-Id
+    :return: dict of its fields
+    """
+    fields = {}
+    for part in (header or '').split(';'):
+        key, _, value = part.partition('=')
+        if value:
+            fields[key.strip()] = value.strip()
+    return fields
+
+
+class _NoopSpan:
+    """What span() returns when the invocation is not traced"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def annotate(self, key, value):
+        pass
+
+    def set_http(self, method=None, url=None, status=None):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ('trace', 'name', 'id', 'parent_id', 'namespace',
+                 'start_time', 'end_time', 'annotations', 'aws', 'http',
+                 'error', 'fault', 'throttle', 'cause', 'is_segment')
+
+    def __init__(self, trace, name, parent_id, namespace=None,
+                 annotations=None, is_segment=False):
+        self.trace = trace
+        self.name = name
+        self.id = _new_id()
+        self.parent_id = parent_id
+        self.namespace = namespace
+        self.start_time = time.time()
+        self.end_time = None
+        self.annotations = annotations or {}
+        self.aws = None
+        self.http = None
+        self.error = self.fault = self.throttle = False
+        self.cause = None
+        self.is_segment = is_segment
+
+    def __enter__(self):
+        self.trace.tracer._push(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.trace.tracer._pop(self)
+        if exc_val is not None:
+            self.set_exception(exc_val)
+        self.close()
+        return False
+
+    def annotate(self, key, value):
+        """Annotations are indexed by X-Ray and can be filtered on"""
+        self.annotations[key] = value
+
+    def set_http(self, method=None, url=None, status=None):
+        http = self.http = self.http or {}
+        if method is not None:
+            http['request'] = {'method': method, 'url': url}
+        if status is not None:
+            http['response'] = {'status': status}
+            if status == 429:
+                self.throttle = self.error = True
+            elif 400 <= status < 500:
+                self.error = True
+            elif status >= 500:
+                self.fault = True
+
+    def set_exception(self, error):
+        self.fault = True
+        self.cause = {'exceptions': [{'id': _new_id(),
+                                      'type': type(error).__name__,
+                                      'message': str(error)[:256]}]}
+
+    def close(self):
+        if self.end_time is None:
+            self.end_time = time.time()
+            self.trace.finished.append(self)
+
+    def to_document(self):
+        """
+        :return: X-Ray segment document; a subsegment unless the span is
+            the root of a trace without a Lambda function segment
+        """
+        document = {'name': self.name, 'id': self.id,
+                    'trace_id': self.trace.trace_id,
+                    'start_time': self.start_time,
+                    'end_time': self.end_time}
+        if self.is_segment:
+            document['origin'] = 'AWS::Lambda::Function'
+        else:
+            document['type'] = 'subsegment'
+        if self.parent_id:
+            document['parent_id'] = self.parent_id
+        for key in ('namespace', 'aws', 'http', 'cause'):
+            value = getattr(self, key)
+            if value:
+                document[key] = value
+        if self.annotations:
+            document['annotations'] = self.annotations
+        for key in ('error', 'fault', 'throttle'):
+            if getattr(self, key):
+                document[key] = True
+        return document
+
+
+class Trace:
+
+    def __init__(self, tracer, trace_id, parent_id):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.finished = []
+        self.root = None
+
+
+class LogExporter:
+    """One JSON line per span on the log stream, for offline testing"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or stdout
+
+    def export(self, documents):
+        self.stream.write(''.join(
+            json.dumps({'trace_span': document}, default=str) + '\n'
+            for document in documents))
+        self.stream.flush()
+
+
+class UdpExporter:
+    """Sends the documents to the X-Ray daemon or another collector that
+    speaks its UDP protocol"""
+
+    def __init__(self, address=None):
+        address = address or os.environ.get('AWS_XRAY_DAEMON_ADDRESS',
+                                            DEFAULT_DAEMON_ADDRESS)
+        # 'udp:host:port tcp:host:port' or 'host:port'
+        for part in address.split():
+            if not part.startswith('tcp:'):
+                address = part[len('udp:'):] if part.startswith('udp:') \
+                    else part
+                break
+        host, _, port = address.rpartition(':')
+        self.address = host, int(port)
+        self._socket = None
+
+    def export(self, documents):
+        if self._socket is None:
+            import socket
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for document in documents:
+            try:
+                self._socket.sendto((_UDP_HEADER + json.dumps(
+                    document, default=str)).encode(), self.address)
+            except OSError as e:
+                sys.stderr.write(f'Could not send span: {e}\n')
+
+
+class MemoryExporter:
+    """Keeps the documents, for tests"""
+
+    def __init__(self):
+        self.documents = []
+
+    def export(self, documents):
+        self.documents.extend(documents)
+
+
+class Tracer:
+
+    def __init__(self, mode=OFF, sample_rate=DEFAULT_SAMPLE_RATE,
+                 exporter=None, name=None):
+        """
+        :param mode: OFF, XRAY or SAMPLED
+        :param sample_rate: 0..1, share of the invocations traced in
+            SAMPLED mode
+        :param exporter: object with export(documents)
+        :param name: name of the root segment in SAMPLED mode
+        """
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.exporter = exporter or LogExporter()
+        self.name = name or os.environ.get('AWS_LAMBDA_FUNCTION_NAME',
+                                           'local')
+        self.trace = None
+        self._local = threading.local()
+        self._requests_patched = False
+
+    @classmethod
+    def from_env(cls):
+        daemon_address = os.environ.get('AWS_XRAY_DAEMON_ADDRESS')
+        mode = os.environ.get('tracing_mode',
+                              XRAY if daemon_address else OFF).lower()
+        exporter = os.environ.get('tracing_exporter',
+                                  'xray' if daemon_address else 'log')
+        return cls(mode=mode,
+                   sample_rate=float(os.environ.get(
+                       'tracing_sample_rate', DEFAULT_SAMPLE_RATE)),
+                   exporter=UdpExporter() if exporter == 'xray'
+                   else LogExporter())
+
+    @property
+    def enabled(self):
+        return self.mode != OFF
+
+    def begin(self, trace_header=None):
+        """
+        Makes the head sampling decision for an invocation
+        :param trace_header: X-Ray trace header, _X_AMZN_TRACE_ID by default
+        :return: Trace when the invocation is traced, None otherwise
+        """
+        self.trace = None
+        if self.mode == XRAY:
+            fields = parse_trace_header(
+                trace_header or os.environ.get('_X_AMZN_TRACE_ID'))
+            if fields.get('Sampled') == '1' and 'Root' in fields:
+                self.trace = Trace(self, fields['Root'],
+                                   fields.get('Parent'))
+        elif self.mode == SAMPLED and random.random() < self.sample_rate:
+            self.trace = Trace(self, _new_trace_id(), None)
+            self.trace.root = Span(self.trace, self.name, None,
+                                   is_segment=True)
+            self.trace.parent_id = self.trace.root.id
+        if self.trace is not None and not self._requests_patched and \
+                'requests' in sys.modules:
+            self._patch_requests()
+        return self.trace
+
+    def end(self):
+        """Exports the spans of the invocation's trace"""
+        trace, self.trace = self.trace, None
+        self._local.stack = []
+        if trace is None:
+            return
+        if trace.root is not None:
+            trace.root.close()
+        if trace.finished:
+            try:
+                self.exporter.export(
+                    [span.to_document() for span in trace.finished])
+            except Exception as e:
+                sys.stderr.write(f'Could not export spans: {e}\n')
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _push(self, span):
+        self._stack().append(span)
+
+    def _pop(self, span):
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+
+    def start_span(self, name, namespace=None, **annotations):
+        """
+        :return: an open Span, closed by the caller, or NOOP_SPAN when the
+            invocation is not traced
+        """
+        trace = self.trace
+        if trace is None:
+            return NOOP_SPAN
+        stack = getattr(self._local, 'stack', None)
+        parent_id = stack[-1].id if stack else trace.parent_id
+        return Span(trace, name, parent_id, namespace, annotations)
+
+    def span(self, name, **annotations):
+        """
+        Context manager timing a named block
+        :param annotations: indexed key-value pairs of the span
+        """
+        if self.trace is None:
+            return NOOP_SPAN
+        return self.start_span(name, **annotations)
+
+    def capture(self, name=None):
+        """Decorator running the function in a span"""
+        def decorator(func):
+            span_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _before_aws_call(self, params, model, context, **kwargs):
+        if self.trace is None:
+            return
+        span = self.start_span(model.service_model.service_id.hyphenize(),
+                               namespace='aws')
+        span.aws = {'operation': model.name}
+        if 'TableName' in params:
+            span.aws['table_name'] = params['TableName']
+        context['trace_span'] = span
+
+    def _after_aws_call(self, http_response, parsed, context, **kwargs):
+        span = context.get('trace_span')
+        if span is None:
+            return
+        metadata = parsed.get('ResponseMetadata', {})
+        span.aws['request_id'] = metadata.get('RequestId')
+        span.aws['retries'] = metadata.get('RetryAttempts', 0)
+        span.set_http(status=metadata.get('HTTPStatusCode'))
+        span.close()
+
+    def _after_aws_error(self, exception, context, **kwargs):
+        span = context.get('trace_span')
+        if span is not None:
+            span.set_exception(exception)
+            span.close()
+
+    def instrument(self, client):
+        """
+        Records a span for every API call of the botocore client while
+        the invocation is traced
+        :return: the client
+        """
+        if self.enabled:
+            client.meta.events.register('before-parameter-build',
+                                        self._before_aws_call)
+            client.meta.events.register('after-call', self._after_aws_call)
+            client.meta.events.register('after-call-error',
+                                        self._after_aws_error)
+        return client
+
+    def _patch_requests(self):
+        """Wraps requests.Session.send, which every requests call goes
+        through, in a span named after the host"""
+        import requests
+        self._requests_patched = True
+        send = requests.Session.send
+        tracer = self
+
+        @functools.wraps(send)
+        def traced_send(session, request, **kwargs):
+            if tracer.trace is None:
+                return send(session, request, **kwargs)
+            url = urlsplit(request.url)
+            with tracer.start_span(url.hostname, namespace='remote') as span:
+                span.set_http(request.method,
+                              f'{url.scheme}://{url.netloc}{url.path}')
+                response = send(session, request, **kwargs)
+                span.set_http(status=response.status_code)
+                return response
+        requests.Session.send = traced_send
+
+
+tracer = Tracer.from_env()
+
+
+def begin(trace_header=None):
+    return tracer.begin(trace_header)
+
+
+def end():
+    tracer.end()
+
+
+def span(name, **annotations):
+    """`with tracing.span('name'):` times the block when traced"""
+    if tracer.trace is None:
+        return NOOP_SPAN
+    return tracer.span(name, **annotations)
+
+
+def capture(name=None):
+    return tracer.capture(name)
+
+
+def instrument(client):
+    return tracer.instrument(client)
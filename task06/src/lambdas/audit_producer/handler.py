@@ -1,116 +1,130 @@
 from commons.log_helper import get_logger
-from commons.abstract_lambda import AbstractLambda
-import json
-import boto3
+from commons import aio
+from commons.batch import BatchProcessor
+from commons.config import Config, TableSetting
+from commons.idempotency import InMemoryStore, idempotent
 import uuid
+from commons import aws
 from datetime import datetime
-import os
 
 _LOG = get_logger("AuditProducer-handler")
-dynamodb = boto3.resource("dynamodb")
-table_name = os.environ.get("target_table", "Audit")
-audit_table = dynamodb.Table(table_name)
 
 
-class AuditProducer(AbstractLambda):
+class Settings(Config):
+    audit = TableSetting("target_table", local_default="Audit")
+
+
+CONFIG = Settings()
+
+
+class AuditProducer(aio.AsyncAbstractLambda):
+
+    def __init__(self):
+        # stream records of different items are written concurrently
+        self.processor = BatchProcessor(self.process_record,
+                                        max_workers=aio.max_workers())
 
     def validate_request(self, event) -> dict:
-        _LOG.info("Validating request: %s", json.dumps(event))
+        _LOG.debug("Validating request: %s", event)
         pass
 
-    def handle_request(self, event, context):
-        _LOG.info("Handling request with event: %s", json.dumps(event))
-
-        for record in event.get('Records', []):
-            if record.get('eventName') in ['INSERT', 'MODIFY']:
-                try:
-                    # Extract the primary key (itemKey)
-                    item_key = record['dynamodb']['Keys']['key']['S']
-                    modification_time = datetime.utcnow().isoformat()
-
-                    # Initialize variables
-                    old_value = None
-                    new_value = {}
-                    updated_attribute = None
-
-                    _LOG.info("Processing record with eventName %s and itemKey %s", record['eventName'], item_key)
-
-                    # Handle INSERT events
-                    if record['eventName'] == 'INSERT':
-                        new_image = record['dynamodb'].get('NewImage', {})
-                        new_key = new_image.get('key', {}).get('S')
-                        new_value_field = new_image.get('value', {}).get('N')
-
-                        if new_key and new_value_field:
-                            new_value = {
-                                'key': new_key,
-                                'value': int(new_value_field)  # Ensure valid conversion to integer
-                            }
-                        else:
-                            _LOG.warning("Missing 'key' or 'value' fields in NewImage for INSERT event")
-                        _LOG.debug("New item added with newValue: %s", new_value)
-
-                    # Handle MODIFY events
-                    elif record['eventName'] == 'MODIFY':
-                        old_image = record['dynamodb'].get('OldImage', {})
-                        new_image = record['dynamodb'].get('NewImage', {})
-
-                        old_value_map = old_image.get('value', {}).get('N')
-                        new_value_map = new_image.get('value', {}).get('N')
-
-                        if old_value_map and new_value_map:
-                            old_value = int(old_value_map)
-                            new_value = {
-                                'key': item_key,
-                                'value': int(new_value_map)
-                            }
-                            if old_value != new_value['value']:
-                                updated_attribute = 'value'
-                                new_value = int(new_value_map)
-                                _LOG.debug("Detected change in 'value'. Old value: %s, New value: %s", old_value, new_value['value'])
-                        else:
-                            _LOG.warning("Missing 'value' fields in OldImage or NewImage for MODIFY event")
-
-                    # Construct the audit item
-                    audit_item = {
-                        'id': str(uuid.uuid4()),
-                        'itemKey': item_key,
-                        'modificationTime': modification_time,
-                        'newValue': new_value
-                    }
-
-                    # Include oldValue and updatedAttribute only for MODIFY events
-                    if record['eventName'] == 'MODIFY' and updated_attribute:
-                        audit_item['updatedAttribute'] = updated_attribute
-                        audit_item['oldValue'] = old_value
-
-                    _LOG.debug("Audit item to store: %s", audit_item)
-
-                    # Store the audit entry in DynamoDB
-                    self.store_audit_entry(audit_item)
-
-                except Exception as e:
-                    _LOG.error("Error processing record: %s. Exception: %s", record, str(e), exc_info=True)
-
-        _LOG.info("Completed processing stream events successfully")
-        return {
-            'statusCode': 200,
-            'body': json.dumps('Processed stream events successfully')
+    def prewarm(self):
+        aws.warm(tables=(CONFIG.audit.name,))
+
+    async def handle_request(self, event, context):
+        records = event.get('Records', [])
+        _LOG.info("Handling %d stream records", len(records))
+        _LOG.debug("Handling request with event: %s", event)
+
+        # Only the failed records, and the later ones of the same item, are
+        # delivered again
+        response = await self.processor.process_async(event)
+        _LOG.info("Completed processing stream events")
+        return response
+
+    # a redelivered record must not add a second audit row. Retries of a
+    # shard's batch reach the container that processed it, so the results
+    # are kept in memory rather than spending two more writes per record
+    @idempotent(store=InMemoryStore(),
+                payload=lambda self, record: record['eventID'])
+    async def process_record(self, record):
+        if record.get('eventName') not in ['INSERT', 'MODIFY']:
+            return
+        # Extract the primary key (itemKey)
+        item_key = record['dynamodb']['Keys']['key']['S']
+        modification_time = datetime.utcnow().isoformat()
+
+        # Initialize variables
+        old_value = None
+        new_value = {}
+        updated_attribute = None
+
+        _LOG.debug("Processing record with eventName %s and itemKey %s", record['eventName'], item_key)
+
+        # Handle INSERT events
+        if record['eventName'] == 'INSERT':
+            new_image = record['dynamodb'].get('NewImage', {})
+            new_key = new_image.get('key', {}).get('S')
+            new_value_field = new_image.get('value', {}).get('N')
+
+            if new_key and new_value_field:
+                new_value = {
+                    'key': new_key,
+                    'value': int(new_value_field)  # Ensure valid conversion to integer
+                }
+            else:
+                _LOG.warning("Missing 'key' or 'value' fields in NewImage for INSERT event")
+            _LOG.debug("New item added with newValue: %s", new_value)
+
+        # Handle MODIFY events
+        elif record['eventName'] == 'MODIFY':
+            old_image = record['dynamodb'].get('OldImage', {})
+            new_image = record['dynamodb'].get('NewImage', {})
+
+            old_value_map = old_image.get('value', {}).get('N')
+            new_value_map = new_image.get('value', {}).get('N')
+
+            if old_value_map and new_value_map:
+                old_value = int(old_value_map)
+                new_value = {
+                    'key': item_key,
+                    'value': int(new_value_map)
+                }
+                if old_value != new_value['value']:
+                    updated_attribute = 'value'
+                    _LOG.debug("Detected change in 'value'. Old value: %s, New value: %s", old_value, new_value['value'])
+                    new_value = int(new_value_map)
+            else:
+                _LOG.warning("Missing 'value' fields in OldImage or NewImage for MODIFY event")
+
+        # Construct the audit item
+        audit_item = {
+            'id': str(uuid.uuid4()),
+            'itemKey': item_key,
+            'modificationTime': modification_time,
+            'newValue': new_value
         }
 
+        # Include oldValue and updatedAttribute only for MODIFY events
+        if record['eventName'] == 'MODIFY' and updated_attribute:
+            audit_item['updatedAttribute'] = updated_attribute
+            audit_item['oldValue'] = old_value
+
+        _LOG.debug("Audit item to store: %s", audit_item)
+
+        # Store the audit entry in DynamoDB
+        await self.store_audit_entry(audit_item)
+
     def find_updated_attribute(self, old_value, new_value):
         for key in new_value:
             if new_value[key] != old_value.get(key):
                 return key
         return None
 
-    def store_audit_entry(self, audit_item):
-        try:
-            audit_table.put_item(Item=audit_item)
-            _LOG.info(f"Audit entry stored: {audit_item}")
-        except Exception as e:
-            _LOG.error(f"Error storing audit entry: {str(e)}")
-            raise e
+    async def store_audit_entry(self, audit_item):
+        # failures are logged by the batch processor with the record
+        await aio.table(CONFIG.audit.name).put_item(Item=audit_item)
+        _LOG.debug("Audit entry stored: %s", audit_item)
 
 HANDLER = AuditProducer()
 
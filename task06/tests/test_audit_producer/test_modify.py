@@ -0,0 +1,43 @@
+from unittest.mock import AsyncMock
+
+from tests.test_audit_producer import AuditProducerLambdaTestCase, \
+    LAMBDA_HANDLER
+
+
+def modify_record(event_id, old, new):
+    return {'eventID': event_id, 'eventName': 'MODIFY',
+            'eventSourceARN': 'arn:aws:dynamodb:eu-west-1:1:table/'
+                              'Configuration/stream/1',
+            'dynamodb': {
+                'Keys': {'key': {'S': 'CACHE_TTL_SEC'}},
+                'SequenceNumber': event_id,
+                'OldImage': {'key': {'S': 'CACHE_TTL_SEC'},
+                             'value': {'N': str(old)}},
+                'NewImage': {'key': {'S': 'CACHE_TTL_SEC'},
+                             'value': {'N': str(new)}}}}
+
+
+class TestModify(AuditProducerLambdaTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.HANDLER.store_audit_entry = AsyncMock()
+
+    def handle(self, *records):
+        return LAMBDA_HANDLER.aio.run(self.HANDLER.handle_request(
+            {'Records': list(records)}, None))
+
+    def test_changed_value_is_stored(self):
+        response = self.handle(modify_record('1', 3600, 1800))
+        self.assertEqual(response, {'batchItemFailures': []})
+        audit_item = self.HANDLER.store_audit_entry.await_args.args[0]
+        self.assertEqual(audit_item['itemKey'], 'CACHE_TTL_SEC')
+        self.assertEqual(audit_item['updatedAttribute'], 'value')
+        self.assertEqual(audit_item['oldValue'], 3600)
+        self.assertEqual(audit_item['newValue'], 1800)
+
+    def test_redelivered_record_is_stored_once(self):
+        record = modify_record('2', 10, 20)
+        self.handle(record)
+        self.handle(record)
+        self.assertEqual(self.HANDLER.store_audit_entry.await_count, 1)
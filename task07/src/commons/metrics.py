@@ -0,0 +1,177 @@
+"""Per-phase latency histograms kept in process and flushed as CloudWatch
+Embedded Metric Format lines, either once per invocation or aggregated
+over `metrics_flush_interval` seconds in a warm container. Off unless
+`metrics_enabled` is true, as the deployed functions set it, so local runs
+and tests keep stdout clean."""
+import atexit
+import json
+import os
+import time
+from sys import stdout
+
+DEFAULT_NAMESPACE = 'damarm'
+# EMF accepts at most 100 distinct values per metric and line
+MAX_VALUES = 100
+
+
+def _bucket(milliseconds):
+    # two significant digits keep the histograms small
+    return float(f'{milliseconds:.2g}')
+
+
+def event_dimension(event):
+    """
+    Dimension an invocation is reported under
+    :return: ('Route', 'GET /tables/{tableId}') for API events,
+        ('EventSource', 'aws:sqs') for the others
+    """
+    if not isinstance(event, dict):
+        return 'EventSource', 'unknown'
+    if 'routeKey' in event:
+        return 'Route', event['routeKey']
+    if 'httpMethod' in event:
+        return 'Route', f"{event['httpMethod']} " \
+                        f"{event.get('resource') or event.get('path')}"
+    http = event.get('requestContext', {}).get('http')
+    if http:
+        return 'Route', f"{http.get('method')} {event.get('rawPath')}"
+    records = event.get('Records')
+    if records:
+        record = records[0]
+        return 'EventSource', record.get('eventSource') or \
+            record.get('EventSource', 'unknown')
+    if 'source' in event:
+        return 'EventSource', event['source']
+    return 'EventSource', 'unknown'
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.metrics.record(self.name, time.perf_counter() - self.start)
+
+
+class Metrics:
+
+    def __init__(self, namespace=DEFAULT_NAMESPACE, enabled=True,
+                 flush_interval=0, stream=None):
+        self.namespace = namespace
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.stream = stream or stdout
+        self.function_name = os.environ.get('AWS_LAMBDA_FUNCTION_NAME',
+                                            'local')
+        # (dimension name, value) -> metric name -> bucket -> count
+        self._histograms = {}
+        self._current = None
+        self._last_flush = time.monotonic()
+
+    def start_invocation(self, event):
+        if not self.enabled:
+            return
+        self._current = self._histograms.setdefault(
+            event_dimension(event), {})
+
+    def record(self, name, seconds):
+        """
+        Adds a duration to the current invocation's histogram
+        :param name: phase or call name, e.g. 'handle_request'
+        :param seconds: duration
+        """
+        current = self._current
+        if current is None:
+            return
+        histogram = current.get(name)
+        if histogram is None:
+            histogram = current[name] = {}
+        bucket = _bucket(seconds * 1000)
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    def timer(self, name):
+        """Context manager recording the duration of its block"""
+        return _Timer(self, name)
+
+    def end_invocation(self):
+        if self._current is None:
+            return
+        self._current = None
+        if not self.flush_interval or \
+                time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def lines(self):
+        timestamp = int(time.time() * 1000)
+        for (dimension, value), histograms in self._histograms.items():
+            if not histograms:
+                continue
+            line = {
+                '_aws': {
+                    'Timestamp': timestamp,
+                    'CloudWatchMetrics': [{
+                        'Namespace': self.namespace,
+                        'Dimensions': [['Function', dimension]],
+                        'Metrics': [{'Name': name, 'Unit': 'Milliseconds'}
+                                    for name in histograms]
+                    }]
+                },
+                'Function': self.function_name,
+                dimension: value
+            }
+            for name, histogram in histograms.items():
+                buckets = sorted(histogram.items(), key=lambda item: item[1],
+                                 reverse=True)[:MAX_VALUES]
+                line[name] = {'Values': [bucket for bucket, _ in buckets],
+                              'Counts': [count for _, count in buckets]}
+            yield json.dumps(line)
+
+    def flush(self):
+        """Writes one EMF line per dimension and resets the histograms"""
+        lines = list(self.lines())
+        self._histograms.clear()
+        self._last_flush = time.monotonic()
+        if lines:
+            self.stream.write('\n'.join(lines) + '\n')
+            self.stream.flush()
+
+    def before_aws_call(self, event_name, context, **kwargs):
+        context['metrics_start'] = time.perf_counter()
+
+    def after_aws_call(self, event_name, context, **kwargs):
+        start = context.get('metrics_start')
+        if start is not None:
+            # after-call.<service>.<Operation>
+            self.record(f'aws.{event_name.split(".", 1)[1]}',
+                        time.perf_counter() - start)
+
+    def instrument(self, client):
+        """Times every API call the botocore client makes"""
+        if self.enabled:
+            client.meta.events.register('before-call', self.before_aws_call)
+            client.meta.events.register('after-call', self.after_aws_call)
+        return client
+
+
+metrics = Metrics(
+    namespace=os.environ.get('metrics_namespace', DEFAULT_NAMESPACE),
+    enabled=os.environ.get('metrics_enabled', 'false').lower() in (
+        'true', '1', 'yes'),
+    flush_interval=float(os.environ.get('metrics_flush_interval', 0)))
+
+
+def _flush_at_exit():
+    try:
+        metrics.flush()
+    except (OSError, ValueError):
+        pass
+
+
+atexit.register(_flush_at_exit)
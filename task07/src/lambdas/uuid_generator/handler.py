@@ -1,17 +1,23 @@
 import uuid
-import boto3
 import datetime
 import json
-import os
 
 # Assuming `get_logger` and `AbstractLambda` are correctly defined
-from commons.log_helper import get_logger
+from commons import aws
+from commons.config import BucketSetting, Config
+from commons.log_helper import get_logger, log_error
 from commons.abstract_lambda import AbstractLambda
+from commons.idempotency import idempotent
 
 _LOG = get_logger('UuidGenerator-handler')
 
-# Initialize the S3 client
-s3_client = boto3.client('s3')
+
+class Settings(Config):
+    # the deployment passes the bucket as target_table
+    bucket = BucketSetting('target_table', local_default='uuid-storage')
+
+
+CONFIG = Settings()
 
 
 class UuidGenerator(AbstractLambda):
@@ -19,6 +25,11 @@ class UuidGenerator(AbstractLambda):
     def validate_request(self, event) -> dict:
         pass
 
+    def prewarm(self):
+        aws.warm(services=('s3',))
+
+    # a retried schedule event must not store a second file
+    @idempotent(keep_result=lambda response: response['statusCode'] == 200)
     def handle_request(self, event, context):
         try:
             uuids = [str(uuid.uuid4()) for _ in range(10)]
@@ -28,10 +39,9 @@ class UuidGenerator(AbstractLambda):
             timestamp = timestamp[:-3] + 'Z'
             file_name = f"{timestamp}"
             _LOG.info(f"File name for UUID storage: {file_name}")
-            bucket_name = os.environ.get("target_table")
+            bucket_name = CONFIG.bucket.name
             _LOG.info(f"Target S3 bucket: {bucket_name}")
-            s3_client.put_object(
-                Bucket=bucket_name,
+            CONFIG.bucket.put_object(
                 Key=file_name,
                 Body=data,
                 ContentType='application/json'
@@ -41,7 +51,7 @@ class UuidGenerator(AbstractLambda):
             return {"statusCode": 200, "body": f"Stored UUIDs in '{file_name}'"}
 
         except Exception as e:
-            _LOG.error(f"Error occurred while handling the request: {str(e)}", exc_info=True)
+            log_error(_LOG, e, "Error occurred while handling the request: %s", e)
             return {"statusCode": 500, "body": f"Error occurred: {str(e)}"}
 
 
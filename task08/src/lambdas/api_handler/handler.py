@@ -1,14 +1,49 @@
 from commons.log_helper import get_logger
 from commons.abstract_lambda import AbstractLambda
-import requests
+from commons.deadline import DeadlineExceeded
+from commons.routing import Router
+from commons.upstream import Upstream, UpstreamUnavailable
+from commons.validation import RequestValidator
 import json
 
 _LOG = get_logger('ApiHandler-handler')
 
 
+def bad_request(request, *args):
+    # Return error response for unsupported paths or methods
+    error_message = {
+        "statusCode": 400,
+        "message": f"Bad request syntax or unsupported method. Request path: {request.path}. HTTP method: {request.method}"
+    }
+    error_response = {
+        "statusCode": 400,
+        "headers": {
+            "Content-Type": "application/json"
+        },
+        "body": json.dumps(error_message)
+    }
+    return error_response
+
+
+router = Router(on_not_found=bad_request, on_method_not_allowed=bad_request,
+                on_bad_request=bad_request)
+
+VALIDATOR = RequestValidator()
+VALIDATOR.add('GET', '/weather', query={
+    'latitude': {'type': 'number', 'minimum': -90, 'maximum': 90},
+    'longitude': {'type': 'number', 'minimum': -180, 'maximum': 180}
+})
+
+
 class OpenMeteoClient:
-    def __init__(self):
-        self.base_url = 'https://api.open-meteo.com/v1/forecast'
+    base_url = 'https://api.open-meteo.com/v1/forecast'
+
+    def __init__(self, upstream=None):
+        """
+        :param upstream: commons.upstream.Upstream, tuned by the
+            open_meteo_* environment variables by default
+        """
+        self.upstream = upstream or Upstream.from_env('open_meteo')
 
     def get_weather_forecast(self, latitude, longitude):
         params = {
@@ -16,101 +51,88 @@ class OpenMeteoClient:
             'longitude': longitude,
             'hourly': 'temperature_2m'
         }
-        try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()  # Raise an error for bad status codes
-            return response.json()
-        except requests.RequestException as e:
-            print(f"Error fetching weather data: {e}")
-            raise
+        return self.upstream.get_json(self.base_url, params=params)
+
+
+# the pooled connection, the latencies hedging is based on and the circuit
+# state are kept for the lifetime of the container
+OPEN_METEO = OpenMeteoClient()
 
 
 class ApiHandler(AbstractLambda):
 
     def validate_request(self, event) -> dict:
-        pass
+        return VALIDATOR(event)
 
-    def handle_request(self, event, context):
-        # Extract the request path and method
-        path = event.get("rawPath", "/")
-        method = event["requestContext"]["http"]["method"]
-
-        # Check if the method is GET and the path is '/weather'
-        if method == "GET" and path == "/weather":
-            # Default coordinates (e.g., Kyiv) if not provided in the request
-            latitude = event.get('queryStringParameters', {}).get('latitude', '50.4375')
-            longitude = event.get('queryStringParameters', {}).get('longitude', '30.5')
-
-            weather_client = OpenMeteoClient()
-
-            try:
-                # Fetch the weather data using the OpenMeteoClient
-                weather_data = weather_client.get_weather_forecast(latitude, longitude)
-
-                # Construct a response in the specified format
-                response_body = {
-                    "latitude": latitude,
-                    "longitude": longitude,
-                    "generationtime_ms": weather_data.get("generationtime_ms", 0),
-                    "utc_offset_seconds": weather_data.get("utc_offset_seconds", 0),
-                    "timezone": weather_data.get("timezone", ""),
-                    "timezone_abbreviation": weather_data.get("timezone_abbreviation", ""),
-                    "elevation": weather_data.get("elevation", 0.0),
-                    "hourly_units": weather_data.get("hourly_units", {}),
-                    "hourly": weather_data.get("hourly", {}),
-                    "current_units": {
-                        "time": "iso8601",
-                        "interval": "seconds",
-                        "temperature_2m": "°C",
-                        "wind_speed_10m": "km/h"
-                    },
-                    "current": {
-                        "time": "2023-12-04T07:00",  # Example placeholder; replace with dynamic value if needed
-                        "interval": 900,  # Example interval in seconds
-                        "temperature_2m": weather_data.get("hourly", {}).get("temperature_2m", [0])[0],
-                        # Example placeholder value
-                        "wind_speed_10m": weather_data.get("hourly", {}).get("wind_speed_10m", [0])[0]
-                        # Example placeholder value
-                    }
-                }
+    @router.route('GET', '/weather')
+    def get_weather(self, request):
+        # Default coordinates (e.g., Kyiv) if not provided in the request
+        latitude = request.query.get('latitude', '50.4375')
+        longitude = request.query.get('longitude', '30.5')
 
-                response = {
-                    "statusCode": 200,
-                    "headers": {
-                        "Content-Type": "application/json"
-                    },
-                    "body": json.dumps(response_body)
-                }
-                return response
-
-            except Exception as e:
-                error_response = {
-                    "statusCode": 500,
-                    "headers": {
-                        "Content-Type": "application/json"
-                    },
-                    "body": json.dumps({
-                        "message": "Failed to fetch weather data",
-                        "error": str(e)
-                    })
+        try:
+            # Fetch the weather data using the OpenMeteoClient
+            weather_data = OPEN_METEO.get_weather_forecast(latitude, longitude)
+
+            # Construct a response in the specified format
+            response_body = {
+                "latitude": latitude,
+                "longitude": longitude,
+                "generationtime_ms": weather_data.get("generationtime_ms", 0),
+                "utc_offset_seconds": weather_data.get("utc_offset_seconds", 0),
+                "timezone": weather_data.get("timezone", ""),
+                "timezone_abbreviation": weather_data.get("timezone_abbreviation", ""),
+                "elevation": weather_data.get("elevation", 0.0),
+                "hourly_units": weather_data.get("hourly_units", {}),
+                "hourly": weather_data.get("hourly", {}),
+                "current_units": {
+                    "time": "iso8601",
+                    "interval": "seconds",
+                    "temperature_2m": "°C",
+                    "wind_speed_10m": "km/h"
+                },
+                "current": {
+                    "time": "2023-12-04T07:00",  # Example placeholder; replace with dynamic value if needed
+                    "interval": 900,  # Example interval in seconds
+                    "temperature_2m": weather_data.get("hourly", {}).get("temperature_2m", [0])[0],
+                    # Example placeholder value
+                    "wind_speed_10m": weather_data.get("hourly", {}).get("wind_speed_10m", [0])[0]
+                    # Example placeholder value
                 }
-                return error_response
+            }
 
-        else:
-            # Return error response for unsupported paths or methods
-            error_message = {
-                "statusCode": 400,
-                "message": f"Bad request syntax or unsupported method. Request path: {path}. HTTP method: {method}"
+            response = {
+                "statusCode": 200,
+                "headers": {
+                    "Content-Type": "application/json"
+                },
+                "body": json.dumps(response_body)
             }
+            return response
+
+        except DeadlineExceeded:
+            # answered 503 by AbstractLambda, the client may retry
+            raise
+        except UpstreamUnavailable:
+            # Open-Meteo is failing and nothing is cached for these
+            # coordinates; the client may retry once it recovers
+            return self.service_unavailable_response()
+        except Exception as e:
             error_response = {
-                "statusCode": 400,
+                "statusCode": 500,
                 "headers": {
                     "Content-Type": "application/json"
                 },
-                "body": json.dumps(error_message)
+                "body": json.dumps({
+                    "message": "Failed to fetch weather data",
+                    "error": str(e)
+                })
             }
             return error_response
 
+    def handle_request(self, event, context):
+        return router.dispatch(self, event)
+
 
 HANDLER = ApiHandler()
 
@@ -0,0 +1,121 @@
+"""Cold-start import profile of a lambda handler. The handler is imported
+in a fresh interpreter through ImportFromSourceContext with
+`-X importtime`, so module caching of the current process does not hide
+anything:
+
+    python -m tests.import_profiler [lambda_name ...] [--top 15]
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from tests import ImportFromSourceContext
+
+MARKER = '--- handler import ---'
+
+_CHILD_CODE = f'''
+import importlib, json, resource, sys, time
+from tests import ImportFromSourceContext
+print({MARKER!r}, file=sys.stderr, flush=True)
+start = time.perf_counter()
+with ImportFromSourceContext():
+    importlib.import_module(sys.argv[1])
+elapsed = time.perf_counter() - start
+# ru_maxrss of a forked child starts at the parent's RSS on Linux, so the
+# high-water mark of this process's own address space is read instead
+try:
+    with open('/proc/self/status') as status:
+        max_rss_kb = next(int(line.split()[1]) for line in status
+                          if line.startswith('VmHWM:'))
+except (OSError, StopIteration):
+    max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{'import_ms': elapsed * 1000, 'max_rss_kb': max_rss_kb}}))
+'''
+
+
+class ImportProfile:
+
+    def __init__(self, lambda_name, import_ms, max_rss_kb, modules):
+        self.lambda_name = lambda_name
+        self.import_ms = import_ms
+        self.max_rss_mb = max_rss_kb / 1024
+        # (module, self_us, cumulative_us, depth)
+        self.modules = modules
+
+    def top(self, count=15):
+        return sorted(self.modules, key=lambda module: module[2],
+                      reverse=True)[:count]
+
+    def report(self, count=15):
+        lines = [f'{self.lambda_name}: import {self.import_ms:.1f} ms, '
+                 f'max RSS {self.max_rss_mb:.1f} MB',
+                 f'{"cumulative ms":>14} {"self ms":>9}  module']
+        for name, self_us, cumulative_us, _ in self.top(count):
+            lines.append(f'{cumulative_us / 1000:>14.1f} '
+                         f'{self_us / 1000:>9.1f}  {name}')
+        return '\n'.join(lines)
+
+
+def parse_importtime(stderr):
+    """
+    Parses `-X importtime` output printed after MARKER
+    :return: list of (module, self_us, cumulative_us, depth)
+    """
+    modules, started = [], False
+    for line in stderr.splitlines():
+        if line == MARKER:
+            started = True
+            continue
+        if not started or not line.startswith('import time:'):
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split(
+                '|', 2)
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue  # the header line
+        stripped = name.lstrip()
+        depth = (len(name) - len(stripped) - 1) // 2
+        modules.append((stripped, self_us, cumulative_us, depth))
+    return modules
+
+
+def lambda_names():
+    lambdas_path = Path(ImportFromSourceContext().source_path, 'lambdas')
+    return sorted(path.parent.name
+                  for path in lambdas_path.glob('*/handler.py'))
+
+
+def profile_handler(lambda_name, timeout=120):
+    """
+    Imports `lambdas.<lambda_name>.handler` in a fresh subprocess
+    :return: ImportProfile
+    """
+    project_path = ImportFromSourceContext().project_path
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _CHILD_CODE,
+         f'lambdas.{lambda_name}.handler'],
+        cwd=project_path, capture_output=True, text=True, timeout=timeout)
+    if process.returncode:
+        raise RuntimeError(f'Importing {lambda_name} failed:\n'
+                           f'{process.stderr[-4000:]}')
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    return ImportProfile(lambda_name, result['import_ms'],
+                         result['max_rss_kb'],
+                         parse_importtime(process.stderr))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('lambdas', nargs='*')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+    for lambda_name in args.lambdas or lambda_names():
+        print(profile_handler(lambda_name).report(args.top))
+        print()
+
+
+if __name__ == '__main__':
+    main()
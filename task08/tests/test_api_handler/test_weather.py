@@ -0,0 +1,30 @@
+from unittest.mock import patch
+
+from tests.test_api_handler import ApiHandlerLambdaTestCase, LAMBDA_HANDLER
+
+EVENT = {'resource': '/weather', 'path': '/weather', 'httpMethod': 'GET',
+         'headers': {}, 'queryStringParameters': None,
+         'pathParameters': None, 'requestContext': {}, 'body': None}
+
+
+class TestWeather(ApiHandlerLambdaTestCase):
+
+    def get_weather(self, error):
+        with patch.object(LAMBDA_HANDLER.OPEN_METEO, 'get_weather_forecast',
+                          side_effect=error):
+            return self.HANDLER.lambda_handler(EVENT, {})
+
+    def test_unavailable_upstream_is_answered_503(self):
+        response = self.get_weather(
+            LAMBDA_HANDLER.UpstreamUnavailable('open_meteo circuit is open'))
+        self.assertEqual(response['statusCode'], 503)
+        self.assertEqual(response['headers']['Retry-After'], '1')
+
+    def test_exceeded_deadline_is_answered_503(self):
+        response = self.get_weather(
+            LAMBDA_HANDLER.DeadlineExceeded('10 ms left'))
+        self.assertEqual(response['statusCode'], 503)
+
+    def test_other_errors_are_answered_500(self):
+        self.assertEqual(self.get_weather(ValueError('bad JSON'))
+                         ['statusCode'], 500)
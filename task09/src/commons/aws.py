@@ -0,0 +1,203 @@
+"""Lazily created AWS clients, resources and DynamoDB Table handles shared
+for the lifetime of the container. Nothing is imported or created until a
+handler actually needs it, so routes that never touch a service do not pay
+for its client on cold start. All clients share one botocore config that
+can be tuned through environment variables. Each request's read timeout is
+capped to what is left of the invocation's deadline."""
+import os
+import threading
+
+from commons import deadline, tracing
+from commons.log_helper import get_logger
+from commons.metrics import metrics
+
+_LOG = get_logger('aws')
+
+DEFAULT_MAX_POOL_CONNECTIONS = 10
+DEFAULT_CONNECT_TIMEOUT = 2
+DEFAULT_READ_TIMEOUT = 10
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_MODE = 'adaptive'
+
+_clients = {}
+_resources = {}
+_tables = {}
+_lock = threading.RLock()
+_config = None
+# set_factory replaces boto3 with another backend, e.g. a local stand-in
+_factory = None
+
+
+def config_from_env():
+    """
+    Settings shared by every client, overridable with the `aws_*`
+    environment variables
+    :return: dict of botocore Config keyword arguments
+    """
+    return {
+        'max_pool_connections': int(os.environ.get(
+            'aws_max_pool_connections', DEFAULT_MAX_POOL_CONNECTIONS)),
+        'connect_timeout': float(os.environ.get(
+            'aws_connect_timeout', DEFAULT_CONNECT_TIMEOUT)),
+        'read_timeout': float(os.environ.get(
+            'aws_read_timeout', DEFAULT_READ_TIMEOUT)),
+        'tcp_keepalive': True,
+        'retries': {
+            'mode': os.environ.get('aws_retry_mode', DEFAULT_RETRY_MODE),
+            'max_attempts': int(os.environ.get(
+                'aws_max_attempts', DEFAULT_MAX_ATTEMPTS))
+        }
+    }
+
+
+def get_config():
+    """botocore Config built once from `config_from_env`"""
+    global _config
+    if _config is None:
+        from botocore.config import Config
+        _config = Config(**config_from_env())
+    return _config
+
+
+def _cap_to_deadline(request, **kwargs):
+    """before-send hook: refuses calls the invocation has no time left for
+    and shortens the read timeout of the others to the time left. botocore
+    versions without per-request timeouts ignore the context key"""
+    current = deadline.current()
+    read_timeout = current.timeout(get_config().read_timeout)
+    context = getattr(request, 'context', None)
+    if context is not None and read_timeout < get_config().read_timeout:
+        context['read_timeout'] = read_timeout
+
+
+def limit_to_deadline(client):
+    """
+    Registers _cap_to_deadline on the client
+    :return: the client
+    """
+    client.meta.events.register('before-send', _cap_to_deadline)
+    return client
+
+
+def _get_or_create(cache, key, factory):
+    instance = cache.get(key)
+    if instance is None:
+        with _lock:
+            instance = cache.get(key)
+            if instance is None:
+                instance = factory()
+                cache[key] = instance
+                _LOG.debug('Created %s', key)
+    return instance
+
+
+def get_client(service_name):
+    """
+    Cached boto3 client for the service
+    :param service_name: e.g. 's3', 'cognito-idp'
+    """
+    def create():
+        if _factory is not None:
+            return _factory('client', service_name)
+        import boto3
+        return limit_to_deadline(tracing.instrument(metrics.instrument(
+            boto3.client(service_name, config=get_config()))))
+    return _get_or_create(_clients, service_name, create)
+
+
+def get_resource(service_name):
+    """
+    Cached boto3 service resource
+    :param service_name: e.g. 'dynamodb'
+    """
+    def create():
+        if _factory is not None:
+            return _factory('resource', service_name)
+        import boto3
+        resource = boto3.resource(service_name, config=get_config())
+        limit_to_deadline(tracing.instrument(
+            metrics.instrument(resource.meta.client)))
+        return resource
+    return _get_or_create(_resources, service_name, create)
+
+
+def get_table(table_name):
+    """
+    Cached DynamoDB Table handle
+    :param table_name: physical table name
+    """
+    return _get_or_create(
+        _tables, table_name,
+        lambda: get_resource('dynamodb').Table(table_name))
+
+
+def transact_write(items):
+    """
+    TransactWriteItems taking what Table.put_item and friends take: Python
+    values and boto3.dynamodb.conditions. Either every item is written or
+    none is
+    :param items: e.g. [{'Put': {'TableName': 'Slots', 'Item': {...},
+        'ConditionExpression': Attr('id').not_exists()}}], at most 100
+    :raise ClientError: TransactionCanceledException when a condition
+        failed, response['CancellationReasons'] tells which, in order
+    """
+    from boto3.dynamodb.conditions import ConditionBase, \
+        ConditionExpressionBuilder
+    from boto3.dynamodb.types import TypeSerializer
+    serialize = TypeSerializer().serialize
+    requests = []
+    for item in items:
+        (action, arguments), = item.items()
+        arguments = dict(arguments)
+        for name in ('Item', 'Key'):
+            if name in arguments:
+                arguments[name] = {key: serialize(value) for key, value
+                                   in arguments[name].items()}
+        condition = arguments.get('ConditionExpression')
+        if isinstance(condition, ConditionBase):
+            expression = ConditionExpressionBuilder().build_expression(
+                condition)
+            arguments['ConditionExpression'] = \
+                expression.condition_expression
+            arguments['ExpressionAttributeNames'] = \
+                expression.attribute_name_placeholders
+            if expression.attribute_value_placeholders:
+                arguments['ExpressionAttributeValues'] = {
+                    key: serialize(value) for key, value in
+                    expression.attribute_value_placeholders.items()}
+        requests.append({action: arguments})
+    return get_resource('dynamodb').meta.client.transact_write_items(
+        TransactItems=requests)
+
+
+def warm(services=(), tables=()):
+    """
+    Creates the given clients and Table handles ahead of the first request
+    :param services: client service names
+    :param tables: DynamoDB table names
+    """
+    for service_name in services:
+        get_client(service_name)
+    for table_name in tables:
+        get_table(table_name)
+
+
+def set_factory(factory):
+    """
+    Routes client and resource creation to `factory(kind, service_name)`,
+    where kind is 'client' or 'resource'; None restores boto3. Cached
+    instances are dropped
+    """
+    global _factory
+    reset()
+    _factory = factory
+
+
+def reset():
+    """Drops every cached client, resource and Table handle"""
+    global _config
+    with _lock:
+        _clients.clear()
+        _resources.clear()
+        _tables.clear()
+        _config = None
@@ -0,0 +1,321 @@
+"""Resilient JSON calls to a third-party HTTP API. An Upstream is created
+at module level, so its pooled session and what it has learned about the
+API outlive the invocation:
+
+    OPEN_METEO = Upstream.from_env('open_meteo')
+    ...
+    forecast = OPEN_METEO.get_json(url, params={'latitude': 50.4})
+
+Every request gets connect and read timeouts capped to the invocation's
+deadline. Connection errors, timeouts and 429/5xx answers are retried with
+full-jitter backoff. With hedging on, a second request is sent when the
+first has not answered within the p95 latency seen so far, and the first
+answer wins. After `failure_threshold` failed calls in a row the circuit
+opens: for `reset_timeout` seconds calls fail fast, or are answered from
+the last good response when it is younger than `cache_ttl`, until one
+probe call succeeds again.
+"""
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, \
+    TimeoutError as FutureTimeout, wait
+
+from commons import deadline
+from commons.log_helper import get_logger
+from commons.metrics import metrics
+
+_LOG = get_logger('upstream')
+
+DEFAULT_CONNECT_TIMEOUT = 2
+DEFAULT_READ_TIMEOUT = 5
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.1
+DEFAULT_MAX_BACKOFF = 1.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30
+DEFAULT_CACHE_TTL = 3600
+DEFAULT_CACHE_SIZE = 16
+DEFAULT_POOL_SIZE = 10
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+# latencies kept for the hedge delay, and how many are needed first
+LATENCY_WINDOW = 100
+HEDGE_MIN_SAMPLES = 20
+
+
+class UpstreamUnavailable(Exception):
+    """The circuit is open and there is no cached response to serve"""
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT, clock=time.monotonic):
+        """
+        :param failure_threshold: failed calls in a row that open it
+        :param reset_timeout: seconds open before a probe call is let through
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if self.clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """
+        :return: whether a call may go out; a half-open circuit lets a
+            single probe through
+        """
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def release(self):
+        """Ends a probe that neither succeeded nor failed"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    _LOG.warning('Circuit opened after %d failures',
+                                 self.failures)
+                self._opened_at = self.clock()
+            self._probing = False
+
+
+def _retryable(error):
+    import requests
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code in RETRY_STATUSES
+
+
+class Upstream:
+
+    def __init__(self, name, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF, max_backoff=DEFAULT_MAX_BACKOFF,
+                 hedge=False, breaker=None, cache_ttl=DEFAULT_CACHE_TTL,
+                 cache_size=DEFAULT_CACHE_SIZE, pool_size=DEFAULT_POOL_SIZE,
+                 clock=time.monotonic, sleep=time.sleep):
+        """
+        :param name: used in logs and as the metric name
+        :param retries: attempts after the first one
+        :param backoff: base of the exponential backoff, in seconds
+        :param hedge: send a second request after the p95 latency
+        :param breaker: CircuitBreaker, a default one when omitted
+        :param cache_ttl: seconds a response may be served while the
+            upstream is unhealthy, 0 disables the cache
+        :param cache_size: responses kept, least recently used dropped
+        :param pool_size: connections kept open per host
+        """
+        self.name = name
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.breaker = breaker or CircuitBreaker(clock=clock)
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.pool_size = pool_size
+        self.clock = clock
+        self.sleep = sleep
+        self.hedged = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._cache = OrderedDict()
+        self._session = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, prefix, **kwargs):
+        """
+        Upstream tuned by the `<prefix>_*` environment variables, e.g.
+        open_meteo_read_timeout, open_meteo_hedge
+        :param kwargs: Upstream arguments taking precedence over the
+            environment
+        """
+        def env(name, default, type=float):
+            return type(os.environ.get(f'{prefix}_{name}', default))
+        settings = {
+            'connect_timeout': env('connect_timeout',
+                                   DEFAULT_CONNECT_TIMEOUT),
+            'read_timeout': env('read_timeout', DEFAULT_READ_TIMEOUT),
+            'retries': env('retries', DEFAULT_RETRIES, int),
+            'hedge': os.environ.get(f'{prefix}_hedge', '').lower() == 'true',
+            'breaker': CircuitBreaker(
+                failure_threshold=env('failure_threshold',
+                                      DEFAULT_FAILURE_THRESHOLD, int),
+                reset_timeout=env('reset_timeout', DEFAULT_RESET_TIMEOUT),
+                clock=kwargs.get('clock', time.monotonic)),
+            'cache_ttl': env('cache_ttl', DEFAULT_CACHE_TTL)
+        }
+        settings.update(kwargs)
+        return cls(prefix, **settings)
+
+    @property
+    def session(self):
+        """requests session kept for the lifetime of the container"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_maxsize=self.pool_size)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def get_json(self, url, params=None):
+        """
+        :return: the decoded body of a 2xx answer, or the cached one while
+            the upstream is unhealthy. Shared with the cache, so do not
+            modify it
+        :raise UpstreamUnavailable: the circuit is open, nothing cached
+        :raise requests.RequestException: the call failed
+        """
+        key = (url, tuple(sorted((params or {}).items())))
+        if not self.breaker.allow():
+            return self._fallback(key, UpstreamUnavailable(
+                f'{self.name} circuit is open'))
+        try:
+            data = self._fetch(url, params)
+        except deadline.DeadlineExceeded:
+            # our time ran out, which says nothing about the upstream
+            self.breaker.release()
+            raise
+        except Exception as e:
+            if getattr(e, 'response', None) is not None and \
+                    not _retryable(e):
+                # a 4xx answer is ours to fix, the upstream is healthy
+                self.breaker.record_success()
+                raise
+            self.breaker.record_failure()
+            return self._fallback(key, e)
+        self.breaker.record_success()
+        if self.cache_ttl:
+            self._store(key, data)
+        return data
+
+    def _fallback(self, key, error):
+        cached = self._cache.get(key)
+        if cached is not None and self.clock() - cached[0] < self.cache_ttl:
+            _LOG.warning('%s unavailable, serving a response cached %.0f s '
+                         'ago; Error: %s', self.name,
+                         self.clock() - cached[0], error)
+            return cached[1]
+        raise error
+
+    def _store(self, key, data):
+        with self._lock:
+            self._cache[key] = (self.clock(), data)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _fetch(self, url, params):
+        attempt = 0
+        while True:
+            current = deadline.current()
+            read_timeout = current.timeout(self.read_timeout)
+            timeout = (min(self.connect_timeout, read_timeout), read_timeout)
+            try:
+                started = time.perf_counter()
+                data = self._hedged(url, params, timeout)
+                metrics.record(self.name, time.perf_counter() - started)
+                return data
+            except Exception as e:
+                if attempt >= self.retries or not _retryable(e):
+                    raise
+                pause = random.uniform(
+                    0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                if current.remaining() <= pause + read_timeout / 2:
+                    raise
+                _LOG.info('%s attempt %d failed, retrying in %.0f ms; '
+                          'Error: %s', self.name, attempt + 1, pause * 1000,
+                          e)
+                self.sleep(pause)
+                attempt += 1
+
+    def hedge_delay(self):
+        """
+        :return: seconds to wait before hedging, None until enough
+            latencies have been seen
+        """
+        if len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+    def _hedged(self, url, params, timeout):
+        delay = self.hedge_delay() if self.hedge else None
+        if delay is None:
+            return self._send(url, params, timeout)
+        executor = self._get_executor()
+        first = executor.submit(self._send, url, params, timeout)
+        try:
+            return first.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        self.hedged += 1
+        pending = {first, executor.submit(self._send, url, params, timeout)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = e
+        raise error
+
+    def _send(self, url, params, timeout):
+        started = time.perf_counter()
+        response = self.session.get(url, params=params, timeout=timeout)
+        response.raise_for_status()
+        data = response.json()
+        self._latencies.append(time.perf_counter() - started)
+        return data
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.pool_size,
+                        thread_name_prefix=self.name)
+        return self._executor
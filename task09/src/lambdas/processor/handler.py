@@ -1,22 +1,31 @@
 from commons.log_helper import get_logger
 from commons.abstract_lambda import AbstractLambda
-import os
-import requests
-import boto3
+from commons import aws, tracing
+from commons.config import Config, TableSetting
+from commons.upstream import Upstream
 import uuid
 from decimal import Decimal
 
 
 _LOG = get_logger('Processor-handler')
-dynamodb = boto3.resource("dynamodb")
-os.environ["target_table"] = "cmtr-f7e4afc6-Weather-test"
-table_name = os.environ.get("target_table")
-weather_table = dynamodb.Table(table_name)
+
+
+class Settings(Config):
+    weather = TableSetting('target_table', local_default='Weather')
+
+
+CONFIG = Settings()
 
 
 class OpenMeteoClient:
-    def __init__(self):
-        self.base_url = 'https://api.open-meteo.com/v1/forecast'
+    base_url = 'https://api.open-meteo.com/v1/forecast'
+
+    def __init__(self, upstream=None):
+        """
+        :param upstream: commons.upstream.Upstream, tuned by the
+            open_meteo_* environment variables by default
+        """
+        self.upstream = upstream or Upstream.from_env('open_meteo')
 
     def get_weather_forecast(self, latitude, longitude):
         params = {
@@ -24,28 +33,30 @@ class OpenMeteoClient:
             'longitude': longitude,
             'hourly': 'temperature_2m'
         }
-        try:
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()  # Raise an error for bad status codes
-            return response.json()
-        except requests.RequestException as e:
-            print(f"Error fetching weather data: {e}")
-            raise
+        return self.upstream.get_json(self.base_url, params=params)
+
+
+# the pooled connection, the latencies hedging is based on and the circuit
+# state are kept for the lifetime of the container. Each run stores what
+# it fetched, so a cached forecast is not served in place of a fresh one
+OPEN_METEO = OpenMeteoClient(Upstream.from_env('open_meteo', cache_ttl=0))
+
 
 class Processor(AbstractLambda):
 
     def validate_request(self, event) -> dict:
         pass
 
+    def prewarm(self):
+        aws.warm(tables=(CONFIG.weather.name,))
+
     def handle_request(self, event, context):
         # Extract latitude and longitude from event or use default values
         latitude = event.get('queryStringParameters', {}).get('latitude', '50.4375')
         longitude = event.get('queryStringParameters', {}).get('longitude', '30.5')
 
-        # Instantiate the weather client and fetch weather data
-        weather_client = OpenMeteoClient()
         try:
-            weather_data = weather_client.get_weather_forecast(latitude, longitude)
+            weather_data = OPEN_METEO.get_weather_forecast(latitude, longitude)
 
             # Convert latitude and longitude to Decimal (not float)
             latitude = Decimal(latitude)
@@ -61,7 +72,8 @@ class Processor(AbstractLambda):
                     return Decimal(str(obj))  # Convert float to Decimal
                 return obj
 
-            weather_data = convert_floats(weather_data)
+            with tracing.span('convert_forecast'):
+                weather_data = convert_floats(weather_data)
 
             # Extract and structure data according to the schema
             item = {
@@ -85,7 +97,7 @@ class Processor(AbstractLambda):
                 }
             }
             # Insert the item into the DynamoDB table
-            weather_table.put_item(Item=item)
+            CONFIG.weather.table.put_item(Item=item)
 
             # Return a success response
             return {
@@ -0,0 +1,886 @@
+"""In-memory stand-in for the AWS services the lambdas use. It plugs into
+commons.aws through set_factory, so handlers run unchanged:
+
+    with LocalAws() as local_aws:
+        local_aws.dynamodb.create_table('Tables', hash_key='id')
+        HANDLER.lambda_handler(event, context)
+
+Calls can be slowed down and throttled to see how handlers behave under
+load, deterministically for a given seed:
+
+    with LocalAws(latency=0.005, throttle_rate=0.01, seed=1) as local_aws:
+        local_aws.faults.add('dynamodb', 'Scan', latency=0.05)
+
+and tables can be given the provisioned capacity of deployment_resources
+.json, so the 1 RCU/WCU tables throttle locally the way they do in AWS:
+
+    local_aws.dynamodb.create_tables_from('deployment_resources.json')
+"""
+import contextlib
+import copy
+import functools
+import hashlib
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+import types
+import uuid
+from collections import Counter
+from decimal import Decimal
+
+from tests import ImportFromSourceContext
+
+try:
+    from botocore.exceptions import ClientError as _ClientErrorBase
+except ImportError:  # botocore is not installed, e.g. in a bare test run
+    _ClientErrorBase = None
+
+
+class ClientError(_ClientErrorBase or Exception):
+    """botocore.exceptions.ClientError, so handlers catching it see the
+    local errors too; shaped like it when botocore is missing"""
+
+    def __init__(self, code, message, operation_name, **fields):
+        """
+        :param fields: other members of the response, e.g.
+            CancellationReasons
+        """
+        response = {'Error': {'Code': code, 'Message': message},
+                    'ResponseMetadata': {'HTTPStatusCode': 400}, **fields}
+        if _ClientErrorBase is not None:
+            super().__init__(response, operation_name)
+        else:
+            super().__init__(f'An error occurred ({code}) when calling the '
+                             f'{operation_name} operation: {message}')
+            self.response = response
+            self.operation_name = operation_name
+
+
+THROTTLING_CODES = {'dynamodb': 'ProvisionedThroughputExceededException'}
+# a Scan or Query page ends once it has read this much, like DynamoDB's
+MAX_PAGE_BYTES = 1024 * 1024
+
+
+class Faults:
+    """Latency and throttling injected into the stand-ins' calls"""
+
+    def __init__(self, seed=0, clock=time.monotonic, sleep=time.sleep):
+        """
+        :param seed: makes the throttled calls the same from run to run
+        :param clock: time source of the provisioned capacity
+        :param sleep: how latency is spent
+        """
+        self.rules = []
+        self.clock = clock
+        self.sleep = sleep
+        self.calls = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def add(self, service=None, operation=None, latency=0.0,
+            throttle_rate=0.0):
+        """
+        :param service: e.g. 'dynamodb', None for every service
+        :param operation: e.g. 'PutItem', None for every operation
+        :param latency: seconds added to every matching call
+        :param throttle_rate: 0..1, share of the matching calls that fail
+            with the service's throttling error
+        """
+        self.rules.append((service, operation, latency, throttle_rate))
+
+    def clear(self):
+        self.rules.clear()
+
+    def before_call(self, service, operation):
+        with self._lock:
+            self.calls[(service, operation)] += 1
+            latency, throttled = 0.0, False
+            for rule_service, rule_operation, rule_latency, rate in \
+                    self.rules:
+                if rule_service not in (None, service) or \
+                        rule_operation not in (None, operation):
+                    continue
+                latency += rule_latency
+                throttled = throttled or (
+                    rate and self._random.random() < rate)
+        if latency:
+            self.sleep(latency)
+        if throttled:
+            throttle(service, operation)
+
+
+def throttle(service, operation):
+    raise ClientError(THROTTLING_CODES.get(service, 'ThrottlingException'),
+                      'Rate exceeded', operation)
+
+
+def _api(operation):
+    """Counts the call and applies the faults of the stand-in's service"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            self.faults.before_call(self.service_name, operation)
+            return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _to_dynamodb(value):
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    if isinstance(value, float):
+        raise TypeError('Float types are not supported. '
+                        'Use Decimal types instead.')
+    if isinstance(value, dict):
+        return {key: _to_dynamodb(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_dynamodb(item) for item in value]
+    return value
+
+
+def item_size(item):
+    """Approximate DynamoDB item size in bytes"""
+    return len(json.dumps(item, default=str))
+
+
+_MISSING = object()
+
+
+def _operand(operand, item):
+    name = getattr(operand, 'name', None)
+    if name is not None and type(operand).__name__ in ('Attr', 'Key'):
+        value = item
+        for part in name.split('.'):
+            if not isinstance(value, dict) or part not in value:
+                return _MISSING
+            value = value[part]
+        return value
+    return _to_dynamodb(operand)
+
+
+def evaluate(condition, item):
+    """
+    Evaluates a boto3.dynamodb.conditions expression against an item
+    :return: bool
+    """
+    if isinstance(condition, str):
+        raise NotImplementedError('String expressions, use '
+                                  'boto3.dynamodb.conditions')
+    operator = condition.expression_operator
+    values = condition.get_expression()['values']
+    if operator == 'AND':
+        return all(evaluate(value, item) for value in values)
+    if operator == 'OR':
+        return any(evaluate(value, item) for value in values)
+    if operator == 'NOT':
+        return not evaluate(values[0], item)
+    operands = [_operand(value, item) for value in values]
+    first = operands[0]
+    if operator == 'attribute_exists':
+        return first is not _MISSING
+    if operator == 'attribute_not_exists':
+        return first is _MISSING
+    if first is _MISSING:
+        return False
+    try:
+        if operator == '=':
+            return first == operands[1]
+        if operator == '<>':
+            return first != operands[1]
+        if operator == '<':
+            return first < operands[1]
+        if operator == '<=':
+            return first <= operands[1]
+        if operator == '>':
+            return first > operands[1]
+        if operator == '>=':
+            return first >= operands[1]
+        if operator == 'BETWEEN':
+            return operands[1] <= first <= operands[2]
+        if operator == 'IN':
+            return first in values[1]
+        if operator == 'begins_with':
+            return first.startswith(operands[1])
+        if operator == 'contains':
+            return operands[1] in first
+    except TypeError:
+        return False
+    raise NotImplementedError(f'Condition operator {operator}')
+
+
+class _Capacity:
+    """Provisioned throughput of a table as a token bucket holding
+    `burst_seconds` of unused capacity. Like DynamoDB, a request is served
+    while any capacity is left and may drive the bucket into debt"""
+
+    def __init__(self, units, burst_seconds, clock):
+        self.units = units
+        self.limit = units * burst_seconds
+        self.tokens = self.limit
+        self.clock = clock
+        self.refilled = clock()
+
+    def consume(self, units):
+        """
+        :return: False when the request is throttled
+        """
+        now = self.clock()
+        self.tokens = min(self.limit,
+                          self.tokens + (now - self.refilled) * self.units)
+        self.refilled = now
+        if self.tokens <= 0:
+            return False
+        self.tokens -= units
+        return True
+
+
+class _BatchWriter:
+    """What Table.batch_writer() returns: buffers puts and deletes and
+    sends them 25 at a time, resending unprocessed ones"""
+
+    def __init__(self, table):
+        self.table = table
+        self._requests = []
+
+    def put_item(self, Item):
+        self._requests.append({'PutRequest': {'Item': Item}})
+        self._flush_full()
+
+    def delete_item(self, Key):
+        self._requests.append({'DeleteRequest': {'Key': Key}})
+        self._flush_full()
+
+    def _flush_full(self):
+        while len(self._requests) >= 25:
+            self._flush()
+
+    def _flush(self):
+        batch, self._requests = self._requests[:25], self._requests[25:]
+        unprocessed = self.table.write_batch(batch)
+        if unprocessed:
+            self.table.faults.sleep(0.01)
+        self._requests.extend(unprocessed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        while self._requests:
+            self._flush()
+
+
+class LocalTable:
+    service_name = 'dynamodb'
+
+    def __init__(self, name, hash_key='id', range_key=None, indexes=None,
+                 faults=None):
+        """
+        :param indexes: {index name: (hash key, range key or None)} of the
+            global secondary indexes
+        """
+        self.name = name
+        self.table_name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.indexes = indexes or {}
+        self.faults = faults or Faults()
+        self.items = {}
+        self.read_capacity = self.write_capacity = None
+        self._lock = threading.RLock()
+
+    def provision(self, read_units, write_units, burst_seconds=1):
+        """Throttles the table beyond the given capacity units per second"""
+        self.read_capacity = _Capacity(read_units, burst_seconds,
+                                       self.faults.clock)
+        self.write_capacity = _Capacity(write_units, burst_seconds,
+                                        self.faults.clock)
+
+    def _read(self, size, operation, consistent=False):
+        if self.read_capacity is not None and not \
+                self.read_capacity.consume(
+                    max(math.ceil(size / 4096), 1) * (1 if consistent
+                                                      else 0.5)):
+            throttle(self.service_name, operation)
+
+    def _write(self, item, operation):
+        if self.write_capacity is not None and not \
+                self.write_capacity.consume(
+                    max(math.ceil(item_size(item) / 1024), 1)):
+            throttle(self.service_name, operation)
+
+    def _key(self, item, operation='PutItem'):
+        try:
+            key = (item[self.hash_key],)
+            if self.range_key:
+                key += (item[self.range_key],)
+        except KeyError as e:
+            raise ClientError('ValidationException',
+                              f'Missing the key {e.args[0]} in the item',
+                              operation)
+        return tuple(_to_dynamodb(part) for part in key)
+
+    def _check(self, key, condition, operation):
+        if condition is not None and \
+                not evaluate(condition, self.items.get(key, {})):
+            raise ClientError('ConditionalCheckFailedException',
+                              'The conditional request failed', operation)
+
+    @_api('PutItem')
+    def put_item(self, Item, ConditionExpression=None, **kwargs):
+        key = self._key(Item)
+        with self._lock:
+            self._write(Item, 'PutItem')
+            self._check(key, ConditionExpression, 'PutItem')
+            self.items[key] = _to_dynamodb(copy.deepcopy(Item))
+        return {}
+
+    @_api('DeleteItem')
+    def delete_item(self, Key, ConditionExpression=None, **kwargs):
+        key = self._key(Key, 'DeleteItem')
+        with self._lock:
+            self._write(Key, 'DeleteItem')
+            self._check(key, ConditionExpression, 'DeleteItem')
+            self.items.pop(key, None)
+        return {}
+
+    @_api('GetItem')
+    def get_item(self, Key, ConsistentRead=False, **kwargs):
+        item = self.items.get(self._key(Key, 'GetItem'))
+        self._read(item_size(item) if item else 0, 'GetItem',
+                   ConsistentRead)
+        return {'Item': copy.deepcopy(item)} if item is not None else {}
+
+    def _page(self, entries, key_names, Limit=None, ExclusiveStartKey=None,
+              FilterExpression=None, operation='Scan'):
+        """
+        :param entries: items in the order they are read
+        :param key_names: attributes LastEvaluatedKey is made of
+        :return: the response of a Scan or Query page
+        """
+        if ExclusiveStartKey is not None:
+            start = tuple(_to_dynamodb(ExclusiveStartKey[name])
+                          for name in key_names)
+            for index, item in enumerate(entries):
+                if tuple(item.get(name) for name in key_names) == start:
+                    entries = entries[index + 1:]
+                    break
+        cut = len(entries)
+        if Limit is not None:
+            cut = min(cut, Limit)
+        read = 0
+        for index, item in enumerate(entries[:cut]):
+            read += item_size(item)
+            if read >= MAX_PAGE_BYTES:
+                cut = index + 1
+                break
+        last_key = None
+        if cut < len(entries):
+            entries = entries[:cut]
+            last_key = {name: entries[-1][name] for name in key_names}
+        # capacity is spent on what is read, before the filter
+        self._read(sum(map(item_size, entries)), operation)
+        items = [copy.deepcopy(item) for item in entries
+                 if FilterExpression is None or
+                 evaluate(FilterExpression, item)]
+        response = {'Items': items, 'Count': len(items),
+                    'ScannedCount': len(entries)}
+        if last_key is not None:
+            response['LastEvaluatedKey'] = last_key
+        return response
+
+    def _key_names(self, index_name=None):
+        names = [self.hash_key] + ([self.range_key] if self.range_key
+                                   else [])
+        if index_name is not None:
+            hash_key, range_key = self._index(index_name)
+            names = [hash_key] + ([range_key] if range_key else []) + [
+                name for name in names if name not in (hash_key, range_key)]
+        return names
+
+    def _index(self, index_name):
+        if index_name not in self.indexes:
+            raise ClientError('ValidationException',
+                              f'The table does not have the specified index:'
+                              f' {index_name}', 'Query')
+        return self.indexes[index_name]
+
+    @_api('Scan')
+    def scan(self, FilterExpression=None, Limit=None, ExclusiveStartKey=None,
+             IndexName=None, **kwargs):
+        entries = list(self.items.values())
+        if IndexName is not None:
+            hash_key, range_key = self._index(IndexName)
+            entries = [item for item in entries if hash_key in item and
+                       (range_key is None or range_key in item)]
+        return self._page(entries, self._key_names(IndexName), Limit,
+                          ExclusiveStartKey, FilterExpression)
+
+    @_api('Query')
+    def query(self, KeyConditionExpression, FilterExpression=None,
+              IndexName=None, ScanIndexForward=True, Limit=None,
+              ExclusiveStartKey=None, **kwargs):
+        if IndexName is None:
+            hash_key, range_key = self.hash_key, self.range_key
+        else:
+            hash_key, range_key = self._index(IndexName)
+        entries = [item for item in self.items.values()
+                   if hash_key in item and
+                   (range_key is None or range_key in item) and
+                   evaluate(KeyConditionExpression, item)]
+        if range_key is not None:
+            entries.sort(key=lambda item: item[range_key],
+                         reverse=not ScanIndexForward)
+        return self._page(entries, self._key_names(IndexName), Limit,
+                          ExclusiveStartKey, FilterExpression, 'Query')
+
+    def write_batch(self, requests):
+        """
+        Applies BatchWriteItem requests of this table
+        :return: the requests left unprocessed by throttling
+        """
+        self.faults.before_call(self.service_name, 'BatchWriteItem')
+        unprocessed = []
+        with self._lock:
+            for request in requests:
+                put = request.get('PutRequest')
+                item = put['Item'] if put else request['DeleteRequest']['Key']
+                if self.write_capacity is not None and not \
+                        self.write_capacity.consume(
+                            max(math.ceil(item_size(item) / 1024), 1)):
+                    unprocessed.append(request)
+                elif put:
+                    self.items[self._key(item, 'BatchWriteItem')] = \
+                        _to_dynamodb(copy.deepcopy(item))
+                else:
+                    self.items.pop(self._key(item, 'BatchWriteItem'), None)
+        return unprocessed
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return _BatchWriter(self)
+
+
+_EXISTS_CONDITION = re.compile(
+    r'^\(?(attribute_exists|attribute_not_exists)\((#?\w+)\)\)?$')
+
+
+def _exists_condition(arguments):
+    """
+    The ConditionExpression string of a low-level request, as a predicate
+    on the current item; only attribute_exists and attribute_not_exists
+    """
+    expression = arguments.get('ConditionExpression')
+    if expression is None:
+        return None
+    match = _EXISTS_CONDITION.match(expression.strip())
+    if match is None:
+        raise NotImplementedError(f'Condition {expression!r}')
+    function, name = match.groups()
+    name = arguments.get('ExpressionAttributeNames', {}).get(name, name)
+    exists = function == 'attribute_exists'
+    return lambda item: (name in item) == exists
+
+
+class LocalDynamoDBClient:
+    """Stands in for boto3.client('dynamodb') as resource.meta.client, for
+    the calls the resource has no method for"""
+    service_name = 'dynamodb'
+
+    def __init__(self, dynamodb):
+        self.dynamodb = dynamodb
+        self.faults = dynamodb.faults
+        self._lock = threading.Lock()
+
+    @_api('TransactWriteItems')
+    def transact_write_items(self, TransactItems, **kwargs):
+        from boto3.dynamodb.types import TypeDeserializer
+        deserialize = TypeDeserializer().deserialize
+        operation = 'TransactWriteItems'
+        if len(TransactItems) > 100:
+            raise ClientError('ValidationException', 'Member must have '
+                              'length less than or equal to 100', operation)
+        writes, keys = [], set()
+        for request in TransactItems:
+            (action, arguments), = request.items()
+            if action not in ('Put', 'Delete', 'ConditionCheck'):
+                raise NotImplementedError(f'Transaction action {action}')
+            table = self.dynamodb.Table(arguments['TableName'])
+            item = {name: deserialize(value) for name, value in
+                    (arguments.get('Item') or arguments['Key']).items()}
+            key = table._key(item, operation)
+            if (table.name, key) in keys:
+                raise ClientError('ValidationException', 'Transaction '
+                                  'request cannot include multiple '
+                                  'operations on one item', operation)
+            keys.add((table.name, key))
+            writes.append((action, table, key, item,
+                           _exists_condition(arguments)))
+        tables = {table.name: table for _, table, _, _, _ in writes}
+        # every table stays locked until the transaction is applied
+        with self._lock, contextlib.ExitStack() as locks:
+            for name in sorted(tables):
+                locks.enter_context(tables[name]._lock)
+            reasons = [{'Code': 'None'} if condition is None or
+                       condition(table.items.get(key, {})) else
+                       {'Code': 'ConditionalCheckFailed',
+                        'Message': 'The conditional request failed'}
+                       for _, table, key, _, condition in writes]
+            if any(reason['Code'] != 'None' for reason in reasons):
+                raise ClientError(
+                    'TransactionCanceledException',
+                    'Transaction cancelled, please refer cancellation '
+                    'reasons for specific reasons [' + ', '.join(
+                        reason['Code'] for reason in reasons) + ']',
+                    operation, CancellationReasons=reasons)
+            for action, table, _, item, _ in writes:
+                if action != 'ConditionCheck':
+                    # a transactional write costs twice the capacity
+                    table._write(item, operation)
+                    table._write(item, operation)
+            for action, table, key, item, _ in writes:
+                if action == 'Put':
+                    table.items[key] = _to_dynamodb(copy.deepcopy(item))
+                elif action == 'Delete':
+                    table.items.pop(key, None)
+        return {}
+
+
+class LocalDynamoDB:
+    """Stands in for boto3.resource('dynamodb')"""
+    service_name = 'dynamodb'
+
+    def __init__(self, faults=None):
+        self.faults = faults or Faults()
+        self.tables = {}
+        self.meta = types.SimpleNamespace(client=LocalDynamoDBClient(self))
+
+    def create_table(self, name, hash_key='id', range_key=None,
+                     indexes=None):
+        self.tables[name] = LocalTable(name, hash_key, range_key, indexes,
+                                       self.faults)
+        return self.tables[name]
+
+    def create_tables_from(self, path, aliases=None, provisioned=True):
+        """
+        Creates the dynamodb_table resources of a deployment_resources.json;
+        tables that already exist keep their items and get the capacity
+        :param aliases: values of the ${name} placeholders in table names
+        :param provisioned: whether the tables throttle beyond their
+            read_capacity and write_capacity
+        :return: {name: LocalTable}
+        """
+        aliases = aliases or {}
+        with open(path) as resources:
+            resources = json.load(resources)
+        created = {}
+        for name, resource in resources.items():
+            if resource.get('resource_type') != 'dynamodb_table':
+                continue
+            name = re.sub(r'\$\{(\w+)}',
+                          lambda match: aliases.get(match[1], match[1]), name)
+            table = self.tables.get(name) or self.create_table(
+                name, resource['hash_key_name'],
+                resource.get('sort_key_name'),
+                {index['name']: (index['index_key_name'],
+                                 index.get('index_sort_key_name'))
+                 for index in resource.get('global_indexes', [])})
+            if provisioned and resource.get('read_capacity'):
+                table.provision(resource['read_capacity'],
+                                resource['write_capacity'])
+            created[name] = table
+        return created
+
+    def Table(self, name):
+        table = self.tables.get(name)
+        if table is None:
+            table = self.create_table(name)
+        return table
+
+    @_api('BatchWriteItem')
+    def batch_write_item(self, RequestItems, **kwargs):
+        unprocessed = {}
+        for name, requests in RequestItems.items():
+            left = self.Table(name).write_batch(requests)
+            if left:
+                unprocessed[name] = left
+        return {'UnprocessedItems': unprocessed}
+
+
+class LocalS3:
+    """Stands in for boto3.client('s3')"""
+    service_name = 's3'
+
+    def __init__(self, faults=None):
+        self.faults = faults or Faults()
+        self.buckets = {}
+
+    @_api('PutObject')
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        if isinstance(Body, str):
+            Body = Body.encode()
+        self.buckets.setdefault(Bucket, {})[Key] = Body
+        return {'ETag': f'"{hashlib.md5(Body).hexdigest()}"'}
+
+    @_api('GetObject')
+    def get_object(self, Bucket, Key, **kwargs):
+        import io
+        try:
+            body = self.buckets[Bucket][Key]
+        except KeyError:
+            raise ClientError('NoSuchKey', 'The specified key does not '
+                                           'exist.', 'GetObject')
+        return {'Body': io.BytesIO(body), 'ContentLength': len(body)}
+
+
+class LocalSQS:
+    """Stands in for boto3.client('sqs'). Received messages stay invisible
+    for VisibilityTimeout seconds unless deleted"""
+    service_name = 'sqs'
+
+    def __init__(self, faults=None):
+        self.faults = faults or Faults()
+        # queue url -> [message], visible ones first
+        self.queues = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def url(name):
+        return f'https://sqs.local/000000000000/{name}'
+
+    @_api('CreateQueue')
+    def create_queue(self, QueueName, **kwargs):
+        self.queues.setdefault(self.url(QueueName), [])
+        return {'QueueUrl': self.url(QueueName)}
+
+    @_api('GetQueueUrl')
+    def get_queue_url(self, QueueName, **kwargs):
+        if self.url(QueueName) not in self.queues:
+            raise ClientError('AWS.SimpleQueueService.NonExistentQueue',
+                              'The specified queue does not exist.',
+                              'GetQueueUrl')
+        return {'QueueUrl': self.url(QueueName)}
+
+    def _queue(self, url, operation):
+        queue = self.queues.get(url)
+        if queue is None:
+            raise ClientError('AWS.SimpleQueueService.NonExistentQueue',
+                              'The specified queue does not exist.',
+                              operation)
+        return queue
+
+    def _send(self, url, body, group_id=None, attributes=None,
+              operation='SendMessage'):
+        message = {'MessageId': str(uuid.uuid4()), 'Body': body,
+                   'MD5OfBody': hashlib.md5(body.encode()).hexdigest(),
+                   'Attributes': {'SentTimestamp': str(int(time.time() *
+                                                           1000)),
+                                  'ApproximateReceiveCount': '0'},
+                   'MessageAttributes': attributes or {},
+                   'visible_at': 0}
+        if group_id is not None:
+            message['Attributes']['MessageGroupId'] = group_id
+        with self._lock:
+            self._queue(url, operation).append(message)
+        return message
+
+    @_api('SendMessage')
+    def send_message(self, QueueUrl, MessageBody, MessageGroupId=None,
+                     MessageAttributes=None, **kwargs):
+        message = self._send(QueueUrl, MessageBody, MessageGroupId,
+                             MessageAttributes)
+        return {'MessageId': message['MessageId'],
+                'MD5OfMessageBody': message['MD5OfBody']}
+
+    @_api('SendMessageBatch')
+    def send_message_batch(self, QueueUrl, Entries, **kwargs):
+        successful = []
+        for entry in Entries:
+            message = self._send(QueueUrl, entry['MessageBody'],
+                                 entry.get('MessageGroupId'),
+                                 entry.get('MessageAttributes'),
+                                 'SendMessageBatch')
+            successful.append({'Id': entry['Id'],
+                               'MessageId': message['MessageId'],
+                               'MD5OfMessageBody': message['MD5OfBody']})
+        return {'Successful': successful, 'Failed': []}
+
+    @_api('ReceiveMessage')
+    def receive_message(self, QueueUrl, MaxNumberOfMessages=1,
+                        VisibilityTimeout=30, **kwargs):
+        now = self.faults.clock()
+        received = []
+        with self._lock:
+            for message in self._queue(QueueUrl, 'ReceiveMessage'):
+                if len(received) >= MaxNumberOfMessages:
+                    break
+                if message['visible_at'] > now:
+                    continue
+                message['visible_at'] = now + VisibilityTimeout
+                message['ReceiptHandle'] = str(uuid.uuid4())
+                attributes = message['Attributes']
+                attributes['ApproximateReceiveCount'] = str(
+                    int(attributes['ApproximateReceiveCount']) + 1)
+                received.append({key: copy.deepcopy(value)
+                                 for key, value in message.items()
+                                 if key != 'visible_at'})
+        return {'Messages': received} if received else {}
+
+    @_api('DeleteMessage')
+    def delete_message(self, QueueUrl, ReceiptHandle, **kwargs):
+        with self._lock:
+            queue = self._queue(QueueUrl, 'DeleteMessage')
+            queue[:] = [message for message in queue
+                        if message.get('ReceiptHandle') != ReceiptHandle]
+        return {}
+
+    def lambda_event(self, QueueName, batch_size=10):
+        """
+        Receives up to batch_size messages the way the Lambda event source
+        mapping does
+        :return: SQS event for a handler, e.g. one using
+            commons.batch.BatchProcessor
+        """
+        url = self.url(QueueName)
+        messages = self.receive_message(url, batch_size).get('Messages', [])
+        return {'Records': [{
+            'messageId': message['MessageId'],
+            'receiptHandle': message['ReceiptHandle'],
+            'body': message['Body'],
+            'attributes': message['Attributes'],
+            'messageAttributes': message['MessageAttributes'],
+            'md5OfBody': message['MD5OfBody'],
+            'eventSource': 'aws:sqs',
+            'eventSourceARN': f'arn:aws:sqs:local:000000000000:{QueueName}'
+        } for message in messages]}
+
+
+class LocalSNS:
+    """Stands in for boto3.client('sns'); messages published to a topic
+    are kept and delivered to the SQS queues subscribed to it"""
+    service_name = 'sns'
+
+    def __init__(self, sqs, faults=None):
+        self.faults = faults or Faults()
+        self.sqs = sqs
+        # topic arn -> [published message]
+        self.topics = {}
+        self.subscriptions = {}
+
+    @_api('CreateTopic')
+    def create_topic(self, Name, **kwargs):
+        arn = f'arn:aws:sns:local:000000000000:{Name}'
+        self.topics.setdefault(arn, [])
+        return {'TopicArn': arn}
+
+    @_api('Subscribe')
+    def subscribe(self, TopicArn, Protocol, Endpoint, **kwargs):
+        if Protocol != 'sqs':
+            raise NotImplementedError(f'Local {Protocol} subscriptions')
+        self.subscriptions.setdefault(TopicArn, []).append(
+            self.sqs.url(Endpoint.rsplit(':', 1)[-1]))
+        return {'SubscriptionArn': f'{TopicArn}:{uuid.uuid4()}'}
+
+    @_api('Publish')
+    def publish(self, TopicArn, Message, Subject=None, **kwargs):
+        message_id = str(uuid.uuid4())
+        self.topics.setdefault(TopicArn, []).append(
+            {'MessageId': message_id, 'Message': Message,
+             'Subject': Subject})
+        for url in self.subscriptions.get(TopicArn, []):
+            self.sqs._send(url, json.dumps({
+                'Type': 'Notification', 'MessageId': message_id,
+                'TopicArn': TopicArn, 'Subject': Subject,
+                'Message': Message}))
+        return {'MessageId': message_id}
+
+
+class _CognitoExceptions:
+    class UsernameExistsException(Exception):
+        pass
+
+    class NotAuthorizedException(Exception):
+        pass
+
+
+class LocalCognito:
+    """Stands in for boto3.client('cognito-idp')"""
+    service_name = 'cognito-idp'
+    exceptions = _CognitoExceptions
+
+    def __init__(self, faults=None):
+        self.faults = faults or Faults()
+        self.users = {}
+        self._tokens = itertools.count(1)
+
+    @_api('AdminCreateUser')
+    def admin_create_user(self, UserPoolId, Username, **kwargs):
+        if Username in self.users:
+            raise self.exceptions.UsernameExistsException(Username)
+        self.users[Username] = None
+        return {'User': {'Username': Username}}
+
+    @_api('AdminSetUserPassword')
+    def admin_set_user_password(self, UserPoolId, Username, Password,
+                                **kwargs):
+        self.users[Username] = Password
+        return {}
+
+    @_api('InitiateAuth')
+    def initiate_auth(self, ClientId, AuthFlow, AuthParameters, **kwargs):
+        if self.users.get(AuthParameters['USERNAME']) != \
+                AuthParameters['PASSWORD']:
+            raise self.exceptions.NotAuthorizedException(
+                'Incorrect username or password.')
+        token = f'token-{next(self._tokens)}'
+        return {'AuthenticationResult': {'IdToken': token,
+                                         'AccessToken': token}}
+
+
+class LocalAws:
+    """Installs the stand-ins into commons.aws for the duration of the
+    context"""
+
+    def __init__(self, latency=0.0, throttle_rate=0.0, seed=0):
+        """
+        :param latency: seconds added to every call
+        :param throttle_rate: 0..1, share of the calls throttled
+        :param seed: of the throttling decisions
+        """
+        self.faults = Faults(seed)
+        if latency or throttle_rate:
+            self.faults.add(latency=latency, throttle_rate=throttle_rate)
+        self.dynamodb = LocalDynamoDB(self.faults)
+        self.s3 = LocalS3(self.faults)
+        self.sqs = LocalSQS(self.faults)
+        self.sns = LocalSNS(self.sqs, self.faults)
+        self.cognito = LocalCognito(self.faults)
+        with ImportFromSourceContext():
+            from commons import aws
+        self._aws = aws
+
+    def factory(self, kind, service_name):
+        if kind == 'resource' and service_name == 'dynamodb':
+            return self.dynamodb
+        clients = {'s3': self.s3, 'sqs': self.sqs, 'sns': self.sns,
+                   'cognito-idp': self.cognito}
+        if kind == 'client' and service_name in clients:
+            return clients[service_name]
+        raise NotImplementedError(f'Local {kind} for {service_name}')
+
+    def install(self):
+        self._aws.set_factory(self.factory)
+        return self
+
+    def uninstall(self):
+        self._aws.set_factory(None)
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.uninstall()
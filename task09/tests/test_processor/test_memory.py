@@ -0,0 +1,50 @@
+import importlib
+import json
+from unittest.mock import patch
+
+import requests
+
+from tests import ImportFromSourceContext
+from tests.local_aws import LocalAws
+from tests.test_processor import LAMBDA_HANDLER, ProcessorLambdaTestCase
+
+with ImportFromSourceContext():
+    memory = importlib.import_module('commons.memory')
+
+HOURS = 16 * 24
+FORECAST = {
+    'latitude': 50.4375, 'longitude': 30.5, 'generationtime_ms': 0.03,
+    'utc_offset_seconds': 0, 'timezone': 'GMT',
+    'timezone_abbreviation': 'GMT', 'elevation': 188.0,
+    'hourly_units': {'time': 'iso8601', 'temperature_2m': '°C'},
+    'hourly': {'time': [f'2024-01-{1 + hour // 24:02d}T{hour % 24:02d}:00'
+                        for hour in range(HOURS)],
+               'temperature_2m': [round(-5 + hour * 0.1, 1)
+                                  for hour in range(HOURS)]}
+}
+
+
+class TestMemoryCeilings(ProcessorLambdaTestCase):
+    """The function runs with 128 MB; this keeps the copies of the
+    forecast the handler makes in check"""
+
+    def test_sixteen_day_forecast(self):
+        body = json.dumps(FORECAST).encode()
+
+        def request(session, method, url, **kwargs):
+            response = requests.Response()
+            response.status_code = 200
+            response._content = body
+            return response
+
+        with LocalAws() as local_aws, \
+                patch('requests.sessions.Session.request', request), \
+                patch.object(memory.profiler, 'rate', 1):
+            response = self.HANDLER.lambda_handler({}, {})
+        self.assertEqual(response['statusCode'], 200)
+        item, = local_aws.dynamodb.Table(
+            LAMBDA_HANDLER.CONFIG.weather.name).items.values()
+        self.assertEqual(len(item['forecast']['hourly']['time']), HOURS)
+        # the parsed forecast and its Decimal copy, ~100 bytes per number
+        report = self.HANDLER.memory_report
+        self.assertLess(report['peak_kib'], 12 * len(body) / 1024)
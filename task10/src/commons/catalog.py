@@ -0,0 +1,250 @@
+"""A small, rarely changing DynamoDB table held in memory for the lifetime
+of the container and looked up by any of its unique attributes:
+
+    TABLES = Catalog(lambda: scan_all(CONFIG.tables.table),
+                     keys=('id', 'number'), ttl=300)
+    ...
+    table = TABLES.get('number', 7)
+
+A lookup is a dict access. Once `ttl` seconds have passed since the load,
+lookups keep answering from the loaded items while one background thread
+reads the table again; past `ttl + stale_ttl` the next lookup waits for
+the read. A lookup that finds nothing reads the table again right away,
+at most once every `miss_reload` seconds, so an item added by another
+container is not missing for a whole ttl.
+
+Writes of the container itself go through `put` and `remove`. Writes of
+the others can be applied from the table's stream by delivering it to the
+same function, with `apply_stream(event['Records'])`; only the container
+that receives a batch applies it, the others still rely on the ttl.
+"""
+import threading
+import time
+
+from commons.log_helper import get_logger
+from commons.metrics import metrics
+
+_LOG = get_logger('catalog')
+
+DEFAULT_TTL = 300
+DEFAULT_STALE_TTL = 3600
+DEFAULT_MISS_RELOAD = 1
+
+
+def scan_all(table, **kwargs):
+    """
+    :param table: boto3 Table
+    :return: every item, read a Scan page at a time
+    """
+    items = []
+    while True:
+        page = table.scan(**kwargs)
+        items.extend(page.get('Items', []))
+        if 'LastEvaluatedKey' not in page:
+            return items
+        kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+
+class _Snapshot:
+
+    def __init__(self, items, keys, loaded_at):
+        self.items = tuple(items)
+        self.loaded_at = loaded_at
+        self.by = {key: {item[key]: item for item in self.items
+                         if key in item} for key in keys}
+        self._sorted = {}
+
+    def sorted_by(self, key):
+        ordered = self._sorted.get(key)
+        if ordered is None:
+            ordered = self._sorted[key] = sorted(
+                self.by[key].values(), key=lambda item: item[key])
+        return ordered
+
+
+class Catalog:
+
+    def __init__(self, load, keys, ttl=DEFAULT_TTL,
+                 stale_ttl=DEFAULT_STALE_TTL,
+                 miss_reload=DEFAULT_MISS_RELOAD, clock=time.monotonic):
+        """
+        :param load: returns every item of the table
+        :param keys: unique attributes items are looked up by, the first
+            one is the table's key
+        :param ttl: seconds the items are used without reading them again,
+            0 reads them on every lookup
+        :param stale_ttl: seconds beyond ttl they are still used while they
+            are read again in the background
+        :param miss_reload: least seconds between reads caused by lookups
+            that found nothing
+        """
+        self.load = load
+        self.keys = tuple(keys)
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.miss_reload = miss_reload
+        self.clock = clock
+        self.refreshes = 0
+        self._snapshot = None
+        # writes made while a read is in flight, replayed on its result
+        self._pending = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def snapshot(self):
+        """
+        :return: the loaded items, read first when there are none or they
+            are too old to use
+        """
+        snapshot = self._snapshot
+        if snapshot is None or not self.ttl:
+            return self._reload(older_than=snapshot)
+        age = self.clock() - snapshot.loaded_at
+        if age < self.ttl:
+            return snapshot
+        if age < self.ttl + self.stale_ttl:
+            self._refresh_in_background()
+            return snapshot
+        return self._reload(older_than=snapshot)
+
+    def get(self, key, value):
+        """
+        :param key: one of keys
+        :return: the item whose key attribute equals value, None when
+            there is none
+        """
+        snapshot = self.snapshot()
+        item = snapshot.by[key].get(value)
+        if item is None and self.ttl and \
+                self.clock() - snapshot.loaded_at >= self.miss_reload:
+            item = self._reload(older_than=snapshot).by[key].get(value)
+        return item
+
+    def items(self):
+        """
+        :return: every item, in the order they were read and then added
+        """
+        return list(self.snapshot().items)
+
+    def sorted_by(self, key):
+        """
+        :param key: one of keys
+        :return: the items ordered by it, sorted once per loaded items
+        """
+        return self.snapshot().sorted_by(key)
+
+    def reload(self):
+        """Reads the items now"""
+        with self._load_lock:
+            return self._load()
+
+    def _reload(self, older_than):
+        """
+        Reads the items unless another caller has replaced older_than
+        while this one waited, so concurrent callers share a single read
+        """
+        with self._load_lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot is not older_than:
+                return snapshot
+            return self._load()
+
+    def _load(self):
+        with self._lock:
+            self._pending = []
+        try:
+            started = self.clock()
+            with metrics.timer('catalog_load'):
+                items = self.load()
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            snapshot = _Snapshot(items, self.keys, started)
+            for change in self._pending:
+                snapshot = change(snapshot)
+            self._pending = None
+            self._snapshot = snapshot
+            self.refreshes += 1
+        _LOG.debug('Loaded %d items', len(snapshot.items))
+        return snapshot
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            try:
+                with self._load_lock:
+                    self._load()
+            except Exception as e:
+                _LOG.warning('Background reload failed, the loaded items '
+                             'are still used; Error: %s', e)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=refresh, name='catalog-refresh',
+                         daemon=True).start()
+
+    def _change(self, change):
+        with self._lock:
+            if self._snapshot is not None:
+                self._snapshot = change(self._snapshot)
+            if self._pending is not None:
+                self._pending.append(change)
+
+    def put(self, item):
+        """Adds a written item, or replaces the one with the same key"""
+        primary = self.keys[0]
+
+        def change(snapshot):
+            items = [existing for existing in snapshot.items
+                     if existing.get(primary) != item[primary]]
+            return _Snapshot(items + [item], self.keys, snapshot.loaded_at)
+        self._change(change)
+
+    def remove(self, key_value):
+        """Drops the item whose first key attribute equals key_value"""
+        primary = self.keys[0]
+
+        def change(snapshot):
+            return _Snapshot([item for item in snapshot.items
+                              if item.get(primary) != key_value],
+                             self.keys, snapshot.loaded_at)
+        self._change(change)
+
+    def invalidate(self):
+        """Reads the items again on the next lookup"""
+        with self._lock:
+            self._snapshot = None
+
+    def apply_stream(self, records):
+        """
+        Applies the table's DynamoDB stream records, in order
+        :param records: Records of a stream event, with new images
+        :return: number of records applied
+        """
+        from boto3.dynamodb.types import TypeDeserializer
+        deserialize = TypeDeserializer().deserialize
+        applied = 0
+        for record in records:
+            change = record.get('dynamodb', {})
+            if record.get('eventName') == 'REMOVE':
+                keys = change.get('Keys', {})
+                if self.keys[0] in keys:
+                    self.remove(deserialize(keys[self.keys[0]]))
+                    applied += 1
+            elif 'NewImage' in change:
+                self.put({name: deserialize(value) for name, value
+                          in change['NewImage'].items()})
+                applied += 1
+            else:
+                # the stream does not carry new images, read them
+                self.invalidate()
+                applied += 1
+        return applied
@@ -0,0 +1,194 @@
+"""Declared, validated settings of a lambda. The settings are read from the
+environment once, when the handler module is imported, so a misconfigured
+deployment fails its cold start instead of its first request:
+
+    class Settings(Config):
+        tables = TableSetting('tables_table', local_default='Tables')
+        page_size = Setting('page_size', int, default=50, minimum=1)
+
+    CONFIG = Settings()
+    ...
+    CONFIG.tables.table.get_item(Key={'id': 1})
+
+Inside Lambda (AWS_LAMBDA_FUNCTION_NAME is set) a setting without a
+default must be present; elsewhere, e.g. in tests and benchmarks, its
+`local_default` stands in. A loaded Config cannot be changed.
+"""
+import os
+
+from commons import aws
+
+_REQUIRED = object()
+_TRUE = ('true', '1', 'yes', 'on')
+_FALSE = ('false', '0', 'no', 'off', '')
+
+
+class ConfigError(Exception):
+
+    def __init__(self, errors):
+        """
+        :param errors: {environment variable: problem}
+        """
+        super().__init__('Invalid configuration: ' + '; '.join(
+            f'{env}: {problem}' for env, problem in errors.items()))
+        self.errors = errors
+
+
+def _parse_bool(raw):
+    if raw.lower() in _TRUE:
+        return True
+    if raw.lower() in _FALSE:
+        return False
+    raise ValueError(f'expected one of {", ".join(_TRUE + _FALSE[:-1])}')
+
+
+class Setting:
+
+    def __init__(self, env, type=str, default=_REQUIRED, local_default=None,
+                 choices=None, minimum=None, maximum=None):
+        """
+        :param env: environment variable
+        :param type: str, int, float or bool
+        :param default: value when the variable is not set; required
+            when omitted
+        :param local_default: value of a required setting outside Lambda
+        :param choices: allowed values
+        :param minimum: smallest allowed value of a number
+        :param maximum: largest allowed value of a number
+        """
+        self.env = env
+        self.type = type
+        self.default = default
+        self.local_default = local_default
+        self.choices = choices
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def parse(self, raw):
+        """
+        :param raw: the variable's text
+        :return: the value
+        :raise ValueError: the text is not a valid value
+        """
+        if self.type is bool:
+            value = _parse_bool(raw)
+        elif self.type in (int, float):
+            try:
+                value = self.type(raw)
+            except ValueError:
+                raise ValueError(f'{raw!r} is not a valid '
+                                 f'{self.type.__name__}')
+        else:
+            value = raw
+            if not value:
+                raise ValueError('must not be empty')
+        if self.choices is not None and value not in self.choices:
+            raise ValueError(f'{value!r} is not one of {self.choices}')
+        if self.minimum is not None and value < self.minimum:
+            raise ValueError(f'{value} is less than {self.minimum}')
+        if self.maximum is not None and value > self.maximum:
+            raise ValueError(f'{value} is greater than {self.maximum}')
+        return value
+
+    def load(self, environ, in_lambda):
+        raw = environ.get(self.env)
+        if raw is not None:
+            return self.parse(raw)
+        if self.default is not _REQUIRED:
+            return self.default
+        if not in_lambda and self.local_default is not None:
+            return self.parse(str(self.local_default))
+        raise ValueError('is not set')
+
+
+class TableRef:
+    """A DynamoDB table named by the configuration"""
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        object.__setattr__(self, 'name', name)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('TableRef is immutable')
+
+    @property
+    def table(self):
+        """The table's handle from the container's commons.aws cache"""
+        return aws.get_table(self.name)
+
+    def __repr__(self):
+        return f'TableRef({self.name!r})'
+
+
+class BucketRef:
+    """An S3 bucket named by the configuration"""
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        object.__setattr__(self, 'name', name)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('BucketRef is immutable')
+
+    @property
+    def client(self):
+        """The container's cached S3 client"""
+        return aws.get_client('s3')
+
+    def put_object(self, **kwargs):
+        return self.client.put_object(Bucket=self.name, **kwargs)
+
+    def __repr__(self):
+        return f'BucketRef({self.name!r})'
+
+
+class TableSetting(Setting):
+    """Name of a DynamoDB table, loaded as a TableRef"""
+
+    def parse(self, raw):
+        return TableRef(super().parse(raw))
+
+
+class BucketSetting(Setting):
+    """Name of an S3 bucket, loaded as a BucketRef"""
+
+    def parse(self, raw):
+        return BucketRef(super().parse(raw))
+
+
+class Config:
+    """Base of a lambda's settings, declared as Setting class attributes"""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        declared = {}
+        for base in reversed(cls.__mro__):
+            declared.update((name, value) for name, value in
+                            vars(base).items() if isinstance(value, Setting))
+        cls._declared = declared
+
+    def __init__(self, environ=None):
+        """
+        :param environ: os.environ by default
+        :raise ConfigError: listing every missing or invalid setting
+        """
+        environ = os.environ if environ is None else environ
+        in_lambda = 'AWS_LAMBDA_FUNCTION_NAME' in environ
+        errors = {}
+        for name, setting in self._declared.items():
+            try:
+                object.__setattr__(self, name,
+                                   setting.load(environ, in_lambda))
+            except ValueError as e:
+                errors[setting.env] = str(e)
+        if errors:
+            raise ConfigError(errors)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self._declared}
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.as_dict()})'
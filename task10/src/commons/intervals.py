@@ -0,0 +1,118 @@
+"""Overlap checks against a set of half-open [start, end) intervals in
+O(log n), and a container-wide index of such sets kept for a TTL:
+
+    DAY_INDEX = IntervalIndex(ttl=60)
+    ...
+    day = DAY_INDEX.get((table_number, date))
+    if day is None:
+        day = DAY_INDEX.put((table_number, date), load_reservations())
+    if day.overlaps(600, 660):
+        ...
+
+The starts are kept sorted along with the running maximum of the ends, so
+intervals that overlap each other, e.g. written before a check was in
+place, are still answered correctly.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_KEYS = 1024
+
+
+class Intervals:
+
+    def __init__(self, intervals=()):
+        """
+        :param intervals: (start, end) pairs
+        """
+        self._starts = []
+        self._ends = []
+        # _max_ends[i] is the latest end among the first i + 1 intervals
+        self._max_ends = []
+        for start, end in sorted(intervals):
+            self._starts.append(start)
+            self._ends.append(end)
+            self._max_ends.append(max(end, self._max_ends[-1])
+                                  if self._max_ends else end)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def overlaps(self, start, end):
+        """
+        :return: whether [start, end) overlaps one of the intervals
+        """
+        last = bisect_left(self._starts, end) - 1
+        return last >= 0 and self._max_ends[last] > start
+
+    def add(self, start, end):
+        position = bisect_right(self._starts, start)
+        self._starts.insert(position, start)
+        self._ends.insert(position, end)
+        self._max_ends.insert(position, end)
+        for index in range(position, len(self._ends)):
+            previous = self._max_ends[index - 1] if index else end
+            self._max_ends[index] = max(self._ends[index], previous)
+
+
+class IntervalIndex:
+    """Intervals per key, e.g. (table, date), each kept for ttl seconds
+    after it was loaded; the least recently used keys are dropped beyond
+    max_keys"""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_keys=DEFAULT_MAX_KEYS,
+                 clock=time.monotonic):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        :return: the key's Intervals, None when not loaded or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            loaded_at, intervals = entry
+            if self.clock() - loaded_at >= self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return intervals
+
+    def put(self, key, intervals):
+        """
+        :param intervals: (start, end) pairs loaded for the key
+        :return: their Intervals
+        """
+        loaded = Intervals(intervals)
+        if not self.ttl:
+            return loaded
+        with self._lock:
+            self._entries[key] = (self.clock(), loaded)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+        return loaded
+
+    def add(self, key, start, end):
+        """Adds a written interval to the key's Intervals, if loaded"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[1].add(start, end)
+
+    def invalidate(self, key):
+        """Drops the key, e.g. after a write showed it is out of date"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,107 @@
+"""Cursor pagination of DynamoDB reads. A page is read from one or more
+Query or Scan requests run in order, e.g. one per day of a date range,
+each with Limit set to what the page still needs, so a page costs the
+items it returns no matter how large the table is:
+
+    items, cursor = paginate(
+        [(table.query, {'IndexName': DATE_INDEX,
+                        'KeyConditionExpression': Key('date').eq(day)})
+         for day in days],
+        limit=50, cursor=request.query.get('cursor'), scope='2024-05')
+
+The cursor handed to the client is opaque: the position in the requests
+and the LastEvaluatedKey, encoded. It is only accepted back with the
+same scope, so a cursor of one filter cannot be replayed with another.
+"""
+import base64
+import binascii
+import json
+import zlib
+
+from commons import codec
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 100
+
+
+class InvalidCursor(ValueError):
+    """The cursor was not issued for this listing"""
+
+
+def parse_limit(value, default=DEFAULT_LIMIT, maximum=MAX_LIMIT):
+    """
+    :param value: the limit query parameter, None when absent
+    :raise ValueError: not an integer between 1 and maximum
+    """
+    if value is None:
+        return default
+    limit = int(value)
+    if not 1 <= limit <= maximum:
+        raise ValueError(f'limit must be between 1 and {maximum}')
+    return limit
+
+
+def _checksum(scope):
+    return zlib.crc32(scope.encode())
+
+
+def encode_cursor(position, scope=''):
+    """
+    :param position: JSON-serializable dict, DynamoDB values included
+    :return: URL-safe string
+    """
+    data = codec.dumpb({'p': position, 's': _checksum(scope)})
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor, scope=''):
+    """
+    :return: the position encode_cursor was given
+    :raise InvalidCursor: malformed, or issued for another scope
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        position, checksum = data['p'], data['s']
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        raise InvalidCursor('Malformed cursor')
+    if checksum != _checksum(scope) or not isinstance(position, dict):
+        raise InvalidCursor('The cursor belongs to another listing')
+    return position
+
+
+def paginate(requests, limit, cursor=None, scope=''):
+    """
+    :param requests: (read, kwargs) pairs, e.g. (table.query, {...}),
+        read in order
+    :param limit: most items returned
+    :param cursor: the cursor of the previous page, None for the first
+    :param scope: what the cursor is bound to, e.g. the filters
+    :return: (items, cursor of the next page or None when there is none)
+    :raise InvalidCursor:
+    """
+    index, start_key = 0, None
+    if cursor:
+        position = decode_cursor(cursor, scope)
+        index, start_key = position.get('i', 0), position.get('k')
+        if not isinstance(index, int) or not 0 <= index <= len(requests):
+            raise InvalidCursor('Malformed cursor')
+    items = []
+    while index < len(requests):
+        read, kwargs = requests[index]
+        kwargs = dict(kwargs, Limit=limit - len(items))
+        if start_key is not None:
+            kwargs['ExclusiveStartKey'] = start_key
+        page = read(**kwargs)
+        items.extend(page.get('Items', []))
+        start_key = page.get('LastEvaluatedKey')
+        if start_key is None:
+            index += 1
+        if len(items) >= limit:
+            break
+    if index >= len(requests):
+        return items, None
+    position = {'i': index}
+    if start_key is not None:
+        position['k'] = start_key
+    return items, encode_cursor(position, scope)
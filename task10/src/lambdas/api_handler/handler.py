@@ -1,69 +1,273 @@
+import asyncio
 import json
-import boto3
-from commons.log_helper import get_logger
-from commons.abstract_lambda import AbstractLambda
-import os
-from decimal import Decimal
+from commons import aws, codec
+from commons.log_helper import get_logger, log_error
+from commons import aio
+from commons.catalog import Catalog, scan_all
+from commons.config import Config, Setting, TableSetting
+from commons.idempotency import IdempotencyInProgressError, idempotent
+from commons.intervals import IntervalIndex
+from commons.metrics import metrics
+from commons.pagination import decode_cursor, encode_cursor, paginate, \
+    parse_limit
+from commons.routing import Router
+from commons.validation import RequestValidator
 import uuid
-from boto3.dynamodb.conditions import Attr
-from datetime import datetime
-
-dynamodb = boto3.resource('dynamodb')
-cognito_client = boto3.client('cognito-idp')
-user_pool_id = os.environ.get("cup_id")
-client_id = os.environ.get("cup_client_id")
+from bisect import bisect_right
+from datetime import date as Date
 
 _LOG = get_logger('ApiHandler-handler')
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)  # Convert Decimal objects to float for JSON serialization
-        # Let the base class default method raise the TypeError
-        return super(DecimalEncoder, self).default(obj)
 
-class ApiHandler(AbstractLambda):
+class Settings(Config):
+    user_pool_id = Setting('cup_id', local_default='local-user-pool')
+    client_id = Setting('cup_client_id', local_default='local-client')
+    tables = TableSetting('tables_table', local_default='Tables')
+    reservations = TableSetting('reservation_tables',
+                                local_default='Reservations')
+    slots = TableSetting('reservation_slots_table',
+                         local_default='ReservationSlots')
+    # seconds the Tables catalog is used before it is read again, and
+    # beyond that while it is read again in the background
+    tables_cache_ttl = Setting('tables_cache_ttl', float, default=300,
+                               minimum=0)
+    tables_cache_stale_ttl = Setting('tables_cache_stale_ttl', float,
+                                     default=3600, minimum=0)
+    # seconds a table's reservations of a day are checked from memory
+    day_index_ttl = Setting('reservation_index_ttl', float, default=60,
+                            minimum=0)
+
+
+# a misconfigured deployment fails its cold start, not a request
+CONFIG = Settings()
+# the restaurant's tables by id and by number; a stream of the Tables
+# table delivered to this function keeps the receiving container current
+TABLES = Catalog(lambda: scan_all(CONFIG.tables.table), keys=('id', 'number'),
+                 ttl=CONFIG.tables_cache_ttl,
+                 stale_ttl=CONFIG.tables_cache_stale_ttl)
+# the reservations of one table on one day, ordered by their HH:MM start
+SLOT_INDEX = 'tableNumberDate-slotTimeStart-index'
+SLOT_KEY = 'tableNumberDate'
+# the reservations of a table ordered by date, and those of a day ordered
+# by their start, for listings filtered by table or by date
+TABLE_DATE_INDEX = 'tableNumber-date-index'
+DATE_INDEX = 'date-slotTimeStart-index'
+# days a listing by date alone may span, each is a Query of its own
+MAX_LISTED_DAYS = 31
+# the reservations of a table on a day as minutes since midnight, loaded
+# from TABLE_DATE_INDEX and kept up to date with the container's own
+# bookings.
+# Bookings of other containers show once the entry expires; until then
+# the slot transaction rejects what it misses
+DAY_INDEX = IntervalIndex(ttl=CONFIG.day_index_ttl)
+# internal attributes, left out of the API's reservations
+INTERNAL_FIELDS = (SLOT_KEY, 'slotStartMinute', 'slotEndMinute')
+
+
+# a reservation claims the cells of this many minutes it covers in
+# CONFIG.slots, so DynamoDB itself rejects a second claim
+SLOT_MINUTES = 15
+
+
+def slot_key(table_number, date):
+    return f'{table_number}#{date}'
+
+
+def minutes(time):
+    """
+    :param time: HH:MM
+    :return: minutes since midnight
+    """
+    hours, mins = time.split(':')
+    return int(hours) * 60 + int(mins)
+
+
+def reservation_minutes(reservation):
+    """
+    :return: (start, end) minutes of a stored reservation; those written
+        before they were stored as minutes are parsed
+    """
+    if 'slotStartMinute' in reservation:
+        return (int(reservation['slotStartMinute']),
+                int(reservation['slotEndMinute']))
+    return (minutes(reservation['slotTimeStart']),
+            minutes(reservation['slotTimeEnd']))
+
+
+def slot_cells(table_number, date, slot_time_start, slot_time_end):
+    """
+    :param slot_time_start: HH:MM, a multiple of SLOT_MINUTES
+    :param slot_time_end: HH:MM, a multiple of SLOT_MINUTES
+    :return: ids of the cells the slot covers, e.g. 1#2024-05-01#10:00
+        and 1#2024-05-01#10:15 for 10:00-10:30
+    """
+    return [f'{slot_key(table_number, date)}#{minute // 60:02d}:'
+            f'{minute % 60:02d}' for minute in
+            range(minutes(slot_time_start), minutes(slot_time_end),
+                  SLOT_MINUTES)]
+
+
+def listing_requests(table, table_number=None, date_from=None,
+                     date_to=None):
+    """
+    Reads of the reservations a listing returns, from the index that
+    serves its filters; without filters the table is scanned
+    :param table_number: int
+    :param date_from: first YYYY-MM-DD date, inclusive
+    :param date_to: last YYYY-MM-DD date, inclusive
+    :return: (read, kwargs) pairs for commons.pagination.paginate
+    :raise ValueError: filters no index serves
+    """
+    first = Date.fromisoformat(date_from) if date_from else None
+    last = Date.fromisoformat(date_to) if date_to else None
+    if first and last and first > last:
+        raise ValueError('dateFrom must not be after dateTo')
+    if table_number is None and first is None and last is None:
+        return [(table.scan, {})]
+    # loaded only by filtered listings
+    from boto3.dynamodb.conditions import Key
+    if table_number is not None:
+        if first is not None and first == last:
+            return [(table.query, {
+                'IndexName': SLOT_INDEX,
+                'KeyConditionExpression':
+                    Key(SLOT_KEY).eq(slot_key(table_number, date_from))})]
+        condition = Key('tableNumber').eq(table_number)
+        if first and last:
+            condition &= Key('date').between(date_from, date_to)
+        elif first:
+            condition &= Key('date').gte(date_from)
+        elif last:
+            condition &= Key('date').lte(date_to)
+        return [(table.query, {'IndexName': TABLE_DATE_INDEX,
+                               'KeyConditionExpression': condition})]
+    if first is None or last is None:
+        raise ValueError('dateFrom and dateTo are both required '
+                         'without tableNumber')
+    days = (last - first).days + 1
+    if days > MAX_LISTED_DAYS:
+        raise ValueError(f'At most {MAX_LISTED_DAYS} days can be listed '
+                         f'without tableNumber')
+    return [(table.query, {
+        'IndexName': DATE_INDEX,
+        'KeyConditionExpression': Key('date').eq(
+            Date.fromordinal(first.toordinal() + day).isoformat())})
+        for day in range(days)]
+
+
+def is_tables_stream(event):
+    records = event.get('Records')
+    return bool(records) and all(
+        record.get('eventSource') == 'aws:dynamodb' and
+        f":table/{CONFIG.tables.name}/" in record.get('eventSourceARN', '')
+        for record in records)
+
+
+router = Router()
+
+# HH:MM on a quarter hour, the slot cells' granularity
+TIME_SCHEMA = {'type': 'string',
+               'pattern': '^([01][0-9]|2[0-3]):(00|15|30|45)$'}
+VALIDATOR = RequestValidator()
+VALIDATOR.add('POST', '/signup', body={
+    'type': 'object',
+    'properties': {
+        'firstName': {'type': 'string', 'minLength': 1},
+        'lastName': {'type': 'string', 'minLength': 1},
+        'email': {'type': 'string', 'format': 'email'},
+        'password': {'type': 'string'}
+    },
+    'required': ['firstName', 'lastName', 'email', 'password']
+})
+VALIDATOR.add('POST', '/signin', body={
+    'type': 'object',
+    'properties': {
+        'email': {'type': 'string', 'format': 'email'},
+        'password': {'type': 'string'}
+    },
+    'required': ['email', 'password']
+})
+VALIDATOR.add('POST', '/tables', body={
+    'type': 'object',
+    'properties': {
+        'id': {'type': 'integer'},
+        'number': {'type': 'integer'},
+        'places': {'type': 'integer', 'minimum': 1},
+        'isVip': {'type': 'boolean'},
+        'minOrder': {'type': 'number', 'minimum': 0}
+    },
+    'required': ['id', 'number', 'places', 'isVip']
+})
+PAGE_QUERY = {
+    'limit': {'type': 'integer', 'minimum': 1, 'maximum': 100},
+    'cursor': {'type': 'string', 'minLength': 1}
+}
+VALIDATOR.add('GET', '/tables', query=PAGE_QUERY)
+VALIDATOR.add('GET', '/reservations', query={
+    **PAGE_QUERY,
+    'tableNumber': {'type': 'integer'},
+    'date': {'type': 'string', 'format': 'date'},
+    'dateFrom': {'type': 'string', 'format': 'date'},
+    'dateTo': {'type': 'string', 'format': 'date'}
+})
+VALIDATOR.add('POST', '/reservations', body={
+    'type': 'object',
+    'properties': {
+        'tableNumber': {'type': 'integer'},
+        'clientName': {'type': 'string', 'minLength': 1},
+        'phoneNumber': {'type': 'string', 'minLength': 1},
+        'date': {'type': 'string', 'format': 'date'},
+        'slotTimeStart': TIME_SCHEMA,
+        'slotTimeEnd': TIME_SCHEMA
+    },
+    'required': ['tableNumber', 'clientName', 'phoneNumber', 'date',
+                 'slotTimeStart', 'slotTimeEnd']
+})
+
+
+class ApiHandler(aio.AsyncAbstractLambda):
 
     def validate_request(self, event) -> dict:
-        pass
-        
-    def handle_request(self, event, context):
+        return VALIDATOR(event)
+
+    def invalid_request_response(self, errors):
+        return self.response(400, {'message': 'Invalid request',
+                                   'errors': errors})
+
+    def prewarm(self):
+        from boto3.dynamodb.conditions import Attr  # noqa: F401
+        aws.warm(services=('cognito-idp',),
+                 tables=(CONFIG.tables.name, CONFIG.reservations.name))
+        # opens the pooled connection to DynamoDB while loading the tables
+        TABLES.snapshot()
+
+    async def handle_request(self, event, context):
+        if is_tables_stream(event):
+            TABLES.apply_stream(event['Records'])
+            return {'batchItemFailures': []}
         try:
-            http_method = event['httpMethod']
-            path = event['path']
-            if path == '/signup' and http_method == 'POST':
-                return self.signup(event)
-            elif path == '/signin' and http_method == 'POST':
-                return self.signin(event)
-            elif path == '/tables' and http_method == 'GET':
-                return self.get_tables(event)
-            elif path == '/tables' and http_method == 'POST':
-                return self.create_table(event)
-            elif path.startswith('/tables/') and http_method == 'GET':
-                table_id = path.split('/')[-1]
-                return self.get_table_by_id(table_id, event)
-            elif path == '/reservations' and http_method == 'POST':
-                return self.create_reservation(event)
-            elif path == '/reservations' and http_method == 'GET':
-                return self.get_reservations(event)
-            else:
-                return {
-                    'statusCode': 400,
-                    'body': json.dumps({'message': 'Bad request'})
-                }
+            response = router.dispatch(self, event)
+            if asyncio.iscoroutine(response):
+                response = await response
+            return response
+        except IdempotencyInProgressError:
+            _LOG.warning('The first attempt of the request is still running')
+            return self.in_progress_response()
         except Exception as e:
-            _LOG.error(f"Error handling request: {str(e)}")
+            log_error(_LOG, e, "Error handling request: %s", e)
             return {
                 'statusCode': 500,
                 'body': json.dumps({'message': 'Internal server error'})
             }
 
-    def signup(self, event):
-        body = json.loads(event['body'])
+    @router.route('POST', '/signup')
+    def signup(self, request):
+        body = request.json()
+        cognito_client = aws.get_client('cognito-idp')
         try:
             # Create the user without setting a temporary password
             response = cognito_client.admin_create_user(
-                UserPoolId=user_pool_id,
+                UserPoolId=CONFIG.user_pool_id,
                 Username=body['email'],
                 UserAttributes=[
                     {'Name': 'email', 'Value': body['email']},
@@ -75,7 +279,7 @@ class ApiHandler(AbstractLambda):
 
             # Immediately set a permanent password for the user
             cognito_client.admin_set_user_password(
-                UserPoolId=user_pool_id,
+                UserPoolId=CONFIG.user_pool_id,
                 Username=body['email'],
                 Password=body['password'],
                 Permanent=True
@@ -88,9 +292,11 @@ class ApiHandler(AbstractLambda):
             _LOG.error(f"Signup error: {str(e)}")
             return self.response(400, 'Signup failed')
 
-    def signin(self, event):
+    @router.route('POST', '/signin')
+    def signin(self, request):
+        cognito_client = aws.get_client('cognito-idp')
         try:
-            body = json.loads(event.get('body', '{}'))  # Safely load the body
+            body = request.json()
             email = body.get('email')
             password = body.get('password')
 
@@ -99,7 +305,7 @@ class ApiHandler(AbstractLambda):
                 return self.response(400, 'OK')
 
             response = cognito_client.initiate_auth(
-                ClientId=client_id,
+                ClientId=CONFIG.client_id,
                 AuthFlow='USER_PASSWORD_AUTH',
                 AuthParameters={
                     'USERNAME': email,
@@ -119,27 +325,46 @@ class ApiHandler(AbstractLambda):
             return self.response(400, 'Login failed')
 
     def response(self, status_code, body):
+        with metrics.timer('serialization'):
+            return self._response(status_code, body)
+
+    def _response(self, status_code, body):
         return {
             'statusCode': status_code,
-            'body': json.dumps(body) if isinstance(body, dict) else body
+            'headers': {
+                "Access-Control-Allow-Headers": "Content-Type,X-Amz-Date,Authorization,X-Api-Key,X-Amz-Security-Token",
+                "Access-Control-Allow-Origin": "*",
+                "Access-Control-Allow-Methods": "OPTIONS,POST,GET",
+                "Accept-Version": "*"
+            },
+            'body': codec.dumps(body) if isinstance(body, dict) else body
         }
 
-    def get_tables(self, event):
-        # Assuming your DynamoDB table holding the tables is called 'Tables'
-        table_name = os.environ.get("tables_table", "Tables")  # Best practice to use environment variable for table name
-        table = dynamodb.Table(table_name)
-
-        # Attempt to fetch all table entries from your DynamoDB 'Tables' table
+    @router.route('GET', '/tables')
+    def get_tables(self, request):
+        # pages of the catalog ordered by id, the cursor is the last id
+        cursor = request.query.get('cursor')
         try:
-            response = table.scan()  # This retrieves all items in the table. Consider Query for more scalability
-            # Serialize and then Deserialize the Items using DecimalEncoder for handling Decimal objects correctly
-            serialized_tables = json.dumps(response.get('Items', []), cls=DecimalEncoder)
-            tables_data = json.loads(serialized_tables)
+            limit = parse_limit(request.query.get('limit'))
+            after = decode_cursor(cursor, 'tables').get('id') \
+                if cursor else None
+            if not isinstance(after, (int, type(None))):
+                raise ValueError('Malformed cursor')
+        except ValueError as e:
+            return self.response(400, f'Bad request: {e}')
 
-            # Return the response with the list of formatted table data
+        try:
+            tables = TABLES.sorted_by('id')
+            start = 0 if after is None else \
+                bisect_right(tables, after, key=lambda item: item['id'])
+            page = tables[start:start + limit]
+            next_cursor = encode_cursor({'id': page[-1]['id']}, 'tables') \
+                if start + limit < len(tables) else None
+            # Decimal values are converted while encoding, in a single pass
             return {
                 'statusCode': 200,
-                'body': json.dumps({"tables": tables_data})
+                'body': codec.dumps({"tables": page,
+                                     "nextCursor": next_cursor})
             }
 
         except Exception as e:
@@ -149,10 +374,11 @@ class ApiHandler(AbstractLambda):
                 'body': json.dumps('Internal server error fetching table data')
             }
 
-    def create_table(self, event):
+    @router.route('POST', '/tables')
+    def create_table(self, request):
         # Parse the body from the event
         try:
-            body = json.loads(event.get('body', '{}'))
+            body = request.json()
             # Convert id to int as per specification
             table_id = int(body.get('id'))  # This can raise a ValueError if 'id' is not a valid integer string
             table_number = int(body['number'])
@@ -160,9 +386,7 @@ class ApiHandler(AbstractLambda):
             is_vip = bool(body['isVip'])
             min_order = body.get('minOrder')
 
-            # Assuming your DynamoDB table is named 'Tables'
-            table_name = os.environ.get('tables_table', 'Tables')
-            table = dynamodb.Table(table_name)
+            table = CONFIG.tables.table
 
             # Construct the item to insert into DynamoDB
             item = {
@@ -176,6 +400,7 @@ class ApiHandler(AbstractLambda):
 
             # Insert the item into DynamoDB
             table.put_item(Item=item)
+            TABLES.put(item)
 
             # Successfully created the table, return the id
             return self.response(200, {'id': table_id})
@@ -184,87 +409,67 @@ class ApiHandler(AbstractLambda):
             _LOG.error(f"Error creating table: {str(e)}")
             return self.response(400, 'Bad request')
 
-    def get_table_by_id(self, table_id, event):
-        # Convert table_id to the correct type if necessary, assuming it's an integer
-        # If table_id is supposed to be an int, ensure to handle conversion errors
-        try:
-            table_id = int(table_id)
-        except ValueError:
-            return self.response(400, 'Bad request: tableId must be an integer')
+    @router.route('GET', '/tables/{tableId:int}')
+    def get_table_by_id(self, request):
+        # the router answers 400 when tableId is not an integer
+        table_id = request.path_params['tableId']
 
         try:
-            table_name = os.environ.get('tables_table', 'Tables')
-            table = dynamodb.Table(table_name)
-
-            # Query DynamoDB for the table with the given ID
-            response = table.get_item(
-                Key={
-                    'id': table_id
-                }
-            )
+            item = TABLES.get('id', table_id)
 
             # Check if the table was found
-            if 'Item' not in response:
+            if item is None:
                 return self.response(404, 'Table not found')
 
-            table_data = response['Item']
-            serialized_data = json.dumps(table_data, cls=DecimalEncoder)
-
             # Return the found table data
-            return self.response(200, json.loads(serialized_data))
+            return self.response(200, item)
 
         except Exception as e:
             _LOG.error(f"Error fetching table by ID: {str(e)}")
             return self.response(500, 'Internal server error')
 
-    def create_reservation(self, event):
+    @router.route('POST', '/reservations')
+    # a retried request returns the reservation it already created
+    @idempotent(payload=lambda self, request: request.json(),
+                keep_result=lambda response: response['statusCode'] == 200)
+    async def create_reservation(self, request):
         try:
-            body = json.loads(event.get('body', '{}'))
+            body = request.json()
             table_number = int(body.get('tableNumber'))
             client_name = body.get('clientName')
             phone_number = body.get('phoneNumber')
             date = body.get('date')
             slot_time_start = body.get('slotTimeStart')
             slot_time_end = body.get('slotTimeEnd')
+            start, end = minutes(slot_time_start), minutes(slot_time_end)
+            if end <= start:
+                return {
+                    'statusCode': 400,
+                    'body': codec.dumps('Bad request: the slot must end after it starts')
+                }
+            if start % SLOT_MINUTES or end % SLOT_MINUTES:
+                # whole cells, or adjacent slots would share one
+                return {
+                    'statusCode': 400,
+                    'body': codec.dumps(f'Bad request: the slot must start and end on a multiple of {SLOT_MINUTES} minutes')
+                }
 
-            # DynamoDB Table Names
-            tables_table_name = os.environ.get('tables_table', 'cmtr-f7e4afc6-Tables-test')
-            reservation_table_name = os.environ.get('reservation_tables', 'cmtr-f7e4afc6-Reservations-test')
-
-            # Check if the table exists
-            tables_table = dynamodb.Table(tables_table_name)
-            table_response = tables_table.scan(
-                FilterExpression=Attr('number').eq(table_number)
-            )
-
-            if not table_response.get('Items'):  # No matching table found
+            # Check that the table exists, then look for overlapping
+            # reservations
+            table_item = TABLES.get('number', table_number)
+            if table_item is None:  # No matching table found
                 _LOG.error(
-                    f"Table with number {table_number} not found in table {tables_table_name}. Response: {table_response}")
+                    f"Table with number {table_number} not found in table {CONFIG.tables.name}")
                 return {
                     'statusCode': 400,
-                    'body': json.dumps(f'Non-existent table {table_number}', cls=DecimalEncoder)
+                    'body': codec.dumps(f'Non-existent table {table_number}')
                 }
-            # Extract the table item
-            table_item = table_response['Items'][0]
             _LOG.info(f"Table found: {table_item}")
 
-            # Check for overlapping reservations
-            reservations_table = dynamodb.Table(reservation_table_name)
-            scan_result = reservations_table.scan(
-                FilterExpression=Attr('tableNumber').eq(table_number) & Attr('date').eq(date)
-            )
-            for reservation in scan_result['Items']:
-                existing_start = datetime.strptime(reservation['slotTimeStart'], '%H:%M')
-                existing_end = datetime.strptime(reservation['slotTimeEnd'], '%H:%M')
-                new_start = datetime.strptime(slot_time_start, '%H:%M')
-                new_end = datetime.strptime(slot_time_end, '%H:%M')
-
-                if new_start < existing_end and new_end > existing_start:
-                    _LOG.error("Reservation overlaps with an existing reservation.")
-                    return {
-                        'statusCode': 400,
-                        'body': json.dumps('Reservation overlaps with an existing reservation', cls=DecimalEncoder)
-                    }
+            day = await self.reservations_of_day(table_number, date)
+            if day.overlaps(start, end):
+                _LOG.error("Reservation overlaps with an existing reservation.")
+                return self.overlap_response()
 
             # Proceed to create the reservation since no overlaps exist and table exists
             reservation_id = str(uuid.uuid4())
@@ -275,44 +480,137 @@ class ApiHandler(AbstractLambda):
                 'phoneNumber': phone_number,
                 'date': date,
                 'slotTimeStart': slot_time_start,
-                'slotTimeEnd': slot_time_end
+                'slotTimeEnd': slot_time_end,
+                'slotStartMinute': start,
+                'slotEndMinute': end,
+                SLOT_KEY: slot_key(table_number, date)
             }
 
-            reservations_table.put_item(Item=item)
+            if not await self.claim_slots(item):
+                _LOG.error("Reservation overlaps with a concurrent reservation.")
+                # booked by another container since the day was loaded
+                DAY_INDEX.invalidate((table_number, date))
+                return self.overlap_response()
+            DAY_INDEX.add((table_number, date), start, end)
             _LOG.info(f"Reservation created successfully: {reservation_id}")
             return {
                 'statusCode': 200,
-                'body': json.dumps({'reservationId': reservation_id}, cls=DecimalEncoder)
+                'body': codec.dumps({'reservationId': reservation_id})
             }
 
         except KeyError as e:
             _LOG.error(f"Missing required reservation field: {str(e)}")
             return {
                 'statusCode': 400,
-                'body': json.dumps('Bad request: Missing required field', cls=DecimalEncoder)
+                'body': codec.dumps('Bad request: Missing required field')
             }
         except Exception as e:
             _LOG.error(f"Error creating reservation: {str(e)}")
             return {
                 'statusCode': 400,
-                'body': json.dumps('Unable to create reservation', cls=DecimalEncoder)
+                'body': codec.dumps('Unable to create reservation')
             }
 
-    def get_reservations(self, event):
-        try:
-            table_name = os.environ.get('reservation_tables', 'Reservations')
-            table = dynamodb.Table(table_name)
-
-            # Perform the scan operation to retrieve all reservations
-            scan_result = table.scan()
-
-            # Serialize and then Deserialize the Items using DecimalEncoder
-            # for handling Decimal objects correctly
-            serialized_reservations = json.dumps(scan_result['Items'], cls=DecimalEncoder)
-            reservations_data = json.loads(serialized_reservations)
+    def overlap_response(self):
+        return {
+            'statusCode': 400,
+            'body': codec.dumps('Reservation overlaps with an existing reservation')
+        }
 
-            # Return the response with the list of formatted reservations using self.response
-            return self.response(200, {"reservations": reservations_data})
+    def in_progress_response(self):
+        # a retry arriving before the first attempt has stored its result
+        response = self.response(409, {
+            'message': 'The same request is still being processed'})
+        response['headers']['Retry-After'] = '1'
+        return response
+
+    async def claim_slots(self, reservation):
+        """
+        Writes the reservation together with the slot cells it covers in
+        one transaction, conditional on none of the cells being taken. Of
+        concurrent bookings of a cell, DynamoDB lets exactly one through
+        :return: False when a cell is taken
+        """
+        from boto3.dynamodb.conditions import Attr
+        from botocore.exceptions import ClientError
+        not_taken = Attr('id').not_exists()
+        items = [{'Put': {'TableName': CONFIG.reservations.name,
+                          'Item': reservation,
+                          'ConditionExpression': not_taken}}]
+        for cell in slot_cells(reservation['tableNumber'], reservation['date'],
+                               reservation['slotTimeStart'],
+                               reservation['slotTimeEnd']):
+            items.append({'Put': {'TableName': CONFIG.slots.name,
+                                  'Item': {'id': cell,
+                                           'reservationId': reservation['id']},
+                                  'ConditionExpression': not_taken}})
+        try:
+            await aio.call(aws.transact_write, items)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'TransactionCanceledException':
+                return False
+            raise
+        return True
+
+    async def reservations_of_day(self, table_number, date):
+        """
+        :return: commons.intervals.Intervals of the table's reservations
+            that day, from DAY_INDEX while it is fresh, otherwise queried
+            a page at a time. TABLE_DATE_INDEX rather than SLOT_INDEX, so
+            reservations written before tableNumberDate are checked too
+        """
+        key = (table_number, date)
+        day = DAY_INDEX.get(key)
+        if day is not None:
+            return day
+        from boto3.dynamodb.conditions import Key
+        query = {
+            'IndexName': TABLE_DATE_INDEX,
+            'KeyConditionExpression':
+                Key('tableNumber').eq(table_number) & Key('date').eq(date),
+            'ProjectionExpression': 'slotTimeStart, slotTimeEnd, '
+                                    'slotStartMinute, slotEndMinute'
+        }
+        reservations_table = aio.table(CONFIG.reservations.name)
+        intervals = []
+        while True:
+            page = await reservations_table.query(**query)
+            intervals.extend(map(reservation_minutes, page['Items']))
+            if 'LastEvaluatedKey' not in page:
+                return DAY_INDEX.put(key, intervals)
+            query['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+    @router.route('GET', '/reservations')
+    def get_reservations(self, request):
+        query = request.query
+        date = query.get('date')
+        if date and (query.get('dateFrom') or query.get('dateTo')):
+            return self.response(
+                400, 'Bad request: date cannot be combined with dateFrom '
+                     'or dateTo')
+        date_from = query.get('dateFrom') or date
+        date_to = query.get('dateTo') or date
+        try:
+            limit = parse_limit(query.get('limit'))
+            table_number = query.get('tableNumber')
+            if table_number is not None:
+                table_number = int(table_number)
+            requests = listing_requests(CONFIG.reservations.table,
+                                        table_number, date_from, date_to)
+            # a cursor only continues the listing it was issued for
+            reservations, next_cursor = paginate(
+                requests, limit, query.get('cursor'),
+                scope=f'{table_number}|{date_from}|{date_to}')
+            for reservation in reservations:
+                for field in INTERNAL_FIELDS:
+                    reservation.pop(field, None)
+
+            # Return the response with the list of reservations using self.response
+            return self.response(200, {"reservations": reservations,
+                                       "nextCursor": next_cursor})
+
+        except ValueError as e:
+            return self.response(400, f'Bad request: {e}')
 
         except Exception as e:
             _LOG.error(f"Error fetching reservations: {str(e)}")
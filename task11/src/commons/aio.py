@@ -0,0 +1,154 @@
+"""Concurrent I/O for handlers that make several independent calls. boto3
+and requests block, so the awaitables here run them on a bounded thread
+pool shared by the container, driven by one event loop that is reused
+across invocations:
+
+    class ApiHandler(AsyncAbstractLambda):
+
+        async def handle_request(self, event, context):
+            table, reservations = await asyncio.gather(
+                aio.table('Tables').get_item(Key={'id': 1}),
+                aio.table('Reservations').scan())
+
+The pool is no larger than the botocore connection pool, so concurrent
+calls do not queue for connections inside botocore instead.
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from commons import aws, deadline
+from commons.abstract_lambda import AbstractLambda
+
+DEFAULT_HTTP_TIMEOUT = 10
+
+_loop = None
+_executor = None
+_proxies = {}
+_session = None
+_lock = threading.Lock()
+
+
+def max_workers():
+    return int(os.environ.get('aio_max_workers', os.environ.get(
+        'aws_max_pool_connections', aws.DEFAULT_MAX_POOL_CONNECTIONS)))
+
+
+def get_executor():
+    """Thread pool the blocking calls run on, created on first use"""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max_workers(), thread_name_prefix='aio')
+    return _executor
+
+
+def get_loop():
+    """Event loop kept for the lifetime of the container"""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        _loop.set_default_executor(get_executor())
+    return _loop
+
+
+def run(coroutine):
+    """Runs the coroutine to completion on the container's loop"""
+    return get_loop().run_until_complete(coroutine)
+
+
+async def call(func, *args, **kwargs):
+    """
+    Awaits a blocking call made on the thread pool
+    :param func: e.g. table.put_item
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        get_executor(), functools.partial(func, *args, **kwargs))
+
+
+class AsyncProxy:
+    """Exposes the methods of a boto3 client or Table as coroutine
+    functions; other attributes, e.g. client.exceptions, pass through.
+    The target is looked up on every call, so aws.set_factory applies"""
+
+    def __init__(self, get_target):
+        self._get_target = get_target
+
+    def __getattr__(self, name):
+        attribute = getattr(self._get_target(), name)
+        if not callable(attribute):
+            return attribute
+
+        async def method(*args, **kwargs):
+            return await call(getattr(self._get_target(), name),
+                              *args, **kwargs)
+        method.__name__ = name
+        return method
+
+
+def _proxy(key, get_target):
+    proxy = _proxies.get(key)
+    if proxy is None:
+        proxy = _proxies[key] = AsyncProxy(get_target)
+    return proxy
+
+
+def table(table_name):
+    """
+    DynamoDB Table with awaitable put_item, get_item, query, scan...
+    :param table_name: physical table name
+    """
+    return _proxy(('table', table_name), lambda: aws.get_table(table_name))
+
+
+def client(service_name):
+    """
+    boto3 client with awaitable API calls, e.g. client('s3').put_object
+    :param service_name: e.g. 's3', 'cognito-idp'
+    """
+    return _proxy(('client', service_name),
+                  lambda: aws.get_client(service_name))
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_workers())
+        _session.mount('https://', adapter)
+        _session.mount('http://', adapter)
+    return _session
+
+
+async def http(method, url, **kwargs):
+    """
+    Awaitable requests call on a pooled session
+    :param kwargs: requests arguments; timeout defaults to
+        DEFAULT_HTTP_TIMEOUT capped to the invocation's deadline
+    :return: requests.Response
+    """
+    kwargs.setdefault('timeout', deadline.current().timeout(
+        DEFAULT_HTTP_TIMEOUT))
+    return await call(_get_session().request, method, url, **kwargs)
+
+
+class AsyncAbstractLambda(AbstractLambda):
+    """AbstractLambda whose handle_request is a coroutine function"""
+
+    async def handle_request(self, event, context):
+        """
+        Inherited lambda function code
+        :param event: lambda event
+        :param context: lambda context
+        :return:
+        """
+        pass
+
+    def invoke_handler(self, event, context):
+        return run(self.handle_request(event=event, context=context))
@@ -0,0 +1,191 @@
+"""Record-by-record processing of SQS, Kinesis and DynamoDB Streams batches
+that reports only the failed records back to Lambda. The event source
+mapping needs "function_response_types": ["ReportBatchItemFailures"].
+
+    PROCESSOR = BatchProcessor(process_record, max_workers=4)
+
+    def handle_request(self, event, context):
+        return PROCESSOR.process(event)
+
+Records sharing a message group (FIFO SQS), partition key (Kinesis) or item
+key (DynamoDB Streams) run one after another in batch order; different
+groups run in parallel. Once a record fails, the later records of its
+group are reported as failed without being run, so a retry sees them in
+their original order. For streams Lambda resumes from the lowest failed
+sequence number, so records of other groups after it are delivered again.
+
+When the invocation's deadline comes within `min_remaining_ms`, no more
+records are started and the unprocessed ones are reported as failed, to be
+delivered again instead of being cut off by the Lambda timeout.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from commons import deadline
+from commons.log_helper import get_logger, log_error
+
+_LOG = get_logger('batch')
+
+SQS = 'aws:sqs'
+KINESIS = 'aws:kinesis'
+DYNAMODB = 'aws:dynamodb'
+DEFAULT_MIN_REMAINING_MS = 1000
+
+
+def event_source(record):
+    return record.get('eventSource') or record.get('EventSource')
+
+
+def item_identifier(record):
+    """
+    :return: what batchItemFailures identifies the record by: the SQS
+        message id or the stream sequence number
+    """
+    source = event_source(record)
+    if source == KINESIS:
+        return record['kinesis']['sequenceNumber']
+    if source == DYNAMODB:
+        return record['dynamodb']['SequenceNumber']
+    return record['messageId']
+
+
+def group_key(record):
+    """
+    :return: key of the records that must be processed in order, None when
+        the record is independent of the others
+    """
+    source = event_source(record)
+    if source == KINESIS:
+        return record['kinesis'].get('partitionKey')
+    if source == DYNAMODB:
+        return json.dumps(record['dynamodb'].get('Keys'), sort_keys=True)
+    return record.get('attributes', {}).get('MessageGroupId')
+
+
+def _groups(records, key):
+    """
+    :return: lists of records in batch order, one per group
+    """
+    groups, independent = {}, []
+    for record in records:
+        name = key(record)
+        if name is None:
+            independent.append([record])
+        else:
+            groups.setdefault(name, []).append(record)
+    return list(groups.values()) + independent
+
+
+def response(failed):
+    """
+    :param failed: identifiers of the failed records
+    :return: the partial batch response Lambda expects
+    """
+    return {'batchItemFailures': [{'itemIdentifier': identifier}
+                                  for identifier in failed]}
+
+
+class BatchProcessor:
+
+    def __init__(self, handler, max_workers=1, key=group_key,
+                 min_remaining_ms=None):
+        """
+        :param handler: f(record), a failure is any exception it raises; a
+            coroutine function when the batch is run with process_async
+        :param max_workers: groups processed at the same time
+        :param key: f(record) -> group of the record, None for none
+        :param min_remaining_ms: time a record needs; with less left no
+            more records are started. `batch_min_remaining_ms` env
+            variable by default
+        """
+        self.handler = handler
+        self.max_workers = max_workers
+        self.key = key
+        if min_remaining_ms is None:
+            min_remaining_ms = int(os.environ.get(
+                'batch_min_remaining_ms', DEFAULT_MIN_REMAINING_MS))
+        self.min_remaining_ms = min_remaining_ms
+        self._executor = None
+
+    def _failed(self, record, error):
+        identifier = item_identifier(record)
+        log_error(_LOG, error, 'Record %s failed: %s', identifier, error,
+                  detail=record)
+        return identifier
+
+    def _out_of_time(self, records):
+        """
+        :return: identifiers of the records when the deadline is too close
+            to start them, None otherwise
+        """
+        current = deadline.current()
+        if not current.expired(self.min_remaining_ms):
+            return None
+        _LOG.warning('%.0f ms left, leaving %d records unprocessed',
+                     current.remaining_ms(), len(records))
+        return [item_identifier(record) for record in records]
+
+    def _process_group(self, records):
+        """
+        :return: identifiers of the failed records of the group
+        """
+        for index, record in enumerate(records):
+            unprocessed = self._out_of_time(records[index:])
+            if unprocessed is not None:
+                return unprocessed
+            try:
+                self.handler(record)
+            except Exception as e:
+                return [self._failed(record, e)] + [
+                    item_identifier(rest) for rest in records[index + 1:]]
+        return []
+
+    def process(self, event):
+        """
+        Runs the handler for every record of the batch
+        :return: {'batchItemFailures': [...]}
+        """
+        groups = _groups(event.get('Records', []), self.key)
+        if self.max_workers <= 1 or len(groups) <= 1:
+            results = map(self._process_group, groups)
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='batch')
+            results = self._executor.map(self._process_group, groups)
+        return self._response(results)
+
+    async def _process_group_async(self, records, semaphore):
+        async with semaphore:
+            for index, record in enumerate(records):
+                unprocessed = self._out_of_time(records[index:])
+                if unprocessed is not None:
+                    return unprocessed
+                try:
+                    await self.handler(record)
+                except Exception as e:
+                    return [self._failed(record, e)] + [
+                        item_identifier(rest) for rest in records[index + 1:]]
+        return []
+
+    async def process_async(self, event):
+        """
+        process for a coroutine function handler, e.g. one awaiting
+        commons.aio calls
+        :return: {'batchItemFailures': [...]}
+        """
+        import asyncio
+        semaphore = asyncio.Semaphore(max(self.max_workers, 1))
+        results = await asyncio.gather(*(
+            self._process_group_async(records, semaphore)
+            for records in _groups(event.get('Records', []), self.key)))
+        return self._response(results)
+
+    @staticmethod
+    def _response(results):
+        failed = [identifier for group in results for identifier in group]
+        if failed:
+            _LOG.warning('%d records failed', len(failed))
+        return response(failed)
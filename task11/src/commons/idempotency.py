@@ -0,0 +1,313 @@
+"""Makes a retried invocation return the first attempt's result instead of
+running again. The first call with a payload writes an INPROGRESS record
+conditionally, runs the function and stores its result with a TTL; calls
+with the same payload get the stored result, or IdempotencyInProgressError
+while the first one is still running. Results are also kept in a
+per-container LRU so repeats reaching a warm container skip the store.
+
+    @idempotent(payload=lambda self, record: record['eventID'])
+    def process_record(self, record):
+        ...
+
+The store is DynamoDB when the `idempotency_table` setting is set, a table
+with a string `id` hash key and TTL on `expiration`; otherwise InMemoryStore,
+which only covers retries reaching the same container. It is made on the
+first call, so applying the decorator at import reads no settings.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from commons.config import Config, TableSetting
+from commons.log_helper import get_logger
+
+_LOG = get_logger('idempotency')
+
+INPROGRESS = 'INPROGRESS'
+COMPLETED = 'COMPLETED'
+DEFAULT_TTL = 3600
+# how long a crashed attempt blocks its key
+DEFAULT_IN_PROGRESS_TTL = 120
+DEFAULT_CACHE_SIZE = 256
+
+
+class IdempotencyInProgressError(Exception):
+    """Another attempt with the same payload has not finished yet"""
+
+
+class RecordExistsError(Exception):
+
+    def __init__(self, key):
+        super().__init__(key)
+        self.key = key
+
+
+class InMemoryStore:
+    """Store kept in the container, also the offline backend for tests"""
+
+    def __init__(self):
+        self.items = {}
+        self._lock = threading.Lock()
+
+    def put_in_progress(self, key, expiration, in_progress_expiration):
+        now = time.time()
+        with self._lock:
+            item = self.items.get(key)
+            if item is not None and item['expiration'] >= now and not (
+                    item['status'] == INPROGRESS and
+                    item['in_progress_expiration'] < now):
+                raise RecordExistsError(key)
+            self.items[key] = {'status': INPROGRESS,
+                               'expiration': expiration,
+                               'in_progress_expiration':
+                                   in_progress_expiration}
+
+    def get(self, key):
+        """
+        :return: (status, result) or None
+        """
+        item = self.items.get(key)
+        if item is None or item['expiration'] < time.time():
+            return None
+        return item['status'], item.get('data')
+
+    def complete(self, key, data, expiration):
+        with self._lock:
+            self.items[key] = {'status': COMPLETED, 'expiration': expiration,
+                               'data': data}
+
+    def delete(self, key):
+        with self._lock:
+            self.items.pop(key, None)
+
+
+class DynamoDBStore:
+    """Records in a DynamoDB table: `id` hash key, `expiration` epoch
+    seconds for the table's TTL, `status`, `in_progress_expiration` and
+    the result as a JSON string in `data`"""
+
+    def __init__(self, table_name):
+        self.table_name = table_name
+
+    @property
+    def table(self):
+        from commons import aws
+        return aws.get_table(self.table_name)
+
+    def put_in_progress(self, key, expiration, in_progress_expiration):
+        from boto3.dynamodb.conditions import Attr
+        now = int(time.time())
+        try:
+            self.table.put_item(
+                Item={'id': key, 'status': INPROGRESS,
+                      'expiration': int(expiration),
+                      'in_progress_expiration': int(in_progress_expiration)},
+                ConditionExpression=Attr('id').not_exists() |
+                Attr('expiration').lt(now) |
+                (Attr('status').eq(INPROGRESS) &
+                 Attr('in_progress_expiration').lt(now)))
+        except Exception as e:
+            code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+            if code == 'ConditionalCheckFailedException':
+                raise RecordExistsError(key)
+            raise
+
+    def get(self, key):
+        item = self.table.get_item(Key={'id': key},
+                                   ConsistentRead=True).get('Item')
+        if item is None or item['expiration'] < time.time():
+            return None
+        data = item.get('data')
+        return item['status'], json.loads(data) if data is not None else None
+
+    def complete(self, key, data, expiration):
+        self.table.put_item(Item={'id': key, 'status': COMPLETED,
+                                  'expiration': int(expiration),
+                                  'data': json.dumps(data, default=str)})
+
+    def delete(self, key):
+        self.table.delete_item(Key={'id': key})
+
+
+class Settings(Config):
+    # unset keeps the results in the container's memory
+    table = TableSetting('idempotency_table', default=None)
+
+
+def default_store(config=None):
+    """
+    :param config: Settings, read from the environment when None
+    :return: DynamoDBStore of the configured table, InMemoryStore when
+        there is none
+    """
+    config = Settings() if config is None else config
+    if config.table is not None:
+        return DynamoDBStore(config.table.name)
+    _LOG.debug('idempotency_table is not set, results are kept in memory')
+    return InMemoryStore()
+
+
+def _first_dict(*args, **kwargs):
+    for argument in args + tuple(kwargs.values()):
+        if isinstance(argument, dict):
+            return argument
+    raise ValueError('No dict argument to derive the idempotency key from')
+
+
+def hash_payload(payload):
+    """
+    :return: sha256 of the payload's canonical JSON
+    """
+    if not isinstance(payload, (str, bytes)):
+        payload = json.dumps(payload, sort_keys=True, default=str)
+    if isinstance(payload, str):
+        payload = payload.encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+class _LRU:
+
+    def __init__(self, size):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return entry
+
+    def put(self, key, expiration, result):
+        if not self.size:
+            return
+        with self._lock:
+            self._items[key] = (expiration, result)
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+
+class Idempotency:
+
+    def __init__(self, store, payload=_first_dict, ttl=DEFAULT_TTL,
+                 in_progress_ttl=DEFAULT_IN_PROGRESS_TTL,
+                 cache_size=DEFAULT_CACHE_SIZE, keep_result=None):
+        """
+        :param store: InMemoryStore, DynamoDBStore or alike; None for
+            default_store(), made on the first call
+        :param payload: f(*args, **kwargs) of the decorated function ->
+            what identifies a call, e.g. the SQS message id; hashed. The
+            first dict argument by default
+        :param ttl: seconds a result is replayed for
+        :param in_progress_ttl: seconds after which an attempt that never
+            completed stops blocking its key
+        :param cache_size: results kept in the container, 0 disables
+        :param keep_result: f(result) -> bool, whether the result is final;
+            calls with other results, e.g. 5xx responses, run again when
+            retried. Every result is kept by default
+        """
+        self._store = store
+        self._store_lock = threading.Lock()
+        self.payload = payload
+        self.ttl = ttl
+        self.in_progress_ttl = in_progress_ttl
+        self.cache = _LRU(cache_size)
+        self.keep_result = keep_result
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._store_lock:
+                if self._store is None:
+                    self._store = default_store()
+        return self._store
+
+    def _begin(self, key):
+        """
+        :return: (True, stored result) when the call already completed,
+            (False, None) when it is this attempt's to run
+        """
+        cached = self.cache.get(key)
+        if cached is not None:
+            return True, cached[1]
+        now = time.time()
+        try:
+            self.store.put_in_progress(key, now + self.ttl,
+                                       now + self.in_progress_ttl)
+        except RecordExistsError:
+            record = self.store.get(key)
+            if record is None:  # expired in between
+                return self._begin(key)
+            status, result = record
+            if status != COMPLETED:
+                raise IdempotencyInProgressError(key)
+            _LOG.info('Replaying the result of %s', key)
+            self.cache.put(key, now + self.ttl, result)
+            return True, result
+        return False, None
+
+    def _complete(self, key, result):
+        if self.keep_result is not None and not self.keep_result(result):
+            self.store.delete(key)
+            return
+        expiration = time.time() + self.ttl
+        self.store.complete(key, result, expiration)
+        self.cache.put(key, expiration, result)
+
+    def __call__(self, func):
+        prefix = func.__qualname__
+
+        def key_of(args, kwargs):
+            return f'{prefix}#{hash_payload(self.payload(*args, **kwargs))}'
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                import asyncio
+                loop = asyncio.get_running_loop()
+                key = key_of(args, kwargs)
+                done, result = await loop.run_in_executor(
+                    None, self._begin, key)
+                if done:
+                    return result
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException:
+                    await loop.run_in_executor(None, self.store.delete, key)
+                    raise
+                await loop.run_in_executor(None, self._complete, key, result)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = key_of(args, kwargs)
+            done, result = self._begin(key)
+            if done:
+                return result
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                self.store.delete(key)
+                raise
+            self._complete(key, result)
+            return result
+        return wrapper
+
+
+def idempotent(store=None, **kwargs):
+    """
+    Decorator, see Idempotency for the keyword arguments
+    :param store: default_store() when None
+    """
+    return Idempotency(store, **kwargs)
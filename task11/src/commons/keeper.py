@@ -0,0 +1,75 @@
+"""Sends concurrent warm-up invocations so that N containers are initialized
+before a traffic spike:
+
+    python -m commons.keeper api_handler --concurrency 10 --qualifier prod
+"""
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from commons import aws
+from commons.log_helper import get_logger
+
+_LOG = get_logger('keeper')
+
+DEFAULT_HOLD_MS = 200
+
+
+def invoke_warm_up(function_name, qualifier=None, hold_ms=DEFAULT_HOLD_MS):
+    params = {
+        'FunctionName': function_name,
+        'InvocationType': 'RequestResponse',
+        'Payload': json.dumps({'warm_up': True,
+                               'warm_up_hold_ms': hold_ms}).encode()
+    }
+    if qualifier:
+        params['Qualifier'] = qualifier
+    response = aws.get_client('lambda').invoke(**params)
+    return json.loads(response['Payload'].read() or 'null')
+
+
+def warm(function_name, concurrency, qualifier=None, hold_ms=DEFAULT_HOLD_MS):
+    """
+    Keeps `concurrency` warm-up invocations in flight at once, so each of
+    them lands in its own container
+    :return: dict with the number of invocations, distinct containers and
+        the slowest prewarm
+    """
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(invoke_warm_up, function_name, qualifier,
+                                   hold_ms)
+                   for _ in range(concurrency)]
+    results, failures = [], 0
+    for future in futures:
+        try:
+            results.append(future.result() or {})
+        except Exception as e:
+            failures += 1
+            _LOG.warning('Warm-up invocation failed: %s', e)
+    summary = {
+        'function': function_name,
+        'invocations': concurrency,
+        'failures': failures,
+        'containers': len({result.get('container_id') for result in results
+                           if result.get('container_id')}),
+        'prewarmed': sum(1 for result in results if result.get('prewarmed')),
+        'max_prewarm_ms': max((result.get('prewarm_ms', 0)
+                               for result in results), default=0)
+    }
+    _LOG.info('Warm-up summary: %s', summary)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('function_name')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--qualifier')
+    parser.add_argument('--hold-ms', type=int, default=DEFAULT_HOLD_MS)
+    args = parser.parse_args()
+    print(json.dumps(warm(args.function_name, args.concurrency,
+                          args.qualifier, args.hold_ms)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Adds tableNumberDate and the slot minutes to the reservations written
+before they were stored, so listings of a table's day, served by
+SLOT_INDEX, include them:
+
+    reservation_tables=Reservations python -m lambdas.api_handler.backfill
+
+Overlap checks read TABLE_DATE_INDEX and do not depend on it having run.
+"""
+import argparse
+import json
+
+from commons.catalog import scan_all
+from commons.log_helper import get_logger
+from lambdas.api_handler.handler import CONFIG, SLOT_KEY, \
+    reservation_minutes, slot_key
+
+_LOG = get_logger('backfill')
+
+
+def backfill(table):
+    """
+    :param table: boto3 Table of the reservations
+    :return: number of reservations updated
+    """
+    from boto3.dynamodb.conditions import Attr
+    updated = 0
+    for reservation in scan_all(table,
+                                FilterExpression=Attr(SLOT_KEY).not_exists()):
+        start, end = reservation_minutes(reservation)
+        reservation.update({
+            SLOT_KEY: slot_key(reservation['tableNumber'],
+                               reservation['date']),
+            'slotStartMinute': start, 'slotEndMinute': end})
+        table.put_item(Item=reservation,
+                       ConditionExpression=Attr(SLOT_KEY).not_exists())
+        updated += 1
+    _LOG.info('Added %s to %d reservations', SLOT_KEY, updated)
+    return updated
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__).parse_args()
+    print(json.dumps({'updated': backfill(CONFIG.reservations.table)}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+import importlib
+import json
+from unittest.mock import patch
+
+from tests import ImportFromSourceContext
+from tests.local_aws import LocalAws
+from tests.test_api_handler import ApiHandlerLambdaTestCase
+
+with ImportFromSourceContext():
+    memory = importlib.import_module('commons.memory')
+
+
+class TestMemoryCeilings(ApiHandlerLambdaTestCase):
+    """The function runs with 128 MB; these keep the copies a request makes
+    of its data in check"""
+
+    def test_large_scan(self):
+        event = {'resource': '/reservations', 'path': '/reservations',
+                 'httpMethod': 'GET', 'headers': {},
+                 'queryStringParameters': {'limit': '100'},
+                 'pathParameters': None, 'requestContext': {}, 'body': None}
+        with LocalAws() as local_aws:
+            table = local_aws.dynamodb.create_table('Reservations')
+            for number in range(5000):
+                table.put_item(Item={
+                    'id': f'{number:036d}', 'tableNumber': number % 20,
+                    'clientName': f'Client {number}',
+                    'phoneNumber': '0000000', 'date': '2024-01-01',
+                    'slotTimeStart': '10:00', 'slotTimeEnd': '11:00'})
+            # a page is small enough for the container's own first-use
+            # allocations to show, measure a warm one
+            self.HANDLER.lambda_handler(event, {})
+            with patch.object(memory.profiler, 'rate', 1):
+                response = self.HANDLER.lambda_handler(event, {})
+        self.assertEqual(response['statusCode'], 200)
+        body = json.loads(response['body'])
+        self.assertEqual(len(body['reservations']), 100)
+        self.assertIsNotNone(body['nextCursor'])
+        body_kib = len(response['body']) / 1024
+        report = self.HANDLER.memory_report
+        # the page read, its encoding and the body, whatever the table
+        # size; the stand-in's Scan also lists the 5000 items it pages
+        self.assertLess(report['peak_kib'], 10 * body_kib)
+        self.assertLess(report['allocated_kib'], 1.5 * body_kib)
@@ -0,0 +1,258 @@
+import asyncio
+import importlib
+import json
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+from tests import ImportFromSourceContext, local_aws
+from tests.local_aws import LocalAws
+from tests.test_api_handler import LAMBDA_HANDLER, ApiHandlerLambdaTestCase
+
+DATE = '2024-05-01'
+
+
+class TestReservations(ApiHandlerLambdaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.local_aws = LocalAws()
+        self.local_aws.__enter__()
+        self.addCleanup(self.local_aws.__exit__, None, None, None)
+        self.local_aws.dynamodb.create_tables_from(
+            Path(ImportFromSourceContext().project_path,
+                 'deployment_resources.json'),
+            aliases={'tables_table': 'Tables',
+                     'reservations_table': 'Reservations',
+                     'reservation_slots_table': 'ReservationSlots'},
+            provisioned=False)
+        self.local_aws.dynamodb.Table('Tables').put_item(Item={
+            'id': 1, 'number': 1, 'places': 4, 'isVip': False})
+        self.reservations = self.local_aws.dynamodb.Table('Reservations')
+        LAMBDA_HANDLER.DAY_INDEX.clear()
+        LAMBDA_HANDLER.TABLES.invalidate()
+
+    def event(self, start, end, date=DATE, client_name=None,
+              table_number=1):
+        # the client name keeps the bodies of different tests apart, they
+        # would be answered from the idempotency store otherwise
+        body = {'tableNumber': table_number,
+                'clientName': client_name or self.id(),
+                'phoneNumber': '0000000', 'date': date,
+                'slotTimeStart': start, 'slotTimeEnd': end}
+        return {'resource': '/reservations', 'path': '/reservations',
+                'httpMethod': 'POST',
+                'headers': {'Content-Type': 'application/json'},
+                'queryStringParameters': None, 'pathParameters': None,
+                'requestContext': {}, 'body': json.dumps(body)}
+
+    def reserve(self, start, end, date=DATE, table_number=1):
+        return self.HANDLER.lambda_handler(
+            self.event(start, end, date, table_number=table_number),
+            {})['statusCode']
+
+    def test_overlapping_slots_are_rejected(self):
+        self.assertEqual(self.reserve('10:00', '11:00'), 200)
+        self.assertEqual(self.reserve('10:30', '11:30'), 400)
+        self.assertEqual(self.reserve('09:30', '10:30'), 400)
+        self.assertEqual(self.reserve('09:00', '10:00'), 200)
+        self.assertEqual(self.reserve('11:00', '12:00'), 200)
+        self.assertEqual(self.reserve('10:00', '11:00', '2024-05-02'), 200)
+        self.assertEqual(
+            {item['tableNumberDate'] for item in
+             self.reservations.items.values()},
+            {f'1#{DATE}', '1#2024-05-02'})
+
+    def seed(self, id, start, end, legacy=False):
+        item = {'id': id, 'tableNumber': 1, 'date': DATE,
+                'slotTimeStart': start, 'slotTimeEnd': end}
+        if not legacy:
+            item[LAMBDA_HANDLER.SLOT_KEY] = LAMBDA_HANDLER.slot_key(1, DATE)
+        self.reservations.put_item(Item=item)
+
+    def test_day_is_read_once(self):
+        for minute in range(0, 600, 5):
+            self.seed(str(minute), f'{minute // 60:02d}:{minute % 60:02d}',
+                      f'{(minute + 5) // 60:02d}:{(minute + 5) % 60:02d}')
+        # written before the check was in place, it overlaps the others
+        # and has no tableNumberDate
+        self.seed('legacy', '00:01', '11:00', legacy=True)
+        calls = self.local_aws.faults.calls
+        # one reservation per page
+        with patch.object(local_aws, 'MAX_PAGE_BYTES', 1):
+            self.assertEqual(self.reserve('11:00', '11:30'), 200)
+            self.assertEqual(calls[('dynamodb', 'Query')], 121)
+            # only the legacy reservation overlaps
+            self.assertEqual(self.reserve('10:30', '10:45'), 400)
+            # the booking made before is known without reading again
+            self.assertEqual(self.reserve('11:15', '11:45'), 400)
+            self.assertEqual(self.reserve('11:30', '11:45'), 200)
+        self.assertEqual(calls[('dynamodb', 'Query')], 121)
+        stored, = [item for item in self.reservations.items.values()
+                   if item['slotTimeStart'] == '11:30']
+        self.assertEqual((stored['slotStartMinute'],
+                          stored['slotEndMinute']), (690, 705))
+
+    def test_reservations_without_slot_key_are_checked(self):
+        self.seed('legacy', '12:00', '13:00', legacy=True)
+        self.assertEqual(self.reserve('12:15', '12:45'), 400)
+        self.assertEqual(self.reserve('13:00', '13:30'), 200)
+
+    def test_backfill_adds_slot_key(self):
+        with ImportFromSourceContext():
+            backfill = importlib.import_module(
+                'lambdas.api_handler.backfill')
+        self.seed('legacy', '12:00', '13:00', legacy=True)
+        self.seed('current', '13:00', '14:00')
+        self.assertEqual(backfill.backfill(self.reservations), 1)
+        self.assertEqual(backfill.backfill(self.reservations), 0)
+        status, body = self.list(tableNumber='1', date=DATE)
+        self.assertEqual([reservation['id'] for reservation
+                          in body['reservations']], ['legacy', 'current'])
+
+    def test_day_is_read_again_once_expired(self):
+        self.assertEqual(self.reserve('10:00', '11:00'), 200)
+        with patch.object(LAMBDA_HANDLER.DAY_INDEX, 'ttl', 0):
+            self.assertEqual(self.reserve('11:00', '12:00'), 200)
+        self.assertEqual(
+            self.local_aws.faults.calls[('dynamodb', 'Query')], 2)
+
+    def test_retry_of_a_running_request_is_told_to_wait(self):
+        with patch('commons.idempotency.Idempotency._begin',
+                   side_effect=LAMBDA_HANDLER.IdempotencyInProgressError):
+            response = self.HANDLER.lambda_handler(
+                self.event('10:00', '11:00'), {})
+        self.assertEqual(response['statusCode'], 409)
+        self.assertEqual(response['headers']['Retry-After'], '1')
+        self.assertEqual(response['headers']['Access-Control-Allow-Origin'],
+                         '*')
+
+    def list(self, **query):
+        event = {'resource': '/reservations', 'path': '/reservations',
+                 'httpMethod': 'GET', 'headers': {},
+                 'queryStringParameters': query or None,
+                 'pathParameters': None, 'requestContext': {}, 'body': None}
+        response = self.HANDLER.lambda_handler(event, {})
+        if response['statusCode'] != 200:
+            return response['statusCode'], response['body']
+        return response['statusCode'], json.loads(response['body'])
+
+    def list_all(self, **query):
+        seen, pages = [], 0
+        while True:
+            status, body = self.list(**query)
+            self.assertEqual(status, 200)
+            seen.extend((reservation['date'], reservation['slotTimeStart'])
+                        for reservation in body['reservations'])
+            pages += 1
+            if body['nextCursor'] is None:
+                return seen, pages
+            query['cursor'] = body['nextCursor']
+
+    def test_listing_pages_through_the_indexes(self):
+        self.local_aws.dynamodb.Table('Tables').put_item(Item={
+            'id': 2, 'number': 2, 'places': 2, 'isVip': False})
+        for day in ('2024-05-01', '2024-05-02', '2024-05-04'):
+            for start in ('10:00', '12:00'):
+                for number in (1, 2):
+                    self.assertEqual(self.reserve(start, start[:3] + '30',
+                                                  day, number), 200)
+        calls = self.local_aws.faults.calls
+
+        seen, pages = self.list_all(limit='5')
+        self.assertEqual((len(seen), pages), (12, 3))
+        reservation = self.list()[1]['reservations'][0]
+        for field in LAMBDA_HANDLER.INTERNAL_FIELDS:
+            self.assertNotIn(field, reservation)
+
+        scans = calls[('dynamodb', 'Scan')]
+        self.assertEqual(self.list_all(tableNumber='2', date=DATE)[0],
+                         [(DATE, '10:00'), (DATE, '12:00')])
+        self.assertEqual(self.list_all(tableNumber='1',
+                                       dateFrom='2024-05-02')[0],
+                         [('2024-05-02', '10:00'), ('2024-05-02', '12:00'),
+                          ('2024-05-04', '10:00'), ('2024-05-04', '12:00')])
+        seen, pages = self.list_all(dateFrom=DATE, dateTo='2024-05-03',
+                                    limit='3')
+        self.assertEqual(sorted(seen), [(DATE, '10:00')] * 2 +
+                         [(DATE, '12:00')] * 2 +
+                         [('2024-05-02', '10:00')] * 2 +
+                         [('2024-05-02', '12:00')] * 2)
+        self.assertEqual(pages, 3)
+        # filters are served from the indexes only
+        self.assertEqual(calls[('dynamodb', 'Scan')], scans)
+
+    def test_listing_rejects_what_no_index_serves(self):
+        for query in ({'date': DATE, 'dateTo': DATE},
+                      {'dateFrom': DATE},
+                      {'dateFrom': '2024-05-01', 'dateTo': '2024-07-01'},
+                      {'dateFrom': '2024-05-02', 'dateTo': '2024-05-01'},
+                      {'limit': '1000'},
+                      {'date': 'May 1st'},
+                      {'cursor': 'nonsense'}):
+            self.assertEqual(self.list(**query)[0], 400, query)
+        self.reserve('10:00', '11:00')
+        self.reserve('11:00', '12:00')
+        status, body = self.list(tableNumber='1', limit='1')
+        self.assertIsNotNone(body['nextCursor'])
+        # a cursor only continues the listing it was issued for
+        self.assertEqual(self.list(tableNumber='1', date=DATE,
+                                   cursor=body['nextCursor'])[0], 400)
+
+    def test_slot_cells(self):
+        self.assertEqual(LAMBDA_HANDLER.slot_cells(1, DATE, '10:00', '10:30'),
+                         [f'1#{DATE}#10:00', f'1#{DATE}#10:15'])
+        self.assertEqual(self.reserve('10:00', '10:45'), 200)
+        self.assertEqual(len(self.local_aws.dynamodb.Table(
+            'ReservationSlots').items), 3)
+        self.assertEqual(self.reserve('11:00', '10:00'), 400)
+
+    def test_adjacent_slots_share_no_cell(self):
+        self.assertEqual(self.reserve('10:00', '10:15'), 200)
+        self.assertEqual(self.reserve('10:15', '10:30'), 200)
+        # a cell covers a quarter hour, other times would share one
+        self.assertEqual(self.reserve('10:30', '10:40'), 400)
+        self.assertEqual(self.reserve('10:35', '10:45'), 400)
+
+    def test_taken_cell_rejects_without_a_prior_read(self):
+        # e.g. claimed by a booking the index does not show yet
+        self.local_aws.dynamodb.Table('ReservationSlots').put_item(
+            Item={'id': f'1#{DATE}#12:15', 'reservationId': 'other'})
+        self.assertEqual(self.reserve('12:00', '13:00'), 400)
+        self.assertEqual(self.reservations.items, {})
+        self.assertEqual(len(self.local_aws.dynamodb.Table(
+            'ReservationSlots').items), 1)
+
+    def test_one_winner_under_concurrent_bookings(self):
+        threads_count = 24
+        barrier = threading.Barrier(threads_count)
+        statuses = []
+        # every booking passes the overlap check before any is written
+        self.local_aws.faults.add('dynamodb', latency=0.01)
+
+        def book(number):
+            # concurrent invocations run in containers of their own, each
+            # with its own event loop
+            event = self.event('18:00', '19:30' if number % 2 else '18:45',
+                               client_name=f'{self.id()} {number}')
+            barrier.wait()
+            response = asyncio.run(self.HANDLER.handle_request(event, {}))
+            statuses.append(response['statusCode'])
+
+        threads = [threading.Thread(target=book, args=(number,))
+                   for number in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(statuses),
+                         [200] + [400] * (threads_count - 1))
+        # the losers were turned away by the transaction, not the check
+        self.assertGreater(
+            self.local_aws.faults.calls[('dynamodb', 'TransactWriteItems')],
+            threads_count // 2)
+        self.assertEqual(len(self.reservations.items), 1)
+        winner, = self.reservations.items.values()
+        cells = self.local_aws.dynamodb.Table('ReservationSlots').items
+        self.assertEqual({cell['reservationId'] for cell in cells.values()},
+                         {winner['id']})
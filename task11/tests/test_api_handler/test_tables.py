@@ -0,0 +1,123 @@
+import json
+from pathlib import Path
+
+from tests import ImportFromSourceContext
+from tests.local_aws import LocalAws
+from tests.test_api_handler import LAMBDA_HANDLER, ApiHandlerLambdaTestCase
+
+TABLES_ARN = 'arn:aws:dynamodb:eu-central-1:123456789012:table/Tables/' \
+             'stream/2024-05-01T00:00:00.000'
+
+
+class TestTables(ApiHandlerLambdaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.local_aws = LocalAws()
+        self.local_aws.__enter__()
+        self.addCleanup(self.local_aws.__exit__, None, None, None)
+        self.local_aws.dynamodb.create_tables_from(
+            Path(ImportFromSourceContext().project_path,
+                 'deployment_resources.json'),
+            aliases={'tables_table': 'Tables',
+                     'reservations_table': 'Reservations',
+                     'reservation_slots_table': 'ReservationSlots'},
+            provisioned=False)
+        self.local_aws.dynamodb.Table('Tables').put_item(Item={
+            'id': 1, 'number': 1, 'places': 4, 'isVip': False})
+        LAMBDA_HANDLER.DAY_INDEX.clear()
+        LAMBDA_HANDLER.TABLES.invalidate()
+        self.calls = self.local_aws.faults.calls
+
+    def request(self, method, path, body=None, resource=None,
+                path_params=None):
+        event = {'resource': resource or path, 'path': path,
+                 'httpMethod': method,
+                 'headers': {'Content-Type': 'application/json'},
+                 'queryStringParameters': None,
+                 'pathParameters': path_params, 'requestContext': {},
+                 'body': json.dumps(body) if body is not None else None}
+        response = self.HANDLER.lambda_handler(event, {})
+        if response['statusCode'] != 200:
+            return response['statusCode'], response['body']
+        return response['statusCode'], json.loads(response['body'])
+
+    def reserve(self, table_number, start):
+        return self.request('POST', '/reservations', {
+            'tableNumber': table_number, 'clientName': self.id(),
+            'phoneNumber': '0000000', 'date': '2024-05-01',
+            'slotTimeStart': start, 'slotTimeEnd': start[:3] + '30'})[0]
+
+    def get_table(self, table_id):
+        return self.request('GET', f'/tables/{table_id}',
+                            resource='/tables/{tableId}',
+                            path_params={'tableId': str(table_id)})
+
+    def test_lookups_are_served_from_memory(self):
+        self.assertEqual(self.reserve(1, '10:00'), 200)
+        self.assertEqual(self.reserve(1, '11:00'), 200)
+        self.assertEqual(self.get_table(1)[1]['places'], 4)
+        self.assertEqual(self.request('GET', '/tables')[1]['tables'][0]['id'],
+                         1)
+        self.assertEqual(self.calls[('dynamodb', 'Scan')], 1)
+        self.assertNotIn(('dynamodb', 'GetItem'), self.calls)
+
+    def test_created_table_is_bookable_right_away(self):
+        self.assertEqual(self.reserve(1, '10:00'), 200)
+        self.assertEqual(self.request('POST', '/tables', {
+            'id': 2, 'number': 7, 'places': 2, 'isVip': True})[0], 200)
+        self.assertEqual(self.reserve(7, '10:00'), 200)
+        self.assertEqual(self.get_table(2)[1]['number'], 7)
+        self.assertEqual(self.calls[('dynamodb', 'Scan')], 1)
+
+    def test_unknown_table(self):
+        self.assertEqual(self.reserve(9, '10:00'), 400)
+        self.assertEqual(self.get_table(9)[0], 404)
+
+    def test_stream_records_update_the_catalog(self):
+        self.assertEqual(self.get_table(1)[0], 200)
+        event = {'Records': [
+            {'eventSource': 'aws:dynamodb', 'eventSourceARN': TABLES_ARN,
+             'eventName': 'INSERT', 'dynamodb': {
+                 'Keys': {'id': {'N': '3'}},
+                 'NewImage': {'id': {'N': '3'}, 'number': {'N': '5'},
+                              'places': {'N': '6'}, 'isVip': {'BOOL': False}}}},
+            {'eventSource': 'aws:dynamodb', 'eventSourceARN': TABLES_ARN,
+             'eventName': 'REMOVE', 'dynamodb': {
+                 'Keys': {'id': {'N': '1'}}}}]}
+        self.assertEqual(self.HANDLER.lambda_handler(event, {}),
+                         {'batchItemFailures': []})
+        self.assertEqual(self.get_table(3)[1]['places'], 6)
+        self.assertEqual(self.reserve(1, '10:00'), 400)
+        self.assertEqual(self.calls[('dynamodb', 'Scan')], 1)
+
+    def test_pages_ordered_by_id(self):
+        for table_id in (5, 3, 4, 2):
+            self.local_aws.dynamodb.Table('Tables').put_item(Item={
+                'id': table_id, 'number': table_id * 10, 'places': 2,
+                'isVip': False})
+        seen, cursor = [], None
+        while True:
+            query = {'limit': '2'}
+            if cursor:
+                query['cursor'] = cursor
+            status, body = self.list_tables(query)
+            self.assertEqual(status, 200)
+            seen.extend(table['id'] for table in body['tables'])
+            cursor = body['nextCursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, [1, 2, 3, 4, 5])
+        self.assertEqual(self.calls[('dynamodb', 'Scan')], 1)
+        self.assertEqual(self.list_tables({'cursor': 'nonsense'})[0], 400)
+        self.assertEqual(self.list_tables({'limit': '0'})[0], 400)
+
+    def list_tables(self, query):
+        event = {'resource': '/tables', 'path': '/tables',
+                 'httpMethod': 'GET', 'headers': {},
+                 'queryStringParameters': query, 'pathParameters': None,
+                 'requestContext': {}, 'body': None}
+        response = self.HANDLER.lambda_handler(event, {})
+        if response['statusCode'] != 200:
+            return response['statusCode'], response['body']
+        return response['statusCode'], json.loads(response['body'])
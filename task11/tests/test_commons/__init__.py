@@ -0,0 +1,16 @@
+import importlib
+import unittest
+
+from tests import ImportFromSourceContext
+
+with ImportFromSourceContext():
+    COMMONS = importlib.import_module('commons')
+
+
+class CommonsTestCase(unittest.TestCase):
+    """Common setups for the shared commons package"""
+
+    @staticmethod
+    def import_commons(name):
+        with ImportFromSourceContext():
+            return importlib.import_module(f'commons.{name}')
@@ -0,0 +1,34 @@
+from tests.test_commons import CommonsTestCase
+
+
+class TestWarmUp(CommonsTestCase):
+
+    def setUp(self) -> None:
+        abstract_lambda = self.import_commons('abstract_lambda')
+        self.container_id = abstract_lambda.CONTAINER_ID
+
+        class Handler(abstract_lambda.AbstractLambda):
+            prewarm_calls = 0
+
+            def validate_request(self, event) -> dict:
+                pass
+
+            def prewarm(self):
+                self.prewarm_calls += 1
+
+            def handle_request(self, event, context):
+                return 200
+
+        self.HANDLER = Handler()
+
+    def test_prewarm_runs_once_per_container(self):
+        first = self.HANDLER.lambda_handler({'warm_up': True}, {})
+        second = self.HANDLER.lambda_handler({'warm_up': True}, {})
+        self.assertEqual(self.HANDLER.prewarm_calls, 1)
+        self.assertTrue(first['prewarmed'])
+        self.assertFalse(second['prewarmed'])
+        self.assertEqual(first['container_id'], self.container_id)
+        self.assertGreaterEqual(first['prewarm_ms'], 0)
+
+    def test_real_request_is_not_affected(self):
+        self.assertEqual(self.HANDLER.lambda_handler({}, {}), 200)
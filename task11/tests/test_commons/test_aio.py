@@ -0,0 +1,79 @@
+import asyncio
+import time
+from unittest.mock import Mock, patch
+
+from tests.test_commons import CommonsTestCase
+
+
+class SlowTable:
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.table_name = 'Slow'
+
+    def get_item(self, Key):
+        time.sleep(self.delay)
+        return {'Item': Key}
+
+
+class TestAio(CommonsTestCase):
+
+    def setUp(self) -> None:
+        self.aio = self.import_commons('aio')
+        self.aws = self.import_commons('aws')
+        self.table = SlowTable(0.1)
+        self.client = Mock(exceptions='exceptions')
+        self.aws.set_factory(lambda kind, name: self.client if
+                             kind == 'client' else Mock(Table=self.tables))
+
+    def tearDown(self) -> None:
+        self.aws.set_factory(None)
+
+    def tables(self, name):
+        return self.table
+
+    def test_independent_calls_overlap(self):
+        async def fan_out():
+            return await asyncio.gather(
+                *(self.aio.table('Slow').get_item(Key={'id': i})
+                  for i in range(4)))
+        start = time.perf_counter()
+        results = self.aio.run(fan_out())
+        elapsed = time.perf_counter() - start
+        self.assertEqual([result['Item']['id'] for result in results],
+                         [0, 1, 2, 3])
+        self.assertLess(elapsed, 0.3)
+
+    def test_attributes_pass_through(self):
+        cognito = self.aio.client('cognito-idp')
+        self.assertEqual(cognito.exceptions, 'exceptions')
+        self.assertEqual(self.aio.table('Slow').table_name, 'Slow')
+        self.client.initiate_auth.return_value = {'ok': True}
+        self.assertEqual(self.aio.run(cognito.initiate_auth(ClientId='c')),
+                         {'ok': True})
+        self.client.initiate_auth.assert_called_once_with(ClientId='c')
+
+    def test_the_loop_is_reused(self):
+        loop = self.aio.get_loop()
+        self.aio.run(asyncio.sleep(0))
+        self.assertIs(self.aio.get_loop(), loop)
+
+    def test_http(self):
+        session = Mock()
+        with patch.object(self.aio, '_get_session', return_value=session):
+            self.aio.run(self.aio.http('GET', 'http://localhost/',
+                                       timeout=1))
+        session.request.assert_called_once_with('GET', 'http://localhost/',
+                                                timeout=1)
+
+    def test_async_lambda(self):
+        class Handler(self.aio.AsyncAbstractLambda):
+            def validate_request(self, event):
+                pass
+
+            async def handle_request(self, event, context):
+                await asyncio.sleep(0)
+                return {'statusCode': 200, 'body': event['value']}
+
+        response = Handler().lambda_handler({'value': 'x'}, None)
+        self.assertEqual(response, {'statusCode': 200, 'body': 'x'})
@@ -0,0 +1,57 @@
+from unittest.mock import Mock, patch
+
+from tests.test_commons import CommonsTestCase
+
+
+class TestAwsRegistry(CommonsTestCase):
+
+    def setUp(self) -> None:
+        self.aws = self.import_commons('aws')
+        self.aws.reset()
+
+    def tearDown(self) -> None:
+        self.aws.reset()
+
+    def test_clients_are_created_once_with_shared_config(self):
+        with patch('boto3.client') as client:
+            first = self.aws.get_client('s3')
+            second = self.aws.get_client('s3')
+        self.assertIs(first, second)
+        client.assert_called_once()
+        config = client.call_args.kwargs['config']
+        self.assertEqual(config.retries['mode'], 'adaptive')
+        self.assertEqual(config.max_pool_connections,
+                         self.aws.DEFAULT_MAX_POOL_CONNECTIONS)
+
+    def test_table_handles_are_cached(self):
+        with patch('boto3.resource') as resource:
+            self.aws.get_table('Tables')
+            self.aws.get_table('Tables')
+            self.aws.get_table('Reservations')
+        resource.assert_called_once()
+        self.assertEqual(resource.return_value.Table.call_count, 2)
+
+    def test_config_from_env(self):
+        with patch.dict('os.environ', {'aws_read_timeout': '3',
+                                       'aws_retry_mode': 'standard'}):
+            config = self.aws.config_from_env()
+        self.assertEqual(config['read_timeout'], 3)
+        self.assertEqual(config['retries']['mode'], 'standard')
+
+    def test_set_factory_replaces_boto3(self):
+        created = []
+
+        def factory(kind, service_name):
+            created.append((kind, service_name))
+            return Mock()
+
+        self.aws.set_factory(factory)
+        try:
+            with patch('boto3.client') as client:
+                self.aws.get_client('s3')
+                self.aws.get_table('Tables')
+            client.assert_not_called()
+        finally:
+            self.aws.set_factory(None)
+        self.assertEqual(created, [('client', 's3'),
+                                   ('resource', 'dynamodb')])
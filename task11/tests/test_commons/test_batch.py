@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+
+from tests.test_commons import CommonsTestCase
+
+batch = CommonsTestCase.import_commons('batch')
+
+
+def sqs(message_id, group=None, body='ok'):
+    record = {'messageId': message_id, 'eventSource': 'aws:sqs',
+              'body': body, 'attributes': {}}
+    if group:
+        record['attributes']['MessageGroupId'] = group
+    return record
+
+
+def kinesis(sequence, partition, body='ok'):
+    return {'eventSource': 'aws:kinesis', 'body': body,
+            'kinesis': {'sequenceNumber': sequence,
+                        'partitionKey': partition}}
+
+
+def dynamodb(sequence, key, body='ok'):
+    return {'eventSource': 'aws:dynamodb', 'body': body,
+            'dynamodb': {'SequenceNumber': sequence,
+                         'Keys': {'key': {'S': key}}}}
+
+
+def failures(response):
+    return [item['itemIdentifier'] for item in response['batchItemFailures']]
+
+
+class TestBatchProcessor(CommonsTestCase):
+
+    def setUp(self):
+        self.seen = []
+
+    def handler(self, record):
+        if record['body'] == 'bad':
+            raise ValueError('bad record')
+        self.seen.append(record.get('messageId') or record['body'])
+
+    def test_only_failed_records_are_reported(self):
+        processor = batch.BatchProcessor(self.handler)
+        response = processor.process({'Records': [
+            sqs('1'), sqs('2', body='bad'), sqs('3')]})
+        self.assertEqual(failures(response), ['2'])
+        self.assertEqual(self.seen, ['1', '3'])
+        self.assertEqual(processor.process({}), {'batchItemFailures': []})
+
+    def test_a_failure_holds_back_the_rest_of_its_group(self):
+        processor = batch.BatchProcessor(self.handler, max_workers=4)
+        response = processor.process({'Records': [
+            sqs('1', 'a'), sqs('2', 'a', 'bad'), sqs('3', 'b'),
+            sqs('4', 'a'), sqs('5', 'b')]})
+        self.assertEqual(failures(response), ['2', '4'])
+        self.assertEqual(sorted(self.seen), ['1', '3', '5'])
+
+    def test_stream_identifiers_and_keys(self):
+        processor = batch.BatchProcessor(self.handler)
+        response = processor.process({'Records': [
+            kinesis('10', 'p1'), kinesis('11', 'p1', 'bad'),
+            kinesis('12', 'p2')]})
+        self.assertEqual(failures(response), ['11'])
+        response = processor.process({'Records': [
+            dynamodb('20', 'k', 'bad'), dynamodb('21', 'k'),
+            dynamodb('22', 'other')]})
+        self.assertEqual(failures(response), ['20', '21'])
+
+    def test_groups_run_in_parallel_and_in_order(self):
+        order, lock = [], threading.Lock()
+
+        def slow(record):
+            time.sleep(0.05)
+            with lock:
+                order.append(record['messageId'])
+        processor = batch.BatchProcessor(slow, max_workers=4)
+        records = [sqs(f'{group}{i}', group) for i in range(2)
+                   for group in 'abcd']
+        start = time.perf_counter()
+        processor.process({'Records': records})
+        self.assertLess(time.perf_counter() - start, 0.3)
+        for group in 'abcd':
+            self.assertLess(order.index(f'{group}0'), order.index(f'{group}1'))
+
+    def test_coroutine_handler(self):
+        async def handler(record):
+            await asyncio.sleep(0)
+            self.handler(record)
+        processor = batch.BatchProcessor(handler, max_workers=2)
+        response = asyncio.run(processor.process_async({'Records': [
+            sqs('1', 'a', 'bad'), sqs('2', 'a'), sqs('3')]}))
+        self.assertEqual(failures(response), ['1', '2'])
+        self.assertEqual(self.seen, ['3'])
+
+    def test_records_left_when_the_deadline_nears_are_failed(self):
+        deadline = self.import_commons('deadline')
+
+        def slow(record):
+            time.sleep(0.1)
+            self.handler(record)
+        processor = batch.BatchProcessor(slow, min_remaining_ms=100)
+        deadline._current = deadline.Deadline(250, safety_ms=0)
+        try:
+            response = processor.process({'Records': [
+                sqs('1'), sqs('2'), sqs('3'), sqs('4')]})
+        finally:
+            deadline.clear()
+        self.assertEqual(failures(response), ['3', '4'])
+        self.assertEqual(self.seen, ['1', '2'])
@@ -0,0 +1,117 @@
+import threading
+
+from tests.test_commons import CommonsTestCase
+
+catalog = CommonsTestCase.import_commons('catalog')
+
+
+class Table:
+    """Scan pages of one item each, counting the scans"""
+
+    def __init__(self, items):
+        self.items = list(items)
+        self.scans = 0
+        self.started = threading.Event()
+        self.release = None
+
+    def scan(self, ExclusiveStartKey=None):
+        self.scans += 1
+        self.started.set()
+        if self.release is not None:
+            self.release.wait(5)
+        start = 0 if ExclusiveStartKey is None else \
+            ExclusiveStartKey['index'] + 1
+        page = {'Items': self.items[start:start + 1]}
+        if start + 1 < len(self.items):
+            page['LastEvaluatedKey'] = {'index': start}
+        return page
+
+
+class TestCatalog(CommonsTestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.table = Table([{'id': 1, 'number': 10},
+                            {'id': 2, 'number': 20}])
+
+    def catalog(self, **kwargs):
+        return catalog.Catalog(lambda: catalog.scan_all(self.table),
+                               keys=('id', 'number'), ttl=60, stale_ttl=60,
+                               clock=lambda: self.now, **kwargs)
+
+    def test_lookups_by_each_key(self):
+        tables = self.catalog()
+        self.assertEqual(tables.get('number', 20), {'id': 2, 'number': 20})
+        self.assertEqual(tables.get('id', 1)['number'], 10)
+        self.assertEqual(len(tables.items()), 2)
+        # every page, once
+        self.assertEqual(self.table.scans, 2)
+
+    def test_stale_items_are_used_while_read_again(self):
+        tables = self.catalog()
+        tables.get('id', 1)
+        self.table.items.append({'id': 3, 'number': 30})
+        self.table.release = threading.Event()
+        self.table.started.clear()
+        self.now = 90
+        self.assertEqual(len(tables.items()), 2)
+        self.assertTrue(self.table.started.wait(5))
+        # a single read in the background
+        self.assertEqual(len(tables.items()), 2)
+        self.table.release.set()
+        while tables.refreshes < 2:
+            self.table.started.wait(0.01)
+        self.assertEqual(len(tables.items()), 3)
+
+    def test_too_old_items_are_read_first(self):
+        tables = self.catalog()
+        tables.get('id', 1)
+        self.table.items.append({'id': 3, 'number': 30})
+        self.now = 120
+        self.assertEqual(len(tables.items()), 3)
+
+    def test_misses_read_again_at_most_once_per_interval(self):
+        tables = self.catalog(miss_reload=1)
+        self.assertIsNone(tables.get('number', 30))
+        self.assertEqual(tables.refreshes, 1)
+        self.table.items.append({'id': 3, 'number': 30})
+        self.assertIsNone(tables.get('number', 30))
+        self.now = 1
+        self.assertEqual(tables.get('number', 30)['id'], 3)
+        self.assertEqual(tables.refreshes, 2)
+
+    def test_writes_during_a_read_are_kept(self):
+        tables = self.catalog()
+        tables.get('id', 1)
+        self.table.release = threading.Event()
+        reader = threading.Thread(target=tables.reload)
+        self.table.started.clear()
+        reader.start()
+        self.assertTrue(self.table.started.wait(5))
+        tables.put({'id': 3, 'number': 30})
+        tables.remove(1)
+        self.table.release.set()
+        reader.join()
+        self.assertEqual([item['id'] for item in tables.items()], [2, 3])
+
+    def test_stream_records(self):
+        tables = self.catalog()
+        tables.get('id', 1)
+        tables.apply_stream([
+            {'eventName': 'MODIFY', 'dynamodb': {
+                'Keys': {'id': {'N': '2'}},
+                'NewImage': {'id': {'N': '2'}, 'number': {'N': '21'}}}},
+            {'eventName': 'REMOVE', 'dynamodb': {
+                'Keys': {'id': {'N': '1'}}}}])
+        self.assertIsNone(tables.get('number', 20))
+        self.assertEqual(tables.get('number', 21)['id'], 2)
+        self.assertIsNone(tables.get('id', 1))
+        # answered without reading the table again in between
+        self.assertEqual(tables.refreshes, 1)
+
+    def test_zero_ttl_reads_every_time(self):
+        tables = self.catalog()
+        tables.ttl = 0
+        tables.get('id', 1)
+        tables.get('id', 2)
+        self.assertEqual(tables.refreshes, 2)
@@ -0,0 +1,28 @@
+import json
+from decimal import Decimal
+from unittest.mock import Mock
+
+from tests.test_commons import CommonsTestCase
+
+
+class TestCodec(CommonsTestCase):
+
+    def setUp(self) -> None:
+        self.codec = self.import_commons('codec')
+
+    def test_dynamodb_types(self):
+        binary = type('Binary', (), {})()
+        binary.value = b'\x00\x01'
+        item = {'id': Decimal(7), 'price': Decimal('9.5'),
+                'tags': {'b', 'a'}, 'raw': binary, 'big': Decimal(2 ** 70)}
+        self.assertEqual(json.loads(self.codec.dumps(item)),
+                         {'id': 7, 'price': 9.5, 'tags': ['a', 'b'],
+                          'raw': 'AAE=', 'big': float(2 ** 70)})
+
+    def test_dumpb_returns_utf8_bytes(self):
+        self.assertEqual(json.loads(self.codec.dumpb({'name': 'Київ'})),
+                         {'name': 'Київ'})
+
+    def test_unknown_types_are_rejected(self):
+        with self.assertRaises(TypeError):
+            self.codec.dumps({'mock': Mock()})
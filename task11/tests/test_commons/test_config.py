@@ -0,0 +1,73 @@
+from tests.local_aws import LocalAws
+from tests.test_commons import CommonsTestCase
+
+config = CommonsTestCase.import_commons('config')
+
+LAMBDA = {'AWS_LAMBDA_FUNCTION_NAME': 'api_handler'}
+
+
+class Settings(config.Config):
+    tables = config.TableSetting('tables_table', local_default='Tables')
+    bucket = config.BucketSetting('target_bucket', local_default='Files')
+    page_size = config.Setting('page_size', int, default=50, minimum=1,
+                               maximum=100)
+    strict = config.Setting('strict', bool, default=False)
+    mode = config.Setting('mode', default='fast', choices=('fast', 'safe'))
+
+
+class TestConfig(CommonsTestCase):
+
+    def test_values_are_parsed(self):
+        settings = Settings({'tables_table': 'prod-Tables', 'page_size': '20',
+                             'strict': 'yes', 'mode': 'safe'})
+        self.assertEqual(settings.tables.name, 'prod-Tables')
+        self.assertEqual(settings.page_size, 20)
+        self.assertIs(settings.strict, True)
+        self.assertEqual(settings.mode, 'safe')
+
+    def test_local_defaults_outside_lambda(self):
+        settings = Settings({})
+        self.assertEqual(settings.tables.name, 'Tables')
+        self.assertEqual(settings.bucket.name, 'Files')
+        self.assertEqual(settings.page_size, 50)
+
+    def test_every_problem_is_reported_at_once(self):
+        with self.assertRaises(config.ConfigError) as raised:
+            Settings(dict(LAMBDA, page_size='0', strict='maybe', mode='slow'))
+        self.assertEqual(set(raised.exception.errors), {
+            'tables_table', 'target_bucket', 'page_size', 'strict', 'mode'})
+        self.assertEqual(raised.exception.errors['tables_table'],
+                         'is not set')
+        self.assertIn('page_size: 0 is less than 1', str(raised.exception))
+
+    def test_invalid_number(self):
+        with self.assertRaises(config.ConfigError) as raised:
+            Settings({'page_size': 'many'})
+        self.assertEqual(raised.exception.errors,
+                         {'page_size': "'many' is not a valid int"})
+
+    def test_immutable(self):
+        settings = Settings({})
+        with self.assertRaises(AttributeError):
+            settings.page_size = 10
+        with self.assertRaises(AttributeError):
+            settings.tables.name = 'Other'
+
+    def test_subclass_inherits_settings(self):
+        class Extended(Settings):
+            retries = config.Setting('retries', int, default=3)
+
+        settings = Extended({'retries': '5'})
+        self.assertEqual(settings.retries, 5)
+        self.assertEqual(settings.tables.name, 'Tables')
+
+    def test_handles_come_from_the_aws_cache(self):
+        settings = Settings({})
+        with LocalAws() as local_aws:
+            self.assertIs(settings.tables.table, settings.tables.table)
+            settings.tables.table.put_item(Item={'id': 1})
+            settings.bucket.put_object(Key='a.json', Body=b'{}')
+            self.assertEqual(local_aws.dynamodb.Table('Tables').get_item(
+                Key={'id': 1})['Item'], {'id': 1})
+            self.assertEqual(local_aws.s3.get_object(
+                Bucket='Files', Key='a.json')['Body'].read(), b'{}')
@@ -0,0 +1,103 @@
+import json
+import time
+from unittest.mock import Mock
+
+from tests.test_commons import CommonsTestCase
+
+deadline = CommonsTestCase.import_commons('deadline')
+
+
+def context(remaining_ms):
+    return Mock(get_remaining_time_in_millis=lambda: remaining_ms)
+
+
+class TestDeadline(CommonsTestCase):
+
+    def test_budget_keeps_the_safety_margin(self):
+        current = deadline.Deadline.from_context(context(3000))
+        self.assertEqual(current.safety_ms, deadline.DEFAULT_SAFETY_MS)
+        self.assertAlmostEqual(current.remaining(), 2.5, delta=0.05)
+        self.assertEqual(current.timeout(1), 1)
+        self.assertAlmostEqual(current.timeout(10), 2.5, delta=0.05)
+        self.assertFalse(current.expired(2000))
+        self.assertTrue(current.expired(3000))
+
+    def test_no_context_is_unlimited(self):
+        current = deadline.Deadline.from_context({})
+        self.assertEqual(current.remaining(), float('inf'))
+        self.assertEqual(current.timeout(10), 10)
+        current.check()
+
+    def test_spent_budget_raises(self):
+        current = deadline.Deadline(100, safety_ms=100)
+        with self.assertRaises(deadline.DeadlineExceeded):
+            current.timeout(10)
+        with self.assertRaises(deadline.DeadlineExceeded):
+            current.check()
+
+    def test_start_and_clear(self):
+        started = deadline.start(context(1000))
+        self.assertIs(deadline.current(), started)
+        deadline.clear()
+        self.assertIs(deadline.current(), deadline.UNLIMITED)
+
+
+class TestLambdaDeadline(CommonsTestCase):
+
+    def setUp(self) -> None:
+        abstract_lambda = self.import_commons('abstract_lambda')
+        self.calls = []
+        calls = self.calls
+
+        class Handler(abstract_lambda.AbstractLambda):
+            def validate_request(self, event) -> dict:
+                pass
+
+            def handle_request(self, event, context):
+                calls.append(self.deadline.remaining_ms())
+                if event.get('call_aws'):
+                    self.deadline.timeout(10)
+                return {'statusCode': 200}
+
+        self.HANDLER = Handler()
+        self.api_event = {'httpMethod': 'GET', 'path': '/tables'}
+
+    def test_api_requests_without_time_are_answered_503(self):
+        response = self.HANDLER.lambda_handler(self.api_event, context(1200))
+        self.assertEqual(response['statusCode'], 503)
+        self.assertEqual(response['headers']['Retry-After'], '1')
+        self.assertEqual(json.loads(response['body'])['message'],
+                         'Service unavailable')
+        self.assertEqual(self.calls, [])
+
+    def test_handler_sees_the_deadline(self):
+        response = self.HANDLER.lambda_handler(self.api_event, context(5000))
+        self.assertEqual(response, {'statusCode': 200})
+        self.assertAlmostEqual(self.calls[0], 4500, delta=50)
+        self.assertIs(deadline.current(), deadline.UNLIMITED)
+
+    def test_deadline_exceeded_inside_the_handler(self):
+        self.HANDLER.api_min_remaining_ms = 0
+        response = self.HANDLER.lambda_handler(
+            dict(self.api_event, call_aws=True), context(520))
+        self.assertEqual(response['statusCode'], 503)
+        with self.assertRaises(deadline.DeadlineExceeded):
+            self.HANDLER.lambda_handler({'call_aws': True}, context(520))
+
+    def test_botocore_read_timeout_is_capped(self):
+        aws = self.import_commons('aws')
+        request = Mock(context={})
+        deadline._current = deadline.Deadline(2500, safety_ms=500)
+        try:
+            aws._cap_to_deadline(request)
+            self.assertAlmostEqual(request.context['read_timeout'], 2,
+                                   delta=0.05)
+            deadline._current = deadline.Deadline(10, safety_ms=0)
+            time.sleep(0.02)
+            with self.assertRaises(deadline.DeadlineExceeded):
+                aws._cap_to_deadline(Mock(context={}))
+        finally:
+            deadline.clear()
+        request = Mock(context={})
+        aws._cap_to_deadline(request)
+        self.assertNotIn('read_timeout', request.context)
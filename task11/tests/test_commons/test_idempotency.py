@@ -0,0 +1,117 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+from tests.local_aws import LocalAws
+from tests.test_commons import CommonsTestCase
+
+idempotency = CommonsTestCase.import_commons('idempotency')
+
+
+class TestIdempotency(CommonsTestCase):
+
+    def setUp(self):
+        self.store = idempotency.InMemoryStore()
+        self.calls = []
+
+    def decorate(self, **kwargs):
+        @idempotency.idempotent(self.store, **kwargs)
+        def handler(event):
+            self.calls.append(event)
+            if event.get('fail'):
+                raise ValueError('failed')
+            return {'statusCode': event.get('status', 200),
+                    'n': len(self.calls)}
+        return handler
+
+    def test_repeated_payload_replays_the_result(self):
+        handler = self.decorate()
+        first = handler({'id': 1})
+        self.assertEqual(handler({'id': 1}), first)
+        self.assertEqual(handler({'id': 2})['n'], 2)
+        # AbstractLambda passes the event as a keyword argument
+        self.assertEqual(handler(event={'id': 2})['n'], 2)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_the_store_answers_other_containers(self):
+        handler = self.decorate(cache_size=0)
+        handler({'id': 1})
+        other_container = self.decorate(cache_size=0)
+        self.assertEqual(other_container({'id': 1})['n'], 1)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_lru_skips_the_store(self):
+        handler = self.decorate()
+        handler({'id': 1})
+        with patch.object(self.store, 'put_in_progress') as put:
+            handler({'id': 1})
+        put.assert_not_called()
+
+    def test_failures_release_the_key(self):
+        handler = self.decorate(keep_result=lambda response:
+                                response['statusCode'] == 200)
+        with self.assertRaises(ValueError):
+            handler({'id': 1, 'fail': True})
+        with self.assertRaises(ValueError):
+            handler({'id': 1, 'fail': True})
+        handler({'id': 2, 'status': 500})
+        self.assertEqual(handler({'id': 2, 'status': 500})['n'], 4)
+        self.assertEqual(len(self.calls), 4)
+
+    def test_in_progress_attempts_are_rejected(self):
+        handler = self.decorate(payload=lambda event: event['id'])
+        key = f'{handler.__wrapped__.__qualname__}#' \
+              f'{idempotency.hash_payload(1)}'
+        now = time.time()
+        self.store.put_in_progress(key, now + 60, now + 60)
+        with self.assertRaises(idempotency.IdempotencyInProgressError):
+            handler({'id': 1})
+        # a crashed attempt stops blocking after in_progress_ttl
+        self.store.items[key]['in_progress_expiration'] = now - 1
+        self.assertEqual(handler({'id': 1})['n'], 1)
+
+    def test_expired_results_run_again(self):
+        handler = self.decorate(ttl=-1, cache_size=0)
+        handler({'id': 1})
+        handler({'id': 1})
+        self.assertEqual(len(self.calls), 2)
+
+    def test_coroutine_functions(self):
+        @idempotency.idempotent(self.store,
+                                payload=lambda record: record['eventID'])
+        async def process(record):
+            self.calls.append(record)
+            return len(self.calls)
+
+        async def twice():
+            return [await process({'eventID': 'a', 'attempt': attempt})
+                    for attempt in range(2)]
+        self.assertEqual(asyncio.run(twice()), [1, 1])
+
+    def test_store_is_made_on_the_first_call(self):
+        with patch.dict('os.environ', {'idempotency_table': 'Idempotency'}):
+            idempotent = idempotency.idempotent()
+        with patch.dict('os.environ', {'idempotency_table': 'Late'}):
+            self.assertEqual(idempotent.store.table_name, 'Late')
+        self.assertIsInstance(
+            idempotency.default_store(idempotency.Settings({})),
+            idempotency.InMemoryStore)
+
+
+class TestDynamoDBStore(CommonsTestCase):
+
+    def test_conditional_writes(self):
+        with LocalAws() as local_aws:
+            table = local_aws.dynamodb.create_table('Idempotency')
+            store = idempotency.DynamoDBStore('Idempotency')
+            now = time.time()
+            store.put_in_progress('k', now + 60, now + 60)
+            with self.assertRaises(idempotency.RecordExistsError):
+                store.put_in_progress('k', now + 60, now + 60)
+            self.assertEqual(store.get('k'), ('INPROGRESS', None))
+            store.complete('k', {'statusCode': 200}, now + 60)
+            self.assertEqual(store.get('k'),
+                             ('COMPLETED', {'statusCode': 200}))
+            store.delete('k')
+            self.assertEqual(table.items, {})
+            self.assertIsNone(store.get('k'))
@@ -0,0 +1,72 @@
+import random
+
+from tests.test_commons import CommonsTestCase
+
+intervals = CommonsTestCase.import_commons('intervals')
+
+
+class TestIntervals(CommonsTestCase):
+
+    def test_half_open_overlaps(self):
+        day = intervals.Intervals([(600, 660), (720, 780)])
+        self.assertTrue(day.overlaps(630, 700))
+        self.assertTrue(day.overlaps(500, 800))
+        self.assertFalse(day.overlaps(660, 720))
+        self.assertFalse(day.overlaps(540, 600))
+        self.assertFalse(day.overlaps(780, 800))
+        self.assertFalse(intervals.Intervals().overlaps(0, 1440))
+
+    def test_overlapping_intervals(self):
+        # a long interval hidden behind later starts
+        day = intervals.Intervals([(0, 700), (100, 110), (200, 210)])
+        self.assertTrue(day.overlaps(650, 690))
+        self.assertFalse(day.overlaps(700, 710))
+
+    def test_added_intervals_match_a_linear_check(self):
+        rng = random.Random(7)
+        day, pairs = intervals.Intervals(), []
+        for _ in range(300):
+            start = rng.randrange(0, 1400)
+            pair = (start, start + rng.randrange(1, 120))
+            day.add(*pair)
+            pairs.append(pair)
+            probe = rng.randrange(0, 1400)
+            probe = (probe, probe + rng.randrange(1, 60))
+            self.assertEqual(day.overlaps(*probe), any(
+                start < probe[1] and probe[0] < end
+                for start, end in pairs))
+        self.assertEqual(len(day), 300)
+
+
+class TestIntervalIndex(CommonsTestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.index = intervals.IntervalIndex(ttl=60, max_keys=2,
+                                             clock=lambda: self.now)
+
+    def test_entries_expire(self):
+        self.index.put('a', [(0, 10)])
+        self.index.add('a', 20, 30)
+        self.assertTrue(self.index.get('a').overlaps(25, 26))
+        self.now = 60
+        self.assertIsNone(self.index.get('a'))
+        # not loaded, nothing to keep coherent
+        self.index.add('a', 40, 50)
+        self.assertIsNone(self.index.get('a'))
+
+    def test_least_recently_used_is_dropped(self):
+        self.index.put('a', [])
+        self.index.put('b', [])
+        self.index.get('a')
+        self.index.put('c', [])
+        self.assertIsNone(self.index.get('b'))
+        self.assertIsNotNone(self.index.get('a'))
+
+    def test_invalidate_and_zero_ttl(self):
+        self.index.put('a', [(0, 10)])
+        self.index.invalidate('a')
+        self.assertIsNone(self.index.get('a'))
+        self.index.ttl = 0
+        self.assertTrue(self.index.put('b', [(0, 10)]).overlaps(5, 6))
+        self.assertIsNone(self.index.get('b'))
@@ -0,0 +1,31 @@
+import io
+import json
+from unittest.mock import patch
+
+from tests.test_commons import CommonsTestCase
+
+
+class TestKeeper(CommonsTestCase):
+
+    def test_warm_reports_distinct_containers(self):
+        keeper = self.import_commons('keeper')
+        responses = iter([{'container_id': 'a', 'prewarmed': True,
+                           'prewarm_ms': 12.5},
+                          {'container_id': 'b', 'prewarmed': True,
+                           'prewarm_ms': 40.0},
+                          {'container_id': 'a', 'prewarmed': False,
+                           'prewarm_ms': 0}])
+
+        def invoke(**params):
+            self.assertTrue(json.loads(params['Payload'])['warm_up'])
+            self.assertEqual(params['Qualifier'], 'prod')
+            return {'Payload': io.BytesIO(
+                json.dumps(next(responses)).encode())}
+
+        with patch.object(keeper.aws, 'get_client') as get_client:
+            get_client.return_value.invoke.side_effect = invoke
+            summary = keeper.warm('api_handler', 3, qualifier='prod')
+        self.assertEqual(summary['containers'], 2)
+        self.assertEqual(summary['prewarmed'], 2)
+        self.assertEqual(summary['max_prewarm_ms'], 40.0)
+        self.assertEqual(summary['failures'], 0)
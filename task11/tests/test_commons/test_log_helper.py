@@ -0,0 +1,181 @@
+import io
+import json
+import logging
+import time
+from unittest.mock import Mock, patch
+
+from tests.test_commons import CommonsTestCase
+
+
+class TestLogHelper(CommonsTestCase):
+
+    def setUp(self) -> None:
+        self.log_helper = self.import_commons('log_helper')
+        self.stream = io.StringIO()
+        self.handler = logging.StreamHandler(self.stream)
+        self.handler.setFormatter(
+            self.log_helper.JsonFormatter(max_field_size=64))
+        self.logger = self.log_helper.get_logger('test-log-helper')
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self) -> None:
+        self.logger.removeHandler(self.handler)
+
+    def lines(self):
+        return [json.loads(line) for line in
+                self.stream.getvalue().splitlines()]
+
+    def test_disabled_level_does_not_render_arguments(self):
+        class Exploding:
+            def __str__(self):
+                raise AssertionError('rendered')
+
+        self.logger.debug('Request: %s', Exploding())
+        self.assertEqual(self.lines(), [])
+
+    def test_structured_line_with_truncated_fields(self):
+        event = {'Records': [{'body': 'x' * 100}] * 100}
+        self.logger.info('Event: %s', event, extra={'records': 100})
+        line, = self.lines()
+        self.assertEqual(line['level'], 'INFO')
+        self.assertEqual(line['records'], 100)
+        self.assertTrue(
+            line['message'].endswith(self.log_helper.TRUNCATION_MARKER))
+        self.assertLessEqual(
+            len(line['message']),
+            64 + len(self.log_helper.TRUNCATION_MARKER))
+
+    def test_numeric_placeholders(self):
+        self.logger.info('count %d took %.2f', 5, 1.234)
+        line, = self.lines()
+        self.assertEqual(line['message'], 'count 5 took 1.23')
+
+    def test_single_dict_argument_is_rendered_as_bounded_json(self):
+        event = {'body': '{"a": 1}', 'Records': [{'k': 'v'}]}
+        self.logger.info('Request: %s', event)
+        self.logger.info('Request: %s', {str(i): 'x' * 50 for i in range(50)})
+        first, second = self.lines()
+        self.assertEqual(json.loads(first['message'][len('Request: '):]),
+                         event)
+        self.assertLessEqual(
+            len(second['message']),
+            64 + len(self.log_helper.TRUNCATION_MARKER))
+
+    def test_named_placeholders(self):
+        self.logger.info('%(name)s has %(count)d records',
+                         {'name': 'batch', 'count': 3})
+        line, = self.lines()
+        self.assertEqual(line['message'], 'batch has 3 records')
+
+    def test_render_handles_non_json_values(self):
+        from decimal import Decimal
+        self.assertEqual(self.log_helper.render({'a': Decimal('1.5')}),
+                         '{"a":"1.5"}')
+
+    def test_debug_sampling(self):
+        with self.log_helper.debug_sampling(rate=1) as sampled:
+            self.assertTrue(sampled)
+            self.logger.debug('sampled %s', 1)
+        with self.log_helper.debug_sampling(rate=0) as sampled:
+            self.assertFalse(sampled)
+            self.logger.debug('not sampled %s', 2)
+        self.assertEqual([line['message'] for line in self.lines()],
+                         ['sampled 1'])
+
+
+class TestBackgroundHandler(CommonsTestCase):
+
+    def test_flush_writes_everything_queued(self):
+        log_helper = self.import_commons('log_helper')
+        stream = io.StringIO()
+        handler = log_helper.BackgroundHandler(stream=stream, batch_size=7)
+        handler.setFormatter(log_helper.JsonFormatter())
+        logger = logging.getLogger('test-background-handler')
+        logger.propagate = False
+        logger.addHandler(handler)
+        try:
+            for i in range(100):
+                logger.warning('record %s', i)
+            handler.flush()
+        finally:
+            logger.removeHandler(handler)
+        messages = [json.loads(line)['message']
+                    for line in stream.getvalue().splitlines()]
+        self.assertEqual(messages, [f'record {i}' for i in range(100)])
+
+    def test_flush_writes_synchronously_when_writer_is_stuck(self):
+        log_helper = self.import_commons('log_helper')
+        stream = io.StringIO()
+        handler = log_helper.BackgroundHandler(stream=stream,
+                                               flush_timeout=0.01)
+        handler.setFormatter(log_helper.JsonFormatter())
+        # a writer that never consumes the queue
+        handler._writer = Mock(**{'is_alive.return_value': True})
+        handler.emit(logging.makeLogRecord({'msg': 'queued', 'levelno': 30,
+                                            'levelname': 'WARNING'}))
+        handler.flush()
+        self.assertEqual(json.loads(stream.getvalue())['message'], 'queued')
+
+    def test_write_errors_are_reported(self):
+        log_helper = self.import_commons('log_helper')
+        handler = log_helper.BackgroundHandler(stream=io.StringIO())
+        handler.stream.close()
+        handler.setFormatter(log_helper.JsonFormatter())
+        with patch.object(handler, 'handleError') as handle_error:
+            handler.emit(logging.makeLogRecord({'msg': 'lost'}))
+            handler.flush()
+        handle_error.assert_called_once()
+
+
+class TestErrorLog(CommonsTestCase):
+
+    tearDown = TestLogHelper.tearDown
+    lines = TestLogHelper.lines
+
+    def setUp(self) -> None:
+        TestLogHelper.setUp(self)
+        self.error_log = self.log_helper.ErrorLog(burst=2, window=60)
+
+    def fail(self, value):
+        try:
+            raise ValueError(f'throttled {value}')
+        except ValueError as e:
+            return self.error_log.log(self.logger, e, 'Failed: %s', e,
+                                      detail={'id': value})
+
+    def test_first_occurrence_in_full_repeats_counted(self):
+        fingerprints = {self.fail(i) for i in range(10)}
+        self.assertEqual(len(fingerprints), 1)
+        first, second = self.lines()
+        self.assertIn('exception', first)
+        self.assertIn('"id":0', first['message'])
+        self.assertNotIn('exception', second)
+        self.assertEqual(second['message'], 'Failed: throttled 1')
+        self.assertEqual(second['occurrences'], 2)
+
+        self.error_log.summarize()
+        self.assertEqual(len(self.lines()), 2)
+        self.error_log.summarize(force=True)
+        summary = self.lines()[-1]
+        self.assertEqual(summary['level'], 'WARNING')
+        self.assertEqual(summary['suppressed'], 8)
+        self.assertEqual(summary['occurrences'], 10)
+        self.assertEqual(summary['fingerprint'], fingerprints.pop())
+
+    def test_fingerprints_follow_the_stack(self):
+        def elsewhere():
+            try:
+                raise ValueError('throttled')
+            except ValueError as e:
+                return self.error_log.log(self.logger, e, 'Failed')
+        self.assertNotEqual(self.fail(1), elsewhere())
+        self.assertEqual(len(self.lines()), 2)
+
+    def test_tokens_refill(self):
+        self.error_log = self.log_helper.ErrorLog(burst=1, window=0.05)
+        self.fail(1)
+        self.fail(2)
+        self.assertEqual(len(self.lines()), 1)
+        time.sleep(0.06)
+        self.fail(3)
+        self.assertEqual(self.lines()[-1]['occurrences'], 3)
@@ -0,0 +1,49 @@
+import tracemalloc
+
+from tests.test_commons import CommonsTestCase
+
+memory = CommonsTestCase.import_commons('memory')
+
+
+class TestMemoryProfiler(CommonsTestCase):
+
+    def test_disabled_by_default(self):
+        profiler = memory.MemoryProfiler()
+        self.assertFalse(profiler.start())
+        self.assertIsNone(profiler.stop())
+
+    def test_peak_and_top_sites(self):
+        profiler = memory.MemoryProfiler(rate=1, top=3)
+        self.assertTrue(profiler.start())
+        transient = bytearray(2 * 1024 * 1024)
+        del transient
+        kept = [bytes(1024) for _ in range(256)]
+        report = profiler.stop()
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertGreaterEqual(report['peak_kib'], 2048)
+        self.assertGreaterEqual(report['allocated_kib'], 256)
+        self.assertLess(report['allocated_kib'], 1024)
+        site = report['top'][0]
+        self.assertIn('test_memory.py', site['site'])
+        self.assertGreaterEqual(site['count'], 256)
+        self.assertEqual(len(kept), 256)
+
+    def test_lambda_logs_the_report(self):
+        abstract_lambda = self.import_commons('abstract_lambda')
+
+        class Handler(abstract_lambda.AbstractLambda):
+            def validate_request(self, event) -> dict:
+                pass
+
+            def handle_request(self, event, context):
+                return {'statusCode': 200, 'body': 'x' * 100_000}
+
+        handler = Handler()
+        rate, memory.profiler.rate = memory.profiler.rate, 1
+        try:
+            with self.assertLogs(abstract_lambda._LOG, 'INFO') as logs:
+                handler.lambda_handler({}, {})
+        finally:
+            memory.profiler.rate = rate
+        self.assertGreaterEqual(handler.memory_report['allocated_kib'], 97)
+        self.assertIn('Memory peak', logs.output[-1])
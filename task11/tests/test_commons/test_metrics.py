@@ -0,0 +1,63 @@
+import io
+import json
+
+from tests.test_commons import CommonsTestCase
+
+
+class TestMetrics(CommonsTestCase):
+
+    def setUp(self) -> None:
+        self.module = self.import_commons('metrics')
+        self.stream = io.StringIO()
+
+    def lines(self):
+        return [json.loads(line) for line in
+                self.stream.getvalue().splitlines()]
+
+    def test_one_emf_line_per_invocation(self):
+        metrics = self.module.Metrics(namespace='test', stream=self.stream)
+        metrics.start_invocation({'httpMethod': 'GET',
+                                  'resource': '/tables/{tableId}'})
+        metrics.record('handle_request', 0.0123)
+        with metrics.timer('serialization'):
+            pass
+        metrics.end_invocation()
+        line, = self.lines()
+        directive, = line['_aws']['CloudWatchMetrics']
+        self.assertEqual(directive['Namespace'], 'test')
+        self.assertEqual(directive['Dimensions'], [['Function', 'Route']])
+        self.assertEqual(line['Route'], 'GET /tables/{tableId}')
+        self.assertEqual(line['handle_request'],
+                         {'Values': [12.0], 'Counts': [1]})
+        self.assertIn('serialization', line)
+
+    def test_aggregated_flush(self):
+        metrics = self.module.Metrics(stream=self.stream, flush_interval=60)
+        for source in ('aws:sqs', 'aws:sqs', 'aws:dynamodb'):
+            metrics.start_invocation({'Records': [{'eventSource': source}]})
+            metrics.record('handle_request', 0.002)
+            metrics.end_invocation()
+        self.assertEqual(self.lines(), [])
+        metrics.flush()
+        counts = {line['EventSource']: line['handle_request']['Counts']
+                  for line in self.lines()}
+        self.assertEqual(counts, {'aws:sqs': [2], 'aws:dynamodb': [1]})
+
+    def test_disabled(self):
+        metrics = self.module.Metrics(stream=self.stream, enabled=False)
+        metrics.start_invocation({})
+        metrics.record('handle_request', 0.001)
+        metrics.end_invocation()
+        metrics.flush()
+        self.assertEqual(self.stream.getvalue(), '')
+
+    def test_aws_call_hooks(self):
+        metrics = self.module.Metrics(stream=self.stream)
+        metrics.start_invocation({'source': 'aws.events'})
+        context = {}
+        metrics.before_aws_call(event_name='before-call.dynamodb.PutItem',
+                                context=context)
+        metrics.after_aws_call(event_name='after-call.dynamodb.PutItem',
+                               context=context)
+        metrics.end_invocation()
+        self.assertIn('aws.dynamodb.PutItem', self.lines()[0])
@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+from tests.test_commons import CommonsTestCase
+
+pagination = CommonsTestCase.import_commons('pagination')
+
+
+class Reader:
+    """Pages of a list, LastEvaluatedKey being the last item read"""
+
+    def __init__(self, items, page_size=None):
+        self.items = items
+        self.page_size = page_size
+        self.limits = []
+
+    def __call__(self, Limit, ExclusiveStartKey=None):
+        self.limits.append(Limit)
+        start = 0 if ExclusiveStartKey is None else \
+            self.items.index(ExclusiveStartKey['id']) + 1
+        size = min(Limit, self.page_size or Limit)
+        page = {'Items': [{'id': item} for item in
+                          self.items[start:start + size]]}
+        if start + size < len(self.items):
+            page['LastEvaluatedKey'] = {'id': self.items[start + size - 1]}
+        return page
+
+
+class TestPagination(CommonsTestCase):
+
+    def test_cursor_round_trip(self):
+        cursor = pagination.encode_cursor(
+            {'k': {'id': Decimal(7), 'date': '2024-05-01'}}, 'scope')
+        self.assertNotIn('=', cursor)
+        self.assertEqual(pagination.decode_cursor(cursor, 'scope'),
+                         {'k': {'id': 7, 'date': '2024-05-01'}})
+        with self.assertRaises(pagination.InvalidCursor):
+            pagination.decode_cursor(cursor, 'other')
+        for malformed in ('', 'abc', '!!!', pagination.encode_cursor(
+                {'id': 1})[:-2]):
+            with self.assertRaises(pagination.InvalidCursor):
+                pagination.decode_cursor(malformed, 'scope')
+
+    def test_pages_span_requests(self):
+        first, second = Reader([1, 2, 3]), Reader([4, 5, 6, 7])
+        requests = [(first, {}), (second, {})]
+        seen, cursor, pages = [], None, 0
+        while True:
+            items, cursor = pagination.paginate(requests, 2, cursor)
+            seen.extend(item['id'] for item in items)
+            pages += 1
+            if cursor is None:
+                break
+        self.assertEqual(seen, [1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(pages, 4)
+        # each read asks only for what the page still needs
+        self.assertEqual(first.limits, [2, 2])
+        self.assertEqual(second.limits, [1, 2, 2])
+
+    def test_short_pages_are_filled(self):
+        # e.g. cut at 1 MB by DynamoDB
+        reader = Reader(list(range(10)), page_size=3)
+        items, cursor = pagination.paginate([(reader, {})], 5)
+        self.assertEqual([item['id'] for item in items], [0, 1, 2, 3, 4])
+        self.assertEqual(reader.limits, [5, 2])
+        items, cursor = pagination.paginate([(reader, {})], 5, cursor)
+        self.assertEqual(items[0]['id'], 5)
+
+    def test_cursor_out_of_range(self):
+        cursor = pagination.encode_cursor({'i': 5})
+        with self.assertRaises(pagination.InvalidCursor):
+            pagination.paginate([(Reader([1]), {})], 2, cursor)
+
+    def test_parse_limit(self):
+        self.assertEqual(pagination.parse_limit(None),
+                         pagination.DEFAULT_LIMIT)
+        self.assertEqual(pagination.parse_limit('10'), 10)
+        for invalid in ('0', '101', 'ten'):
+            with self.assertRaises(ValueError):
+                pagination.parse_limit(invalid)
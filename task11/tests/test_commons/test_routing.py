@@ -0,0 +1,110 @@
+import json
+
+from tests.test_commons import CommonsTestCase
+
+routing = CommonsTestCase.import_commons('routing')
+
+
+def v1_event(method, path, body=None, query=None):
+    return {'httpMethod': method, 'path': path, 'body': body,
+            'queryStringParameters': query,
+            'requestContext': {'httpMethod': method}}
+
+
+def v2_event(method, path, body=None, query=None):
+    return {'rawPath': path, 'body': body, 'queryStringParameters': query,
+            'requestContext': {'http': {'method': method, 'path': path}}}
+
+
+class Handler:
+    router = routing.Router()
+
+    @router.route('GET', '/tables')
+    def get_tables(self, request):
+        return 'tables'
+
+    @router.route('POST', '/tables')
+    def create_table(self, request):
+        return request.json()
+
+    @router.route('GET', '/tables/{tableId:int}')
+    def get_table(self, request):
+        return request.path_params
+
+    @router.route('GET', '/tables/{tableId:int}/reservations/{id}')
+    def get_reservation(self, request):
+        return request.path_params
+
+
+class TestRequest(CommonsTestCase):
+
+    def test_v1_and_v2_normalize_alike(self):
+        for make_event in (v1_event, v2_event):
+            request = routing.Request(make_event('post', '/weather', '{"a": 1}',
+                                                 {'latitude': '50'}))
+            self.assertEqual(request.method, 'POST')
+            self.assertEqual(request.path, '/weather')
+            self.assertEqual(request.query, {'latitude': '50'})
+            self.assertEqual(request.json(), {'a': 1})
+
+    def test_base64_body_and_empty_body(self):
+        event = v2_event('POST', '/', 'eyJhIjogMX0=')
+        event['isBase64Encoded'] = True
+        self.assertEqual(routing.Request(event).json(), {'a': 1})
+        request = routing.Request(v1_event('GET', '/'))
+        self.assertEqual(request.json(), {})
+        self.assertEqual(request.query, {})
+
+
+class TestRouter(CommonsTestCase):
+
+    def dispatch(self, event):
+        return Handler.router.dispatch(Handler(), event)
+
+    def test_static_routes_by_method(self):
+        self.assertEqual(self.dispatch(v1_event('GET', '/tables')), 'tables')
+        self.assertEqual(self.dispatch(v2_event('POST', '/tables/', '{"n": 1}')),
+                         {'n': 1})
+
+    def test_typed_parameters(self):
+        self.assertEqual(self.dispatch(v1_event('GET', '/tables/7')),
+                         {'tableId': 7})
+        self.assertEqual(
+            self.dispatch(v1_event('GET', '/tables/7/reservations/abc')),
+            {'tableId': 7, 'id': 'abc'})
+
+    def test_parameter_that_does_not_convert(self):
+        response = self.dispatch(v1_event('GET', '/tables/seven'))
+        self.assertEqual(response['statusCode'], 400)
+        self.assertIn('tableId', json.loads(response['body'])['message'])
+
+    def test_not_found(self):
+        for path in ('/', '/chairs', '/tables/7/chairs'):
+            response = self.dispatch(v1_event('GET', path))
+            self.assertEqual(response['statusCode'], 404, path)
+
+    def test_method_not_allowed(self):
+        response = self.dispatch(v1_event('DELETE', '/tables'))
+        self.assertEqual(response['statusCode'], 405)
+        self.assertEqual(response['headers']['Allow'], 'GET, POST')
+        response = self.dispatch(v1_event('POST', '/tables/7'))
+        self.assertEqual(response['statusCode'], 405)
+        self.assertEqual(response['headers']['Allow'], 'GET')
+
+    def test_route_is_recorded(self):
+        request = routing.Request(v1_event('GET', '/tables/7'))
+        func, _ = Handler.router.resolve(request)
+        self.assertIs(func, Handler.get_table)
+        self.assertEqual(request.route, '/tables/{tableId:int}')
+
+    def test_custom_fallback(self):
+        router = routing.Router(on_not_found=lambda request: request.path)
+        self.assertEqual(router.dispatch(None, v2_event('GET', '/x')), '/x')
+
+    def test_duplicate_and_conflicting_routes(self):
+        router = routing.Router()
+        router.add('GET', '/a/{id}', print)
+        with self.assertRaises(ValueError):
+            router.add('GET', '/a/{id}', print)
+        with self.assertRaises(ValueError):
+            router.add('POST', '/a/{name}', print)
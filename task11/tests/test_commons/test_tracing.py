@@ -0,0 +1,140 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from tests.test_commons import CommonsTestCase
+
+tracing = CommonsTestCase.import_commons('tracing')
+
+
+class _Ok(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self.send_response(200 if self.path.startswith('/ok') else 503)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestTracing(CommonsTestCase):
+
+    def setUp(self) -> None:
+        self.exporter = tracing.MemoryExporter()
+        self.tracer = tracing.Tracer(tracing.SAMPLED, sample_rate=1,
+                                     exporter=self.exporter, name='fn')
+
+    def test_named_blocks_nest(self):
+        self.tracer.begin()
+        with self.tracer.span('outer', route='GET /tables'):
+            with self.tracer.span('inner') as inner:
+                inner.annotate('items', 3)
+        with self.assertRaises(ValueError):
+            with self.tracer.span('failing'):
+                raise ValueError('boom')
+        self.tracer.end()
+        inner, outer, failing, root = self.exporter.documents
+        self.assertEqual(root['name'], 'fn')
+        self.assertNotIn('type', root)
+        self.assertEqual(outer['parent_id'], root['id'])
+        self.assertEqual(inner['parent_id'], outer['id'])
+        self.assertEqual(inner['type'], 'subsegment')
+        self.assertEqual(inner['annotations'], {'items': 3})
+        self.assertEqual(outer['annotations'], {'route': 'GET /tables'})
+        self.assertEqual({document['trace_id'] for document in
+                          self.exporter.documents}, {root['trace_id']})
+        self.assertTrue(failing['fault'])
+        self.assertEqual(failing['cause']['exceptions'][0]['type'],
+                         'ValueError')
+
+    def test_unsampled_invocations_are_noop(self):
+        self.tracer.sample_rate = 0
+        self.assertIsNone(self.tracer.begin())
+        self.assertIs(self.tracer.span('block'), tracing.NOOP_SPAN)
+        self.tracer.end()
+        self.assertEqual(self.exporter.documents, [])
+
+        tracing.tracer, tracer = tracing.Tracer(tracing.OFF), tracing.tracer
+        try:
+            tracing.begin()
+            iterations = 100000
+            start = time.perf_counter()
+            for _ in range(iterations):
+                with tracing.span('block'):
+                    pass
+            per_span = (time.perf_counter() - start) / iterations
+        finally:
+            tracing.tracer = tracer
+        self.assertLess(per_span, 1e-6)
+
+    def test_xray_mode_follows_the_lambda_header(self):
+        tracer = tracing.Tracer(tracing.XRAY, exporter=self.exporter)
+        self.assertIsNone(tracer.begin('Root=1-5-abc;Parent=p1;Sampled=0'))
+        trace = tracer.begin('Root=1-5-abc;Parent=p1;Sampled=1')
+        with tracer.span('block'):
+            pass
+        tracer.end()
+        document, = self.exporter.documents
+        self.assertEqual(trace.trace_id, '1-5-abc')
+        self.assertEqual(document['trace_id'], '1-5-abc')
+        self.assertEqual(document['parent_id'], 'p1')
+        self.assertEqual(document['type'], 'subsegment')
+
+    def test_botocore_calls(self):
+        import boto3
+        from botocore.stub import Stubber
+        client = self.tracer.instrument(boto3.client(
+            'dynamodb', region_name='eu-west-1',
+            aws_access_key_id='key', aws_secret_access_key='secret'))
+        with Stubber(client) as stubber:
+            stubber.add_response('get_item', {'Item': {}},
+                                 {'TableName': 'Tables',
+                                  'Key': {'id': {'N': '1'}}})
+            self.tracer.begin()
+            client.get_item(TableName='Tables', Key={'id': {'N': '1'}})
+            self.tracer.end()
+        span, root = self.exporter.documents
+        self.assertEqual(span['name'], 'dynamodb')
+        self.assertEqual(span['namespace'], 'aws')
+        self.assertEqual(span['aws']['operation'], 'GetItem')
+        self.assertEqual(span['aws']['table_name'], 'Tables')
+        self.assertEqual(span['parent_id'], root['id'])
+
+    def test_requests_calls(self):
+        import requests
+        server = HTTPServer(('127.0.0.1', 0), _Ok)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        send = requests.Session.send
+        try:
+            url = f'http://127.0.0.1:{server.server_port}'
+            self.tracer.begin()
+            requests.get(f'{url}/ok?latitude=1', timeout=2)
+            requests.get(f'{url}/down', timeout=2)
+            self.tracer.end()
+        finally:
+            requests.Session.send = send
+            server.shutdown()
+            server.server_close()
+        ok, down, root = self.exporter.documents
+        self.assertEqual(ok['name'], '127.0.0.1')
+        self.assertEqual(ok['namespace'], 'remote')
+        self.assertEqual(ok['http']['request'],
+                         {'method': 'GET', 'url': f'{url}/ok'})
+        self.assertEqual(ok['http']['response'], {'status': 200})
+        self.assertNotIn('fault', ok)
+        self.assertTrue(down['fault'])
+
+    def test_log_exporter(self):
+        import io
+        import json
+        stream = io.StringIO()
+        self.tracer.exporter = tracing.LogExporter(stream)
+        self.tracer.begin()
+        with self.tracer.span('block'):
+            pass
+        self.tracer.end()
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([line['trace_span']['name'] for line in lines],
+                         ['block', 'fn'])
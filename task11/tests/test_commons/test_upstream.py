@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import requests
+
+from tests.test_commons import CommonsTestCase
+
+upstream = CommonsTestCase.import_commons('upstream')
+
+
+class StubServer:
+    """Local HTTP server answering each request with
+    respond(number) -> (status, delay seconds), number counting from 0"""
+
+    def __init__(self, respond=lambda number: (200, 0)):
+        self.respond = respond
+        self.requests = 0
+        self.ports = set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                number = stub.requests
+                stub.requests += 1
+                stub.ports.add(self.client_address[1])
+                status, delay = stub.respond(number)
+                time.sleep(delay)
+                body = json.dumps({'number': number,
+                                   'path': self.path}).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    # the client gave up waiting
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_port}/v1/forecast'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, args=(0.05,),
+                         daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+
+class TestUpstream(CommonsTestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+
+    def upstream(self, **kwargs):
+        kwargs.setdefault('read_timeout', 1)
+        kwargs.setdefault('breaker', upstream.CircuitBreaker(
+            failure_threshold=2, reset_timeout=30, clock=self.clock))
+        return upstream.Upstream('stub', clock=self.clock,
+                                 sleep=self.clock.sleep, **kwargs)
+
+    def test_session_is_pooled(self):
+        client = self.upstream()
+        with StubServer() as stub:
+            for _ in range(3):
+                self.assertEqual(client.get_json(stub.url, {'a': 1})['path'],
+                                 '/v1/forecast?a=1')
+        self.assertEqual(stub.requests, 3)
+        self.assertEqual(len(stub.ports), 1)
+
+    def test_server_errors_are_retried_with_jitter(self):
+        client = self.upstream(retries=2, backoff=0.1)
+        with StubServer(lambda n: (503 if n < 2 else 200, 0)) as stub:
+            self.assertEqual(client.get_json(stub.url)['number'], 2)
+        self.assertEqual(len(self.clock.sleeps), 2)
+        self.assertLessEqual(self.clock.sleeps[0], 0.1)
+        self.assertLessEqual(self.clock.sleeps[1], 0.2)
+        self.assertEqual(client.breaker.state, client.breaker.CLOSED)
+
+    def test_client_errors_are_not_retried(self):
+        client = self.upstream()
+        with StubServer(lambda n: (400, 0)) as stub:
+            for _ in range(3):
+                with self.assertRaises(requests.HTTPError):
+                    client.get_json(stub.url)
+        self.assertEqual(stub.requests, 3)
+        self.assertEqual(client.breaker.state, client.breaker.CLOSED)
+
+    def test_slow_answer_times_out_and_is_retried(self):
+        client = self.upstream(read_timeout=0.2, retries=1)
+        with StubServer(lambda n: (200, 0.5 if n == 0 else 0)) as stub:
+            self.assertEqual(client.get_json(stub.url)['number'], 1)
+
+    def test_open_circuit_fails_fast(self):
+        client = self.upstream(retries=0)
+        with StubServer(lambda n: (500, 0)) as stub:
+            for _ in range(2):
+                with self.assertRaises(requests.HTTPError):
+                    client.get_json(stub.url)
+            self.assertEqual(client.breaker.state, client.breaker.OPEN)
+            with self.assertRaises(upstream.UpstreamUnavailable):
+                client.get_json(stub.url)
+        self.assertEqual(stub.requests, 2)
+
+    def test_open_circuit_serves_cached_data(self):
+        client = self.upstream(retries=0, cache_ttl=600)
+        with StubServer(lambda n: (200 if n == 0 else 502, 0)) as stub:
+            fresh = client.get_json(stub.url, {'lat': 1})
+            self.clock.now = 100
+            for _ in range(3):
+                self.assertEqual(client.get_json(stub.url, {'lat': 1}),
+                                 fresh)
+            # the circuit opened on the second failure
+            self.assertEqual(stub.requests, 3)
+            with self.assertRaises(upstream.UpstreamUnavailable):
+                client.get_json(stub.url, {'lat': 2})
+            # the probe fails and the cached answer is too old by now
+            self.clock.now = 1000
+            with self.assertRaises(requests.HTTPError):
+                client.get_json(stub.url, {'lat': 1})
+        self.assertEqual(stub.requests, 4)
+
+    def test_half_open_probe_closes_the_circuit(self):
+        client = self.upstream(retries=0)
+        with StubServer(lambda n: (503 if n < 2 else 200, 0)) as stub:
+            for _ in range(2):
+                with self.assertRaises(requests.HTTPError):
+                    client.get_json(stub.url)
+            self.clock.now = 30
+            self.assertEqual(client.breaker.state, client.breaker.HALF_OPEN)
+            self.assertEqual(client.get_json(stub.url)['number'], 2)
+        self.assertEqual(client.breaker.state, client.breaker.CLOSED)
+
+    def test_failed_probe_opens_the_circuit_again(self):
+        breaker = upstream.CircuitBreaker(failure_threshold=2,
+                                          reset_timeout=30, clock=self.clock)
+        breaker.record_failure()
+        breaker.record_failure()
+        self.clock.now = 30
+        self.assertTrue(breaker.allow())
+        # one probe at a time
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, breaker.OPEN)
+        self.clock.now = 60
+        self.assertTrue(breaker.allow())
+
+    def test_slow_request_is_hedged(self):
+        client = self.upstream(hedge=True, read_timeout=5)
+        with StubServer(lambda n: (200, 2 if n == upstream.HEDGE_MIN_SAMPLES
+                                   else 0)) as stub:
+            self.assertIsNone(client.hedge_delay())
+            for _ in range(upstream.HEDGE_MIN_SAMPLES):
+                client.get_json(stub.url)
+            self.assertLess(client.hedge_delay(), 0.5)
+            started = time.perf_counter()
+            answer = client.get_json(stub.url)
+            elapsed = time.perf_counter() - started
+        self.assertEqual(answer['number'], upstream.HEDGE_MIN_SAMPLES + 1)
+        self.assertEqual(client.hedged, 1)
+        self.assertLess(elapsed, 1)
+
+    def test_from_env(self):
+        with patch.dict(os.environ, open_meteo_read_timeout='3',
+                        open_meteo_hedge='true',
+                        open_meteo_failure_threshold='7'):
+            client = upstream.Upstream.from_env('open_meteo')
+        self.assertEqual(client.read_timeout, 3)
+        self.assertTrue(client.hedge)
+        self.assertEqual(client.breaker.failure_threshold, 7)
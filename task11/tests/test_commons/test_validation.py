@@ -0,0 +1,161 @@
+import json
+from pathlib import Path
+
+from tests.test_commons import CommonsTestCase
+
+validation = CommonsTestCase.import_commons('validation')
+
+EXPORT = Path(__file__).parent.parent.parent / 'export' / \
+    'f1zbriu41d_oas_v3.json'
+BUNDLED = Path(__file__).parent.parent.parent / 'src' / 'lambdas' / \
+    'api_handler' / 'openapi.json'
+
+RESERVATION = {
+    'tableNumber': 7, 'clientName': 'Ann', 'phoneNumber': '0501234567',
+    'date': '2024-12-01', 'slotTimeStart': '13:00', 'slotTimeEnd': '15:00'
+}
+
+
+def event(method, path, body=None, query=None):
+    return {'httpMethod': method, 'path': path,
+            'body': json.dumps(body) if body is not None else None,
+            'queryStringParameters': query}
+
+
+class TestCompileSchema(CommonsTestCase):
+
+    def test_types(self):
+        for type_name, good, bad in (('string', 'a', 1),
+                                     ('integer', 1, True),
+                                     ('integer', 2, 2.5),
+                                     ('number', 2.5, '2.5'),
+                                     ('boolean', False, 0),
+                                     ('object', {}, []),
+                                     ('array', [], {})):
+            validate = validation.compile_schema({'type': type_name})
+            self.assertEqual(validate(good), {})
+            self.assertEqual(validate(bad), {'': f'Expected {type_name}'})
+
+    def test_field_level_errors(self):
+        validate = validation.compile_schema({
+            'type': 'object',
+            'properties': {
+                'name': {'type': 'string', 'minLength': 1},
+                'seats': {'type': 'integer', 'minimum': 1, 'maximum': 12},
+                'tags': {'type': 'array', 'items': {'enum': ['vip', 'bar']}},
+                'owner': {'$ref': '#/components/schemas/Owner'}
+            },
+            'required': ['name', 'seats'],
+            'additionalProperties': False
+        }, components={'Owner': {'type': 'object', 'required': ['email'],
+                                 'properties': {'email': {
+                                     'type': 'string', 'format': 'email'}}}})
+        self.assertEqual(validate({'name': 'a', 'seats': 2, 'tags': ['vip'],
+                                   'owner': {'email': 'a@b.co'}}), {})
+        self.assertEqual(validate({'name': '', 'seats': 13,
+                                   'tags': ['vip', 'pool'],
+                                   'owner': {'email': 'nobody'},
+                                   'extra': 1}), {
+            'name': 'Must be at least 1 characters long',
+            'seats': 'Must be at most 12',
+            'tags[1]': 'Must be one of vip, bar',
+            'owner.email': 'Must be a valid email',
+            'extra': 'Unexpected field'
+        })
+        self.assertEqual(validate({}), {'name': 'Required',
+                                        'seats': 'Required'})
+        # each keyword reports its own message
+        self.assertEqual(validate({'name': 'a', 'seats': 0}),
+                         {'seats': 'Must be at least 1'})
+
+    def test_formats_and_patterns(self):
+        validate = validation.compile_schema({'type': 'string',
+                                              'format': 'date'})
+        self.assertEqual(validate('2024-02-29'), {})
+        self.assertIn('', validate('2023-02-29'))
+        validate = validation.compile_schema({'type': 'string',
+                                              'format': 'date-time'})
+        self.assertEqual(validate('2024-02-29T10:00:00Z'), {})
+        self.assertIn('', validate('2024-02-29'))
+        validate = validation.compile_schema({'type': 'string',
+                                              'pattern': '^[0-9]{2}:[0-9]{2}$'})
+        self.assertIn('', validate('9:00'))
+
+    def test_coercion_and_nullable(self):
+        validate = validation.compile_schema({'type': 'integer',
+                                              'minimum': 0}, coerce=True)
+        self.assertEqual(validate('12'), {})
+        self.assertEqual(validate('-1'), {'': 'Must be at least 0'})
+        self.assertEqual(validate('x'), {'': 'Expected integer'})
+        validate = validation.compile_schema({'type': 'string',
+                                              'nullable': True})
+        self.assertEqual(validate(None), {})
+
+
+class TestRequestValidator(CommonsTestCase):
+
+    def setUp(self):
+        self.validator = validation.RequestValidator.from_openapi(
+            validation.load_openapi(EXPORT))
+
+    def test_valid_requests(self):
+        self.assertEqual(self.validator(
+            event('POST', '/reservations', RESERVATION)), {})
+        self.assertEqual(self.validator(event('GET', '/tables/7')), {})
+        self.assertEqual(self.validator(event('GET', '/tables')), {})
+
+    def test_invalid_body(self):
+        self.assertEqual(self.validator(event(
+            'POST', '/reservations',
+            dict(RESERVATION, tableNumber='seven', slotTimeEnd='15:05'))), {
+            'tableNumber': 'Expected integer',
+            'slotTimeEnd': 'Must match ^([01][0-9]|2[0-3]):(00|15|30|45)$'
+        })
+        self.assertEqual(self.validator(event('POST', '/signin', {})),
+                         {'email': 'Required', 'password': 'Required'})
+
+    def test_missing_and_malformed_body(self):
+        self.assertEqual(self.validator(event('POST', '/tables')),
+                         {'body': 'Required'})
+        malformed = event('POST', '/tables')
+        malformed['body'] = '{"id": '
+        self.assertEqual(self.validator(malformed),
+                         {'body': 'Invalid JSON'})
+
+    def test_parameters(self):
+        self.assertEqual(self.validator(event('GET', '/tables/seven')),
+                         {'tableId': 'Expected integer'})
+        validator = validation.RequestValidator()
+        validator.add('GET', '/weather', query={
+            'latitude': {'type': 'number', 'required': True}})
+        self.assertEqual(validator(event('GET', '/weather')),
+                         {'latitude': 'Required'})
+        self.assertEqual(validator(event('GET', '/weather',
+                                         query={'latitude': '50.4'})), {})
+
+    def test_unknown_routes_pass(self):
+        self.assertEqual(self.validator(event('DELETE', '/tables')), {})
+        self.assertEqual(self.validator({'Records': []}), {})
+
+    def test_bundled_document_matches_export(self):
+        # the handler reads the copy deployed with the lambda
+        self.assertFalse(BUNDLED.is_symlink())
+        self.assertEqual(validation.load_openapi(BUNDLED),
+                         validation.load_openapi(EXPORT))
+
+    def test_listing_responses_are_pages(self):
+        document = validation.load_openapi(EXPORT)
+        components = document['components']['schemas']
+        for path, items, item in (
+                ('/tables', 'tables', {'id': 1, 'number': 1, 'places': 4,
+                                       'isVip': False}),
+                ('/reservations', 'reservations', dict(RESERVATION,
+                                                       id='r1'))):
+            validate = validation.compile_schema(
+                document['paths'][path]['get']['responses']['200']
+                ['content']['application/json']['schema'], components)
+            self.assertEqual(validate({items: [item], 'nextCursor': 'c'}),
+                             {})
+            self.assertEqual(validate({items: [], 'nextCursor': None}), {})
+            self.assertEqual(validate({items: [item]}),
+                             {'nextCursor': 'Required'})
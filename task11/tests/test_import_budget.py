@@ -0,0 +1,29 @@
+import os
+import unittest
+
+from tests.import_profiler import lambda_names, profile_handler
+
+# defaults for every lambda of the project; override with the
+# import_time_budget_ms / import_rss_budget_mb environment variables
+IMPORT_TIME_BUDGET_MS = float(os.environ.get('import_time_budget_ms', 1000))
+IMPORT_RSS_BUDGET_MB = float(os.environ.get('import_rss_budget_mb', 64))
+# per-lambda overrides: {'lambda_name': {'import_ms': .., 'rss_mb': ..}}
+BUDGETS = {}
+
+
+class TestImportBudget(unittest.TestCase):
+    """Cold-start regressions fail here instead of in production"""
+
+    def test_handlers_within_budget(self):
+        for lambda_name in lambda_names():
+            budget = BUDGETS.get(lambda_name, {})
+            with self.subTest(lambda_name=lambda_name):
+                profile = profile_handler(lambda_name)
+                self.assertLessEqual(
+                    profile.import_ms,
+                    budget.get('import_ms', IMPORT_TIME_BUDGET_MS),
+                    profile.report())
+                self.assertLessEqual(
+                    profile.max_rss_mb,
+                    budget.get('rss_mb', IMPORT_RSS_BUDGET_MB),
+                    profile.report())
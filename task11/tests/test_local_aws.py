@@ -0,0 +1,160 @@
+import unittest
+
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+
+from tests.local_aws import Faults, LocalAws
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def error_code(error):
+    return error.exception.response['Error']['Code']
+
+
+class TestLocalDynamoDB(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.local_aws = LocalAws()
+        self.reservations = self.local_aws.dynamodb.create_table(
+            'Reservations', hash_key='id',
+            indexes={'byTable': ('tableDate', 'slotStart')})
+        with self.reservations.batch_writer() as batch:
+            for i in range(30):
+                batch.put_item(Item={'id': str(i),
+                                     'tableDate': f'{i % 3}#2024-01-01',
+                                     'slotStart': 600 + i * 15})
+
+    def test_batch_writes(self):
+        self.assertEqual(len(self.reservations.items), 30)
+        self.assertEqual(self.local_aws.faults.calls[
+            ('dynamodb', 'BatchWriteItem')], 2)
+        response = self.local_aws.dynamodb.batch_write_item(RequestItems={
+            'Reservations': [{'DeleteRequest': {'Key': {'id': '0'}}}]})
+        self.assertEqual(response, {'UnprocessedItems': {}})
+        self.assertEqual(len(self.reservations.items), 29)
+
+    def test_query_an_index_page_by_page(self):
+        pages, start = [], None
+        while True:
+            kwargs = {'ExclusiveStartKey': start} if start else {}
+            response = self.reservations.query(
+                IndexName='byTable', Limit=4, ScanIndexForward=False,
+                KeyConditionExpression=Key('tableDate').eq('1#2024-01-01') &
+                Key('slotStart').gte(700),
+                FilterExpression=Attr('id').ne('28'), **kwargs)
+            pages.append([item['slotStart'] for item in response['Items']])
+            start = response.get('LastEvaluatedKey')
+            if start is None:
+                break
+        # the first page read 1020 too, which the filter dropped
+        self.assertEqual(pages, [[975, 930, 885], [840, 795, 750, 705]])
+
+    def test_scan_pages(self):
+        first = self.reservations.scan(Limit=20)
+        second = self.reservations.scan(
+            Limit=20, ExclusiveStartKey=first['LastEvaluatedKey'])
+        self.assertEqual(first['Count'] + second['Count'], 30)
+        self.assertNotIn('LastEvaluatedKey', second)
+
+    def test_conditional_writes_raise_botocore_errors(self):
+        item = {'id': '0', 'tableDate': 'x', 'slotStart': 1}
+        with self.assertRaises(ClientError) as error:
+            self.reservations.put_item(
+                Item=item, ConditionExpression=Attr('id').not_exists())
+        self.assertEqual(error_code(error), 'ConditionalCheckFailedException')
+        self.reservations.delete_item(Key={'id': '0'},
+                                      ConditionExpression=Attr('id').exists())
+        self.reservations.put_item(
+            Item=item, ConditionExpression=Attr('id').not_exists())
+
+    def test_provisioned_capacity_throttles(self):
+        clock = FakeClock()
+        local_aws = LocalAws()
+        local_aws.faults.clock = clock
+        local_aws.faults.sleep = clock.sleep
+        table = local_aws.dynamodb.create_table('Audit')
+        table.provision(read_units=1, write_units=1)
+        table.put_item(Item={'id': '1'})
+        with self.assertRaises(ClientError) as error:
+            table.put_item(Item={'id': '2'})
+        self.assertEqual(error_code(error),
+                         'ProvisionedThroughputExceededException')
+        clock.now += 1
+        table.put_item(Item={'id': '2'})
+        # batch_writer resends what was throttled until it gets through
+        with table.batch_writer() as batch:
+            for i in range(5):
+                batch.put_item(Item={'id': f'batch-{i}'})
+        self.assertEqual(len(table.items), 7)
+        self.assertGreaterEqual(clock.now, 5)
+
+    def test_tables_from_deployment_resources(self):
+        import pathlib
+        path = pathlib.Path(__file__).parents[1] / 'deployment_resources.json'
+        tables = self.local_aws.dynamodb.create_tables_from(
+            path, aliases={'tables_table': 'Tables'})
+        self.assertIn('Tables', tables)
+        self.assertEqual(tables['Tables'].read_capacity.units, 1)
+
+
+class TestLocalServices(unittest.TestCase):
+
+    def test_sqs_round_trip_and_sns_fan_out(self):
+        local_aws = LocalAws()
+        sqs, sns = local_aws.sqs, local_aws.sns
+        url = sqs.create_queue(QueueName='jobs')['QueueUrl']
+        topic = sns.create_topic(Name='events')['TopicArn']
+        sns.subscribe(TopicArn=topic, Protocol='sqs',
+                      Endpoint='arn:aws:sqs:local:000000000000:jobs')
+        sqs.send_message_batch(QueueUrl=url, Entries=[
+            {'Id': str(i), 'MessageBody': f'job {i}'} for i in range(3)])
+        sns.publish(TopicArn=topic, Message='hello')
+        event = sqs.lambda_event('jobs', batch_size=3)
+        self.assertEqual([record['body'] for record in event['Records']],
+                         ['job 0', 'job 1', 'job 2'])
+        # in flight until the visibility timeout or deletion
+        message, = sqs.receive_message(QueueUrl=url,
+                                       MaxNumberOfMessages=10)['Messages']
+        self.assertIn('"hello"', message['Body'])
+        sqs.delete_message(QueueUrl=url,
+                           ReceiptHandle=message['ReceiptHandle'])
+        self.assertEqual(len(sqs.queues[url]), 3)
+
+    def test_s3_objects(self):
+        s3 = LocalAws().s3
+        s3.put_object(Bucket='b', Key='k', Body='{}')
+        self.assertEqual(s3.get_object(Bucket='b', Key='k')['Body'].read(),
+                         b'{}')
+        with self.assertRaises(ClientError):
+            s3.get_object(Bucket='b', Key='missing')
+
+    def test_latency_and_throttling_are_deterministic(self):
+        def run(seed):
+            clock = FakeClock()
+            faults = Faults(seed, clock=clock, sleep=clock.sleep)
+            faults.add('s3', latency=0.01, throttle_rate=0.3)
+            faults.add('s3', 'PutObject', latency=0.02)
+            throttled = []
+            for i in range(20):
+                try:
+                    faults.before_call('s3', 'PutObject')
+                except ClientError as e:
+                    throttled.append(i)
+                    self.assertEqual(e.response['Error']['Code'],
+                                     'ThrottlingException')
+            return throttled, round(clock.now, 6)
+        throttled, elapsed = run(1)
+        self.assertEqual(run(1), (throttled, elapsed))
+        self.assertTrue(0 < len(throttled) < 20)
+        self.assertEqual(elapsed, 0.6)